@@ -14,7 +14,8 @@
 from app.database import Base
 
 # 导入所有模型以确保autogenerate能检测到所有表
-from app.models.text2img import Text2ImgTask, ImageToVideoTask
+from app.models.text2img import Text2ImgBatch, Text2ImgTask, ImageToVideoTask  # noqa: F401
+from app.models.generation_job import GenerationJob  # noqa: F401
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,99 @@
+"""add_text2img_batch: text2img_batch 表 + text2img_task.batch_id / batch_index 列
+
+章节插图批量提交(POST /api/text2img/batch)以批次为单位轮询，需要：
+1. text2img_batch 表记录批次清单(batch_id / total / 提交失败条目)
+2. text2img_task 增加 batch_id(索引) 与 batch_index 列，关联到所属批次
+
+部分环境启动时已通过 Base.metadata.create_all() 建出新表，这里建表/加列均幂等。
+
+Revision ID: 20261019_text2img_batch
+Revises: 20260708_drop_cache_tables
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261019_text2img_batch"
+down_revision = "20260708_drop_cache_tables"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table(name)
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return any(col["name"] == column for col in inspector.get_columns(table))
+
+
+def upgrade() -> None:
+    """创建 text2img_batch 表，并为 text2img_task 增加批次关联列。"""
+    if not _has_table("text2img_batch"):
+        op.create_table(
+            "text2img_batch",
+            sa.Column("id", sa.Integer(), nullable=False, comment="主键ID"),
+            sa.Column(
+                "batch_id",
+                sa.String(length=64),
+                nullable=False,
+                comment="批次ID, 对外即 manifest ID",
+            ),
+            sa.Column("total", sa.Integer(), nullable=False, comment="批次内任务总数"),
+            sa.Column(
+                "submit_errors",
+                sa.Text(),
+                nullable=True,
+                comment="提交失败的条目 JSON: {序号: 错误信息}",
+            ),
+            sa.Column(
+                "created_at",
+                sa.DateTime(timezone=True),
+                server_default=sa.text("CURRENT_TIMESTAMP"),
+                nullable=True,
+                comment="创建时间",
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_text2img_batch_batch_id", "text2img_batch", ["batch_id"], unique=True
+        )
+
+    if not _has_column("text2img_task", "batch_id"):
+        op.add_column(
+            "text2img_task",
+            sa.Column(
+                "batch_id",
+                sa.String(length=64),
+                nullable=True,
+                comment="所属批次ID(单独提交时为空)",
+            ),
+        )
+        op.create_index(
+            "ix_text2img_task_batch_id", "text2img_task", ["batch_id"], unique=False
+        )
+
+    if not _has_column("text2img_task", "batch_index"):
+        op.add_column(
+            "text2img_task",
+            sa.Column(
+                "batch_index",
+                sa.Integer(),
+                nullable=True,
+                comment="在批次中的序号(从0开始)",
+            ),
+        )
+
+
+def downgrade() -> None:
+    """回滚：删除批次关联列与 text2img_batch 表。"""
+    op.drop_index("ix_text2img_task_batch_id", table_name="text2img_task")
+    op.drop_column("text2img_task", "batch_index")
+    op.drop_column("text2img_task", "batch_id")
+    op.drop_index("ix_text2img_batch_batch_id", table_name="text2img_batch")
+    op.drop_table("text2img_batch")
@@ -0,0 +1,119 @@
+"""add_generation_job: 生成任务队列表
+
+开启 generation_queue_enabled 后，API 只把文生图/图生视频任务写入
+generation_job 表，由独立 worker 进程(python -m app.worker)认领并提交到 ComfyUI。
+
+部分环境启动时已通过 Base.metadata.create_all() 建出新表，这里建表幂等。
+
+Revision ID: 20261020_generation_job
+Revises: 20261019_text2img_batch
+Create Date: 2026-10-20
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261020_generation_job"
+down_revision = "20261019_text2img_batch"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table(name)
+
+
+def upgrade() -> None:
+    """创建 generation_job 表。"""
+    if _has_table("generation_job"):
+        return
+
+    op.create_table(
+        "generation_job",
+        sa.Column("id", sa.Integer(), nullable=False, comment="主键ID"),
+        sa.Column(
+            "kind", sa.String(length=10), nullable=False, comment="任务类型: t2i/i2v"
+        ),
+        sa.Column(
+            "prompt_id",
+            sa.String(length=255),
+            nullable=False,
+            comment="预生成的 ComfyUI prompt_id",
+        ),
+        sa.Column(
+            "model_name",
+            sa.String(length=100),
+            nullable=False,
+            comment="使用的模型名称",
+        ),
+        sa.Column(
+            "payload",
+            sa.Text(),
+            nullable=False,
+            comment="提交参数 JSON(prompt/negative_prompt 等)",
+        ),
+        sa.Column(
+            "input_data",
+            sa.LargeBinary(),
+            nullable=True,
+            comment="输入图片二进制(仅图生视频)",
+        ),
+        sa.Column(
+            "status",
+            sa.String(length=20),
+            nullable=False,
+            comment="队列状态: queued/submitting/submitted/done/failed",
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False, comment="已尝试提交次数"),
+        sa.Column(
+            "available_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+            nullable=True,
+            comment="最早可被认领的时间",
+        ),
+        sa.Column(
+            "locked_by",
+            sa.String(length=100),
+            nullable=True,
+            comment="认领该任务的 worker 标识",
+        ),
+        sa.Column(
+            "locked_at", sa.DateTime(timezone=True), nullable=True, comment="认领时间"
+        ),
+        sa.Column("last_error", sa.Text(), nullable=True, comment="最近一次错误信息"),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+            nullable=True,
+            comment="创建时间",
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+            nullable=True,
+            comment="更新时间",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_generation_job_prompt_id", "generation_job", ["prompt_id"], unique=True
+    )
+    op.create_index(
+        "idx_generation_job_status_available",
+        "generation_job",
+        ["status", "available_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """回滚：删除 generation_job 表。"""
+    op.drop_index("idx_generation_job_status_available", table_name="generation_job")
+    op.drop_index("ix_generation_job_prompt_id", table_name="generation_job")
+    op.drop_table("generation_job")
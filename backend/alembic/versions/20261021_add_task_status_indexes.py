@@ -0,0 +1,69 @@
+"""add_task_status_indexes: 任务表状态/模型复合索引与 pending 部分索引
+
+text2img_task / image_to_video_task 原先只有 prompt_id 索引，按状态、创建时间
+过滤的扫描(对账、清理、管理列表)都会全表扫描。新增：
+1. (status, created_at)            按状态 + 时间范围扫描
+2. (model_name, status)            按模型统计/过滤
+3. (created_at, id) WHERE pending  pending/超时任务的键集分页扫描(部分索引)
+
+PostgreSQL 上使用 CREATE INDEX CONCURRENTLY，不阻塞线上写入；
+部分环境启动时已通过 Base.metadata.create_all() 建出索引，这里建索引幂等。
+
+Revision ID: 20261021_task_status_indexes
+Revises: 20261020_generation_job
+Create Date: 2026-10-21
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261021_task_status_indexes"
+down_revision = "20261020_generation_job"
+branch_labels = None
+depends_on = None
+
+_TABLES = ("text2img_task", "image_to_video_task")
+_PENDING_ONLY = sa.text("status = 'pending'")
+
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return any(index["name"] == name for index in inspector.get_indexes(table))
+
+
+def _indexes(table: str) -> list[tuple[str, list[str], dict]]:
+    return [
+        (f"idx_{table}_status_created", ["status", "created_at"], {}),
+        (f"idx_{table}_model_status", ["model_name", "status"], {}),
+        (
+            f"idx_{table}_pending_created",
+            ["created_at", "id"],
+            {"postgresql_where": _PENDING_ONLY, "sqlite_where": _PENDING_ONLY},
+        ),
+    ]
+
+
+def upgrade() -> None:
+    """创建任务表的复合索引与 pending 部分索引。"""
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    for table in _TABLES:
+        for name, columns, kwargs in _indexes(table):
+            if _has_index(table, name):
+                continue
+            if is_postgresql:
+                # CONCURRENTLY 不能在事务内执行
+                with op.get_context().autocommit_block():
+                    op.create_index(
+                        name, table, columns, postgresql_concurrently=True, **kwargs
+                    )
+            else:
+                op.create_index(name, table, columns, **kwargs)
+
+
+def downgrade() -> None:
+    """回滚：删除新增的索引。"""
+    for table in _TABLES:
+        for name, _columns, _kwargs in _indexes(table):
+            op.drop_index(name, table_name=table)
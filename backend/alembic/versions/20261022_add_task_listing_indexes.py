@@ -0,0 +1,51 @@
+"""add_task_listing_indexes: 任务历史列表覆盖索引
+
+GET /api/tasks 按 (created_at, id) 倒序键集分页，只返回 prompt_id / status /
+model_name / created_at。覆盖索引包含全部所需列，列表查询只读索引不回表。
+
+PostgreSQL 上使用 CREATE INDEX CONCURRENTLY，不阻塞线上写入；
+部分环境启动时已通过 Base.metadata.create_all() 建出索引，这里建索引幂等。
+
+Revision ID: 20261022_task_listing_indexes
+Revises: 20261021_task_status_indexes
+Create Date: 2026-10-22
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261022_task_listing_indexes"
+down_revision = "20261021_task_status_indexes"
+branch_labels = None
+depends_on = None
+
+_TABLES = ("text2img_task", "image_to_video_task")
+_COLUMNS = ["created_at", "id", "status", "model_name", "prompt_id"]
+
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return any(index["name"] == name for index in inspector.get_indexes(table))
+
+
+def upgrade() -> None:
+    """创建任务历史列表覆盖索引。"""
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    for table in _TABLES:
+        name = f"idx_{table}_listing"
+        if _has_index(table, name):
+            continue
+        if is_postgresql:
+            # CONCURRENTLY 不能在事务内执行
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, _COLUMNS, postgresql_concurrently=True)
+        else:
+            op.create_index(name, table, _COLUMNS)
+
+
+def downgrade() -> None:
+    """回滚：删除任务历史列表覆盖索引。"""
+    for table in _TABLES:
+        op.drop_index(f"idx_{table}_listing", table_name=table)
@@ -0,0 +1,85 @@
+"""add_client_log_groups: 客户端错误指纹与聚合表
+
+错误级别的客户端日志写入时计算归一化指纹(client_logs.fingerprint)，
+并按指纹在 client_log_groups 中累加计数、记录首次/最近出现时间，
+查询高频错误直接读聚合表，无需扫描 client_logs。
+
+部分环境启动时已通过 Base.metadata.create_all() 建出新表，这里建表/加列幂等。
+
+Revision ID: 20261023_client_log_groups
+Revises: 20261022_task_listing_indexes
+Create Date: 2026-10-23
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261023_client_log_groups"
+down_revision = "20261022_task_listing_indexes"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table(name)
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return any(col["name"] == column for col in inspector.get_columns(table))
+
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return any(index["name"] == name for index in inspector.get_indexes(table))
+
+
+def upgrade() -> None:
+    """添加 client_logs.fingerprint 列并创建 client_log_groups 表。"""
+    if not _has_column("client_logs", "fingerprint"):
+        op.add_column(
+            "client_logs",
+            sa.Column(
+                "fingerprint",
+                sa.String(length=40),
+                nullable=True,
+                comment="错误指纹(归一化 message + stack_trace 的 SHA-1)",
+            ),
+        )
+    if not _has_index("client_logs", "idx_fingerprint_timestamp"):
+        op.create_index(
+            "idx_fingerprint_timestamp", "client_logs", ["fingerprint", "timestamp"]
+        )
+
+    if _has_table("client_log_groups"):
+        return
+
+    op.create_table(
+        "client_log_groups",
+        sa.Column(
+            "fingerprint", sa.String(length=40), nullable=False, comment="错误指纹"
+        ),
+        sa.Column("level", sa.String(length=10), nullable=False, comment="日志级别"),
+        sa.Column("category", sa.String(length=20), nullable=False, comment="日志分类"),
+        sa.Column("message", sa.Text(), nullable=False, comment="首次出现时的消息"),
+        sa.Column("stack_trace", sa.Text(), nullable=True, comment="首次出现时的堆栈"),
+        sa.Column("count", sa.BigInteger(), nullable=False, comment="累计出现次数"),
+        sa.Column("first_seen", sa.DateTime(), nullable=False, comment="最早出现时间"),
+        sa.Column("last_seen", sa.DateTime(), nullable=False, comment="最近出现时间"),
+        sa.PrimaryKeyConstraint("fingerprint"),
+    )
+    op.create_index("idx_log_group_count", "client_log_groups", ["count"])
+    op.create_index("idx_log_group_last_seen", "client_log_groups", ["last_seen"])
+
+
+def downgrade() -> None:
+    """回滚：删除 client_log_groups 表与 fingerprint 列。"""
+    op.drop_index("idx_log_group_last_seen", table_name="client_log_groups")
+    op.drop_index("idx_log_group_count", table_name="client_log_groups")
+    op.drop_table("client_log_groups")
+    op.drop_index("idx_fingerprint_timestamp", table_name="client_logs")
+    with op.batch_alter_table("client_logs") as batch_op:
+        batch_op.drop_column("fingerprint")
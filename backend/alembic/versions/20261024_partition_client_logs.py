@@ -0,0 +1,229 @@
+"""partition_client_logs: client_logs 按接收时间分区
+
+- PostgreSQL: 把 client_logs 转换为 RANGE (received_at) 分区表。
+  分区表的主键必须包含分区键，无法原地转换：新建分区父表，按数据所在时间段
+  (粒度由 LOG_PARTITION_INTERVAL 决定)建好分区后整表复制，再替换旧表，
+  最后在父表上建索引(批量导入后再建索引更快)。数据量大时迁移耗时较长，
+  请在维护窗口执行。
+- SQLite: 把 client_logs 重命名为 client_logs_legacy，client_logs 改为视图；
+  应用启动时创建当前分片表并重建视图。
+
+已经是分区表 / 视图时跳过，迁移幂等。
+
+Revision ID: 20261024_client_log_partitions
+Revises: 20261023_client_log_groups
+Create Date: 2026-10-24
+"""
+
+import re
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261024_client_log_partitions"
+down_revision = "20261023_client_log_groups"
+branch_labels = None
+depends_on = None
+
+_COLUMNS = (
+    "id",
+    "level",
+    "message",
+    "stack_trace",
+    "category",
+    "tags",
+    "timestamp",
+    "received_at",
+    "fingerprint",
+)
+_SHARD_RE = re.compile(r"^client_logs_p(\d{6}|\d{8})$")
+_INDEXES = {
+    "ix_client_logs_id": ["id"],
+    "ix_client_logs_level": ["level"],
+    "ix_client_logs_category": ["category"],
+    "ix_client_logs_timestamp": ["timestamp"],
+    "idx_level_timestamp": ["level", "timestamp"],
+    "idx_received_at": ["received_at"],
+    "idx_category_timestamp": ["category", "timestamp"],
+    "idx_fingerprint_timestamp": ["fingerprint", "timestamp"],
+}
+
+
+def _interval() -> str:
+    from app.config import settings
+
+    return settings.log_partition_interval
+
+
+def _bounds(moment: datetime, interval: str) -> tuple[datetime, datetime]:
+    if interval == "day":
+        start = datetime(moment.year, moment.month, moment.day)
+        return start, start + timedelta(days=1)
+    start = datetime(moment.year, moment.month, 1)
+    if moment.month == 12:
+        return start, datetime(moment.year + 1, 1, 1)
+    return start, datetime(moment.year, moment.month + 1, 1)
+
+
+def _partition_name(start: datetime, interval: str) -> str:
+    return "client_logs_p" + start.strftime("%Y%m%d" if interval == "day" else "%Y%m")
+
+
+def _upgrade_postgresql(bind) -> None:
+    partitioned = bind.execute(
+        sa.text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = 'client_logs' AND pg_table_is_visible(c.oid)"
+        )
+    ).scalar()
+    if partitioned:
+        return
+
+    op.execute(
+        "CREATE TABLE client_logs_new ("
+        " id SERIAL NOT NULL,"
+        " level VARCHAR(10) NOT NULL,"
+        " message TEXT NOT NULL,"
+        " stack_trace TEXT,"
+        " category VARCHAR(20) NOT NULL,"
+        " tags TEXT,"
+        " timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+        " received_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+        " fingerprint VARCHAR(40),"
+        " PRIMARY KEY (id, received_at)"
+        ") PARTITION BY RANGE (received_at)"
+    )
+
+    # 为已有数据所在的每个时间段以及当前和未来两个时间段建分区
+    interval = _interval()
+    moments = [
+        row[0]
+        for row in bind.execute(
+            sa.text(
+                "SELECT DISTINCT date_trunc(:unit, COALESCE(received_at, timestamp)) "
+                "FROM client_logs"
+            ),
+            {"unit": interval},
+        )
+    ]
+    moment = datetime.utcnow()
+    for _ in range(3):
+        moments.append(moment)
+        moment = _bounds(moment, interval)[1]
+    for start, end in sorted({_bounds(m, interval) for m in moments}):
+        op.execute(
+            f'CREATE TABLE "{_partition_name(start, interval)}" '
+            f"PARTITION OF client_logs_new "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+
+    columns = ", ".join(_COLUMNS)
+    selected = columns.replace("received_at", "COALESCE(received_at, timestamp)")
+    op.execute(
+        f"INSERT INTO client_logs_new ({columns}) SELECT {selected} FROM client_logs"
+    )
+    op.execute("DROP TABLE client_logs")
+    op.execute("ALTER TABLE client_logs_new RENAME TO client_logs")
+    op.execute("ALTER SEQUENCE client_logs_new_id_seq RENAME TO client_logs_id_seq")
+    op.execute(
+        "ALTER TABLE client_logs RENAME CONSTRAINT client_logs_new_pkey TO client_logs_pkey"
+    )
+    op.execute(
+        "SELECT setval('client_logs_id_seq', COALESCE((SELECT max(id) FROM client_logs), 0) + 1, false)"
+    )
+    for name, index_columns in _INDEXES.items():
+        op.create_index(name, "client_logs", index_columns)
+
+
+def _upgrade_sqlite(bind) -> None:
+    kind = bind.execute(
+        sa.text("SELECT type FROM sqlite_master WHERE name = 'client_logs'")
+    ).scalar()
+    if kind != "table":
+        return
+    op.execute('ALTER TABLE "client_logs" RENAME TO "client_logs_legacy"')
+    columns = ", ".join(f'"{column}"' for column in _COLUMNS)
+    op.execute(
+        f'CREATE VIEW "client_logs" AS SELECT {columns} FROM "client_logs_legacy"'
+    )
+
+
+def upgrade() -> None:
+    """把 client_logs 转换为分区表(PostgreSQL) / 分片视图(SQLite)。"""
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("client_logs"):
+        return
+    if bind.dialect.name == "postgresql":
+        _upgrade_postgresql(bind)
+    elif bind.dialect.name == "sqlite":
+        _upgrade_sqlite(bind)
+
+
+def _sqlite_columns(bind, table: str) -> set[str]:
+    return {row[1] for row in bind.execute(sa.text(f'PRAGMA table_info("{table}")'))}
+
+
+def _downgrade_sqlite(bind) -> None:
+    kind = bind.execute(
+        sa.text("SELECT type FROM sqlite_master WHERE name = 'client_logs'")
+    ).scalar()
+    if kind != "view":
+        return
+    tables = set(
+        bind.execute(
+            sa.text("SELECT name FROM sqlite_master WHERE type = 'table'")
+        ).scalars()
+    )
+    shards = sorted(name for name in tables if _SHARD_RE.match(name))
+
+    # 全文索引表由应用启动时创建，随分片一起删除(插入触发器随分片表删除)
+    for shard in sorted(tables & {"client_logs_legacy"}) + shards:
+        op.execute(f'DROP TRIGGER IF EXISTS "{shard}_fts_insert"')
+        op.execute(f'DROP TABLE IF EXISTS "{shard}_fts"')
+
+    op.execute('DROP VIEW "client_logs"')
+    if "client_logs_legacy" in tables:
+        op.execute('ALTER TABLE "client_logs_legacy" RENAME TO "client_logs"')
+        if "fingerprint" not in _sqlite_columns(bind, "client_logs"):
+            op.add_column("client_logs", sa.Column("fingerprint", sa.String(40)))
+    else:
+        op.create_table(
+            "client_logs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("level", sa.String(10), nullable=False),
+            sa.Column("message", sa.Text(), nullable=False),
+            sa.Column("stack_trace", sa.Text()),
+            sa.Column("category", sa.String(20), nullable=False),
+            sa.Column("tags", sa.Text()),
+            sa.Column("timestamp", sa.DateTime(), nullable=False),
+            sa.Column("received_at", sa.DateTime()),
+            sa.Column("fingerprint", sa.String(40)),
+        )
+    indexes = {index["name"] for index in sa.inspect(bind).get_indexes("client_logs")}
+    for name, index_columns in _INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, "client_logs", index_columns)
+
+    # 分片的 id 延续自全局最大 id，不会与旧表冲突
+    for shard in shards:
+        present = _sqlite_columns(bind, shard)
+        columns = ", ".join(f'"{column}"' for column in _COLUMNS if column in present)
+        op.execute(
+            f'INSERT INTO "client_logs" ({columns}) SELECT {columns} FROM "{shard}"'
+        )
+        op.execute(f'DROP TABLE "{shard}"')
+
+
+def downgrade() -> None:
+    """回滚：SQLite 把各分片合并回一张普通的 client_logs 表。
+
+    PostgreSQL 分区表对应用透明，保留原样，不做逆向转换；20261023 的回滚
+    (删除 fingerprint 列与索引)在分区父表上同样可以执行。
+    """
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        _downgrade_sqlite(bind)
@@ -0,0 +1,41 @@
+"""client_log_search: 客户端日志消息全文检索索引
+
+- PostgreSQL: 在 client_logs 上创建 to_tsvector('simple', message) GIN 索引；
+  分区表上建索引会同时为每个分区建索引，之后新建的分区自动继承。
+- SQLite: 每个分片的 FTS5 索引表由应用启动时创建(已有数据的分片首次启动时重建)，
+  这里无需操作。
+
+Revision ID: 20261025_client_log_search
+Revises: 20261024_client_log_partitions
+Create Date: 2026-10-25
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261025_client_log_search"
+down_revision = "20261024_client_log_partitions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """创建消息全文检索 GIN 索引(仅 PostgreSQL)."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    if not sa.inspect(bind).has_table("client_logs"):
+        return
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_message_fts ON client_logs "
+        "USING gin (to_tsvector('simple', message))"
+    )
+
+
+def downgrade() -> None:
+    """回滚：删除全文检索索引."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS idx_message_fts")
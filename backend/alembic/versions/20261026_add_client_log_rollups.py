@@ -0,0 +1,88 @@
+"""add_client_log_rollups: 客户端日志分钟/小时计数汇总表
+
+写入日志时按 (粒度, 时间桶, 级别, 分类) 累加计数，/api/logs/stats 只读汇总表。
+建表后用已有日志回填：小时汇总回填全部日志，分钟汇总只回填最近
+LOG_ROLLUP_MINUTE_DAYS 天(更早的会被维护任务删除)。日志量大时回填耗时较长。
+
+部分环境启动时已通过 Base.metadata.create_all() 建出新表，已存在时跳过(含回填)。
+
+Revision ID: 20261026_client_log_rollups
+Revises: 20261025_client_log_search
+Create Date: 2026-10-26
+"""
+
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261026_client_log_rollups"
+down_revision = "20261025_client_log_search"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table(name)
+
+
+def _bucket_expr(dialect: str, granularity: str) -> str:
+    if dialect == "postgresql":
+        return f"date_trunc('{granularity}', timestamp)"
+    # 与 SQLAlchemy DateTime 在 SQLite 中的存储格式一致
+    if granularity == "hour":
+        return "strftime('%Y-%m-%d %H:00:00.000000', timestamp)"
+    return "strftime('%Y-%m-%d %H:%M:00.000000', timestamp)"
+
+
+def _backfill(granularity: str, since: datetime | None) -> None:
+    bind = op.get_bind()
+    bucket = _bucket_expr(bind.dialect.name, granularity)
+    where = "WHERE timestamp >= :since" if since is not None else ""
+    statement = sa.text(
+        "INSERT INTO client_log_rollups (granularity, bucket, level, category, count) "
+        f"SELECT :granularity, {bucket}, level, category, count(*) FROM client_logs "
+        f"{where} GROUP BY {bucket}, level, category"
+    )
+    params = {"granularity": granularity}
+    if since is not None:
+        statement = statement.bindparams(sa.bindparam("since", type_=sa.DateTime()))
+        params["since"] = since
+    bind.execute(statement, params)
+
+
+def upgrade() -> None:
+    """创建 client_log_rollups 表并用已有日志回填."""
+    if _has_table("client_log_rollups"):
+        return
+
+    op.create_table(
+        "client_log_rollups",
+        sa.Column(
+            "granularity", sa.String(length=6), nullable=False, comment="minute / hour"
+        ),
+        sa.Column("bucket", sa.DateTime(), nullable=False, comment="时间桶起点(UTC)"),
+        sa.Column("level", sa.String(length=10), nullable=False, comment="日志级别"),
+        sa.Column("category", sa.String(length=20), nullable=False, comment="日志分类"),
+        sa.Column("count", sa.BigInteger(), nullable=False, comment="日志条数"),
+        sa.PrimaryKeyConstraint("granularity", "bucket", "level", "category"),
+    )
+
+    if not _has_table("client_logs"):
+        return
+    from app.config import settings
+
+    _backfill("hour", None)
+    if settings.log_rollup_minute_days > 0:
+        _backfill(
+            "minute",
+            datetime.utcnow() - timedelta(days=settings.log_rollup_minute_days),
+        )
+
+
+def downgrade() -> None:
+    """回滚：删除 client_log_rollups 表."""
+    op.drop_table("client_log_rollups")
@@ -4,23 +4,87 @@
 
 This module provides upload, list, download, and delete functionality
 for user database backups.
+
+新上传的备份默认切块去重存储(见 services/backup_chunks.py)，备份清单记录
+每个备份的块列表；关闭 BACKUP_DEDUP_ENABLED 或历史备份仍以完整文件保存。
+去重块由后台任务压缩为 zstd 帧(见 services/backup_compression.py)，下载时解压输出，
+客户端声明 Accept-Encoding: zstd 时直接输出压缩流。
+大文件可通过断点续传接口(/upload/init、/chunk、/status、/complete)分块并行上传，
+见 services/backup_uploads.py。
+过期备份按祖父-父-子策略清理(/retention)，见 services/backup_retention.py。
 """
 
-import shutil
+import asyncio
+import contextlib
+import logging
+import sqlite3
+from collections.abc import AsyncIterator
 from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import FileResponse
-
+from typing import BinaryIO, Literal
+from urllib.parse import quote
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import Response, StreamingResponse
+
+from ...config import settings
+from ...constants import (
+    BACKUP_LIST_DEFAULT_PAGE_SIZE,
+    BACKUP_LIST_MAX_PAGE_SIZE,
+    BACKUP_UPLOAD_CHUNK_BYTES,
+    BACKUP_UPLOAD_SESSION_MAX_AGE,
+)
 from ...deps.auth import verify_token
-from ...schemas import BackupInfo, BackupListResponse, BackupUploadResponse
+from ...schemas import (
+    BackupArchiveRequest,
+    BackupChunkUploadResponse,
+    BackupInfo,
+    BackupListResponse,
+    BackupRetentionResponse,
+    BackupStatsResponse,
+    BackupUploadInitRequest,
+    BackupUploadInitResponse,
+    BackupUploadResponse,
+    BackupUploadStatusResponse,
+)
+from ...services.backup_archive import ArchiveMember, stream_zip
+from ...services.backup_chunks import (
+    compressed_length,
+    read_blocks,
+    stream_recipe,
+    stream_recipe_zstd,
+)
+from ...services.backup_compression import backup_compressor
+from ...services.backup_manifest import (
+    BACKUP_DIR,
+    BackupCursor,
+    BackupRecord,
+    backup_manifest,
+    chunk_store,
+    is_backup_file,
+)
+from ...services.backup_retention import RetentionPolicy, backup_retention_service
+from ...services.backup_store import (
+    file_sha256,
+    move_into,
+    store_upload,
+    stream_file,
+)
+from ...services.backup_uploads import UploadSession, upload_sessions
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/backup", tags=["backup"])
 
-# 备份存储目录
-BACKUP_DIR = Path("backups")
-
 
 def _safe_backup_path(backup_id: str) -> Path:
     """根据 backup_id 解析安全路径，防止路径穿越攻击.
@@ -45,9 +109,268 @@ def _safe_backup_path(backup_id: str) -> Path:
     if base_resolved not in candidate.parents and candidate != base_resolved:
         raise HTTPException(status_code=403, detail="非法的备份路径")
 
+    # 以 . 开头的文件和目录(备份清单、临时文件)不对外开放
+    if any(part.startswith(".") for part in candidate.relative_to(base_resolved).parts):
+        raise HTTPException(status_code=403, detail="非法的备份路径")
+
     return candidate
 
 
+def _backup_id(file_path: Path) -> str:
+    """备份文件的 backup_id（相对 BACKUP_DIR 的路径，使用 POSIX 分隔符）."""
+    return file_path.relative_to(BACKUP_DIR.resolve()).as_posix()
+
+
+def _content_disposition(filename: str) -> str:
+    """附件下载头，非 ASCII 文件名按 RFC 5987 编码."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def _accepts_zstd(accept_encoding: str | None) -> bool:
+    """Accept-Encoding 中是否声明接受 zstd(q=0 视为不接受)."""
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() != "zstd":
+            continue
+        quality = params.strip().lower()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _stored_filename(filename: str | None) -> str:
+    """校验上传文件名，返回存储文件名(只取最后一段，防止文件名携带路径)."""
+    if not filename:
+        raise HTTPException(status_code=400, detail="文件名不能为空")
+
+    if not filename.lower().endswith((".db", ".zip")):
+        raise HTTPException(
+            status_code=400, detail="仅支持.db或.zip格式的备份文件"
+        )
+
+    stored_filename = Path(filename.replace("\\", "/")).name
+    if not is_backup_file(stored_filename) or stored_filename.startswith("."):
+        raise HTTPException(status_code=400, detail="非法的文件名")
+    return stored_filename
+
+
+def _taken(path: Path) -> bool:
+    """存储路径是否已被去重备份占用(去重备份在目录中没有对应文件)."""
+    return backup_manifest.contains(path.relative_to(BACKUP_DIR).as_posix())
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """解析单段 Range 请求头，返回 [start, end) .
+
+    不是 bytes 单位、多段或语法错误时返回 None(按 RFC 9110 忽略 Range，返回完整内容)。
+
+    Raises:
+        ValueError: 范围无法满足(应返回 416)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last):
+        return None
+    if not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # 后缀范围: 最后 N 个字节
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - suffix, 0), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last) + 1, size) if last else size
+
+
+def _zstd_etag(etag: str) -> str:
+    """zstd 直通压缩流的 ETag(与原始内容的 ETag 区分)."""
+    return etag[:-1] + '-zstd"'
+
+
+def _if_range_matches(if_range: str | None, etag: str, mtime_ns: int) -> bool:
+    """If-Range 是否与当前备份一致(不一致时忽略 Range).
+
+    If-Range 可以是 ETag(强比较，弱 ETag 永远不匹配)或 HTTP 日期。
+    原始内容与 zstd 压缩流的 ETag 对应同一版本的备份，均视为匹配：
+    Range 总是按原始内容计算，客户端透明解压后按已写入的字节数续传即可。
+    """
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', "W/")):
+        return if_range in (etag, _zstd_etag(etag))
+    try:
+        return int(parsedate_to_datetime(if_range).timestamp()) == mtime_ns // 10**9
+    except (TypeError, ValueError):
+        return False
+
+
+async def _resolve_backup(backup_id: str) -> tuple[BackupRecord, Path]:
+    """按 backup_id 查找备份记录与路径，不存在时返回 404.
+
+    清单中没有记录的文件(尚未对账)按文件生成记录。
+    """
+    file_path = _safe_backup_path(backup_id)
+    record = await backup_manifest.get(_backup_id(file_path))
+    if record is not None and record.storage == "chunked":
+        return record, file_path
+    if not file_path.is_file():
+        raise HTTPException(status_code=404, detail=f"备份文件不存在: {backup_id}")
+    try:
+        stat = file_path.stat()
+    except OSError:
+        raise HTTPException(status_code=404, detail=f"备份文件不存在: {backup_id}")
+    if record is None or (record.file_size, record.mtime_ns) != (
+        stat.st_size,
+        stat.st_mtime_ns,
+    ):
+        # 文件在对账之外被改动，上传时的 SHA-256 不再可信
+        record = BackupRecord.from_file(
+            BACKUP_DIR.resolve(),
+            file_path,
+            record.filename if record else None,
+        )
+    return record, file_path
+
+
+async def _backup_content(
+    record: BackupRecord, file_path: Path, start: int = 0, end: int | None = None
+) -> AsyncIterator[bytes]:
+    """输出备份 [start, end) 范围的原始内容."""
+    length = None if end is None else end - start
+    if record.storage != "chunked":
+        async for data in stream_file(file_path, start, length):
+            yield data
+        return
+    # 按块偏移定位，只读取覆盖范围的块
+    recipe = await backup_manifest.recipe(record.backup_id, start, end)
+    if not recipe:
+        return
+    async for data in stream_recipe(
+        chunk_store, recipe, start - recipe[0].offset, length
+    ):
+        yield data
+
+
+async def _store_chunked(
+    source: BinaryIO,
+    filename: str,
+    date_str: str,
+    stored_filename: str,
+    sha256: str | None = None,
+) -> tuple[BackupRecord, int]:
+    """切块写入块存储并登记清单，返回 (记录, 新写入字节数).
+
+    Raises:
+        ValueError: 内容与期望的 SHA-256 不一致(本次写入的块已释放)
+    """
+
+    async def ingest() -> tuple[BackupRecord, int]:
+        await asyncio.to_thread(source.seek, 0)
+        result = await asyncio.to_thread(
+            chunk_store.ingest, read_blocks(source, BACKUP_UPLOAD_CHUNK_BYTES)
+        )
+        if sha256 is not None and result.sha256 != sha256:
+            await backup_manifest.discard_chunks({d for d, _ in result.chunks})
+            raise ValueError(f"文件 SHA-256 校验失败: {result.sha256}")
+        record = await backup_manifest.add_chunked(
+            date_str, filename, stored_filename, result
+        )
+        return record, result.new_bytes
+
+    try:
+        stored = await ingest()
+    except FileNotFoundError:
+        # 引用的块在登记前恰好随其他备份被删除(极少发生)，重新写入一次
+        stored = await ingest()
+    # 新写入的块由后台任务压缩
+    backup_compressor.notify()
+    return stored
+
+
+async def _register_file(path: Path, filename: str, sha256: str) -> BackupRecord:
+    """在清单中登记已落盘的完整备份文件."""
+    try:
+        return await backup_manifest.add_file(path, filename, sha256)
+    except (OSError, sqlite3.Error) as e:
+        # 文件已落盘，下次启动对账会补录
+        logger.warning(f"备份清单登记失败: {path}: {e}")
+        return BackupRecord.from_file(BACKUP_DIR, path, filename, sha256)
+
+
+async def _store_file(
+    file: UploadFile, filename: str, date_str: str, stored_filename: str
+) -> tuple[BackupRecord, int]:
+    """以完整文件写入日期目录并登记清单，返回 (记录, 新写入字节数)."""
+    date_dir = BACKUP_DIR / date_str
+    date_dir.mkdir(parents=True, exist_ok=True)
+
+    stored = await asyncio.to_thread(
+        store_upload, file.file, date_dir, stored_filename, _taken
+    )
+    record = await _register_file(stored.path, filename, stored.sha256)
+    return record, stored.size
+
+
+async def _adopt_file(
+    source: Path,
+    filename: str,
+    date_str: str,
+    stored_filename: str,
+    sha256: str | None = None,
+) -> tuple[BackupRecord, int]:
+    """把断点续传的数据文件直接重命名为完整备份文件并登记清单.
+
+    Raises:
+        ValueError: 内容与期望的 SHA-256 不一致
+    """
+    digest = await asyncio.to_thread(file_sha256, source)
+    if sha256 is not None and digest != sha256:
+        raise ValueError(f"文件 SHA-256 校验失败: {digest}")
+    date_dir = BACKUP_DIR / date_str
+    date_dir.mkdir(parents=True, exist_ok=True)
+    path = await asyncio.to_thread(move_into, source, date_dir, stored_filename, _taken)
+    record = await _register_file(path, filename, digest)
+    return record, record.file_size
+
+
+def _upload_response(
+    record: BackupRecord, filename: str, stored_bytes: int
+) -> BackupUploadResponse:
+    """生成上传响应（返回相对路径，方便跨平台）."""
+    return BackupUploadResponse(
+        filename=filename,
+        stored_path=str(BACKUP_DIR / record.backup_id),
+        file_size=record.file_size,
+        uploaded_at=datetime.now().isoformat(),
+        stored_name=record.stored_name,
+        sha256=record.sha256,
+        stored_bytes=stored_bytes,
+    )
+
+
+async def _upload_session(upload_id: str) -> UploadSession:
+    """读取断点续传会话，不存在时返回 404."""
+    try:
+        return await asyncio.to_thread(upload_sessions.get, upload_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="上传任务不存在、已完成或已过期")
+
+
 @router.post("/upload", response_model=BackupUploadResponse)
 async def upload_backup(
     file: UploadFile = File(..., description="数据库备份文件(.db)"),
@@ -64,6 +387,9 @@ async def upload_backup(
     - 按日期组织存储目录 (YYYY-MM-DD/)
     - 保留所有历史文件（不覆盖）
     - 使用原文件名，同名文件时追加时间戳避免冲突
+    - 写入与 SHA-256 计算在线程池中分块进行，不阻塞事件循环
+    - 默认切块去重存储，与历史备份相同的内容不重复占用空间
+    - 完整文件存储时先写临时文件再原子重命名，列表中不会出现写了一半的备份
 
     **认证**: 需要X-API-TOKEN header
 
@@ -81,152 +407,408 @@ async def upload_backup(
       "stored_path": "backups/2025-01-28/novel_app_backup.db",
       "file_size": 1048576,
       "uploaded_at": "2025-01-28T12:34:56",
-      "stored_name": "novel_app_backup.db"
+      "stored_name": "novel_app_backup.db",
+      "sha256": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+      "stored_bytes": 65536
     }
     ```
     """
-    # 1. 验证文件扩展名
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="文件名不能为空")
+    # 1. 验证文件扩展名，存储文件名只取最后一段，防止文件名携带路径
+    #    (文件名为空时 _stored_filename 返回 400)
+    filename = file.filename or ""
+    stored_filename = _stored_filename(filename)
+
+    # 2. 按日期分目录存储：在线程池中分块写入并计算 SHA-256
+    #    - 去重存储：只写入块存储中还没有的块，清单记录块列表
+    #    - 完整文件：先写临时文件再原子重命名，写入中断不会留下半个备份
+    #    同名备份已存在时追加时间戳
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    try:
+        if settings.backup_dedup_enabled:
+            record, stored_bytes = await _store_chunked(
+                file.file, filename, date_str, stored_filename
+            )
+        else:
+            record, stored_bytes = await _store_file(
+                file, filename, date_str, stored_filename
+            )
+    except (OSError, sqlite3.Error) as e:
+        raise HTTPException(status_code=500, detail=f"文件写入失败: {str(e)}")
+    finally:
+        # 确保文件对象被关闭
+        await file.close()
 
-    if not file.filename.lower().endswith((".db", ".zip")):
-        raise HTTPException(
-            status_code=400, detail="仅支持.db或.zip格式的备份文件"
-        )
+    # 3. 生成响应
+    return _upload_response(record, filename, stored_bytes)
 
-    # 2. 生成存储路径（按日期分目录）
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    date_dir = BACKUP_DIR / date_str
 
-    # 创建日期目录
-    try:
-        date_dir.mkdir(parents=True, exist_ok=True)
-    except OSError as e:
-        raise HTTPException(
-            status_code=500, detail=f"无法创建备份目录: {str(e)}"
-        )
+@router.post("/upload/init", response_model=BackupUploadInitResponse)
+async def init_backup_upload(
+    payload: BackupUploadInitRequest,
+    authenticated: bool = Depends(verify_token),
+):
+    """
+    初始化断点续传上传，返回 upload_id.
 
-    # 3. 确定存储文件名（避免冲突）
-    original_filename = file.filename
-    stored_filename = original_filename
-    file_path = date_dir / stored_filename
-
-    # 如果文件已存在，追加时间戳
-    if file_path.exists():
-        timestamp = datetime.now().strftime("%H%M%S")
-        # 按真实扩展名拆分（支持 .db 和 .zip）
-        if original_filename.lower().endswith(".zip"):
-            name_without_ext = original_filename[:-4]  # 去掉.zip
-            new_ext = ".zip"
-        else:
-            name_without_ext = original_filename[:-3]  # 去掉.db
-            new_ext = ".db"
-        stored_filename = f"{name_without_ext}_{timestamp}{new_ext}"
-        file_path = date_dir / stored_filename
+    之后按 chunk_size 切分文件，把每个分块 POST 到 /upload/{upload_id}/chunk/{index}
+    (可并行、可重传)，连接中断后通过 /upload/{upload_id}/status 查询已接收的分块，
+    只补传缺失的部分，全部完成后调用 /upload/{upload_id}/complete。
+    超过 3 天没有新分块的上传任务会被清理。
 
-    # 4. 流式写入文件（避免大文件占用过多内存）
+    **认证**: 需要 X-API-TOKEN header
+    """
+    _stored_filename(payload.filename)
     try:
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 顺带清理过期的上传任务
+        await asyncio.to_thread(upload_sessions.cleanup, BACKUP_UPLOAD_SESSION_MAX_AGE)
+        session = await asyncio.to_thread(
+            upload_sessions.create,
+            payload.filename,
+            payload.total_size,
+            payload.chunk_size,
+            payload.sha256,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except OSError as e:
-        raise HTTPException(status_code=500, detail=f"文件写入失败: {str(e)}")
-    finally:
-        # 确保文件对象被关闭
-        file.file.close()
+        raise HTTPException(status_code=500, detail=f"无法创建上传任务: {e}")
+
+    return BackupUploadInitResponse(
+        upload_id=session.upload_id,
+        chunk_size=session.chunk_size,
+        total_chunks=session.total_chunks,
+    )
+
+
+@router.post(
+    "/upload/{upload_id}/chunk/{index}",
+    response_model=BackupChunkUploadResponse,
+)
+async def upload_backup_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    authenticated: bool = Depends(verify_token),
+):
+    """
+    上传一个分块（二进制 body，application/octet-stream）.
+
+    - 请求头 X-Chunk-SHA256 为分块内容的 SHA-256，校验不通过返回 422，不写入
+    - 幂等：同一 (upload_id, index) 重复上传会覆盖已有分块
+    - 不同分块写入数据文件的不同位置，可以并行上传
+
+    **认证**: 需要 X-API-TOKEN header
+    """
+    expected = request.headers.get("x-chunk-sha256", "")
+    if len(expected) != 64:
+        raise HTTPException(status_code=400, detail="缺少或非法的 X-Chunk-SHA256")
+
+    session = await _upload_session(upload_id)
+    if not 0 <= index < session.total_chunks:
+        raise HTTPException(status_code=400, detail="index 超出 total_chunks 范围")
+
+    # 分块上限 32MB，在内存中校验后一次写入
+    length = session.chunk_length(index)
+    parts: list[bytes] = []
+    received = 0
+    async for part in request.stream():
+        received += len(part)
+        if received > length:
+            raise HTTPException(
+                status_code=400, detail=f"分块 {index} 超过应有长度 {length}"
+            )
+        parts.append(part)
 
-    # 5. 获取文件大小
     try:
-        file_size = file_path.stat().st_size
+        await asyncio.to_thread(
+            upload_sessions.write_chunk, session, index, b"".join(parts), expected
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="上传任务不存在、已完成或已过期")
     except OSError as e:
-        file_size = 0
+        raise HTTPException(status_code=500, detail=f"分块写入失败: {e}")
 
-    # 6. 生成响应（返回相对路径，方便跨平台）
-    stored_path = str(file_path)
+    return BackupChunkUploadResponse(
+        index=index, received_bytes=received, sha256=expected.lower()
+    )
 
-    return BackupUploadResponse(
-        filename=original_filename,
-        stored_path=stored_path,
-        file_size=file_size,
-        uploaded_at=datetime.now().isoformat(),
-        stored_name=stored_filename,
+
+@router.get(
+    "/upload/{upload_id}/status",
+    response_model=BackupUploadStatusResponse,
+)
+async def get_backup_upload_status(
+    upload_id: str,
+    authenticated: bool = Depends(verify_token),
+):
+    """
+    查询断点续传状态，返回已接收的分块序号集合.
+
+    **认证**: 需要 X-API-TOKEN header
+    """
+    session = await _upload_session(upload_id)
+    try:
+        received = await asyncio.to_thread(upload_sessions.received, session)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="上传任务不存在、已完成或已过期")
+
+    return BackupUploadStatusResponse(
+        upload_id=upload_id,
+        filename=session.filename,
+        total_size=session.total_size,
+        chunk_size=session.chunk_size,
+        total_chunks=session.total_chunks,
+        received_indices=received,
+        complete=len(received) == session.total_chunks,
     )
 
 
-@router.get("/list", response_model=BackupListResponse)
-async def list_backups(
+@router.post(
+    "/upload/{upload_id}/complete",
+    response_model=BackupUploadResponse,
+)
+async def complete_backup_upload(
+    upload_id: str,
     authenticated: bool = Depends(verify_token),
 ):
     """
-    列出服务器上所有备份文件.
+    校验分块齐全后完成上传，返回与 /upload 相同的结果.
 
-    按修改时间倒序排列。backup_id 是相对路径，可直接用于
-    /download/{backup_id} 和 /delete/{backup_id}。
+    - 数据文件已是完整备份，不再拼接复制：去重存储直接从中切块写入，
+      完整文件存储直接重命名到日期目录
+    - 初始化时提供了 sha256 的，内容不一致返回 422 并作废本次上传
+    - 其他写入错误返回 500，上传任务保留，可重试完成
 
     **认证**: 需要 X-API-TOKEN header
     """
-    # 若备份目录不存在则创建空目录，返回空列表
-    if not BACKUP_DIR.exists():
-        BACKUP_DIR.mkdir(parents=True, exist_ok=True)
-        return BackupListResponse(backups=[])
+    session = await _upload_session(upload_id)
+    received = await asyncio.to_thread(upload_sessions.received, session)
+    if len(received) != session.total_chunks:
+        missing = next(i for i in range(session.total_chunks) if i not in received)
+        raise HTTPException(status_code=409, detail=f"分块不完整，缺失: {missing}")
 
-    backups: list[BackupInfo] = []
+    try:
+        session, data_path = await asyncio.to_thread(upload_sessions.claim, upload_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=409, detail="上传任务正在完成或已完成")
 
-    # 遍历 BACKUP_DIR 下所有 .db 或 .zip 备份文件
-    for db_file in BACKUP_DIR.rglob("*"):
-        if not db_file.is_file():
-            continue
-        if not db_file.name.lower().endswith((".db", ".zip")):
-            continue
+    stored_filename = _stored_filename(session.filename)
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    try:
+        if settings.backup_dedup_enabled:
+            with data_path.open("rb") as source:
+                record, stored_bytes = await _store_chunked(
+                    source, session.filename, date_str, stored_filename, session.sha256
+                )
+        else:
+            record, stored_bytes = await _adopt_file(
+                data_path, session.filename, date_str, stored_filename, session.sha256
+            )
+    except ValueError as e:
+        await asyncio.to_thread(upload_sessions.discard, upload_id)
+        raise HTTPException(status_code=422, detail=str(e))
+    except (OSError, sqlite3.Error) as e:
+        with contextlib.suppress(OSError):
+            await asyncio.to_thread(upload_sessions.release, upload_id)
+        raise HTTPException(status_code=500, detail=f"文件写入失败: {e}")
 
-        try:
-            stat = db_file.stat()
-        except OSError:
-            continue
+    await asyncio.to_thread(upload_sessions.discard, upload_id)
+    return _upload_response(record, session.filename, stored_bytes)
 
-        # 计算 backup_id（相对 BACKUP_DIR 的路径，使用 POSIX 分隔符）
-        backup_id = db_file.relative_to(BACKUP_DIR).as_posix()
 
-        # 文件名（不含日期目录）
-        stored_name = db_file.name
+@router.delete("/upload/{upload_id}")
+async def cancel_backup_upload(
+    upload_id: str,
+    authenticated: bool = Depends(verify_token),
+):
+    """
+    取消断点续传上传，删除已接收的分块.
 
-        backups.append(
-            BackupInfo(
-                filename=stored_name,
-                file_size=stat.st_size,
-                stored_name=stored_name,
-                backup_id=backup_id,
-                uploaded_at=datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            )
-        )
+    **认证**: 需要 X-API-TOKEN header
+    """
+    try:
+        await asyncio.to_thread(upload_sessions.get, upload_id)
+    except FileNotFoundError:
+        return {"message": "上传任务不存在或已清理", "upload_id": upload_id}
+    await asyncio.to_thread(upload_sessions.discard, upload_id)
+    return {"message": "上传已取消", "upload_id": upload_id}
 
-    # 按修改时间倒序
-    backups.sort(key=lambda b: b.uploaded_at, reverse=True)
 
-    return BackupListResponse(backups=backups)
+@router.get("/list", response_model=BackupListResponse)
+async def list_backups(
+    sort: Literal["uploaded_at", "file_size", "filename"] = Query(
+        "uploaded_at", description="排序字段: 上传时间 / 文件大小 / 文件名"
+    ),
+    order: Literal["desc", "asc"] = Query("desc", description="排序方向"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor"),
+    limit: int = Query(
+        BACKUP_LIST_DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=BACKUP_LIST_MAX_PAGE_SIZE,
+        description="每页条数",
+    ),
+    authenticated: bool = Depends(verify_token),
+):
+    """
+    列出服务器上的备份文件.
+
+    从备份清单读取（不遍历备份目录），默认按上传时间倒序，键集分页：
+    翻页时把响应中的 next_cursor 原样传回 cursor 参数（排序参数需保持不变）。
+    backup_id 是相对路径，可直接用于 /download/{backup_id} 和 /delete/{backup_id}。
+
+    **认证**: 需要 X-API-TOKEN header
+    """
+    try:
+        after = BackupCursor.decode(cursor) if cursor else None
+        page = await backup_manifest.page(
+            sort=sort, descending=order == "desc", after=after, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return BackupListResponse(
+        backups=[
+            BackupInfo(
+                filename=record.filename,
+                file_size=record.file_size,
+                stored_name=record.stored_name,
+                backup_id=record.backup_id,
+                uploaded_at=record.uploaded_at.isoformat(),
+                sha256=record.sha256,
+            )
+            for record in page.items
+        ],
+        total=page.total,
+        next_cursor=page.next_cursor.encode() if page.next_cursor else None,
+    )
 
 
 @router.get("/download/{backup_id:path}")
 async def download_backup(
     backup_id: str,
+    request: Request,
     authenticated: bool = Depends(verify_token),
 ):
     """
     下载备份文件.
 
+    去重存储的备份按块列表顺序流式拼接输出，压缩存储的块逐块解压。
+    请求头包含 Accept-Encoding: zstd 时不解压，直接输出 zstd seekable 格式的压缩流
+    (Content-Encoding: zstd，每个块一个帧，末尾附跳转表)，传输量约为原始大小的几分之一。
+
+    **断点续传**: 响应带 ETag(内容 SHA-256)与 Last-Modified，支持单段 Range 请求
+    (bytes=start-end / start- / -suffix)，返回 206 与 Content-Range；
+    If-Range 与当前 ETag 或 Last-Modified 不一致时(备份已变化)返回完整内容。
+    去重备份按块偏移直接定位到起始块，不读取之前的内容。带 Range 的请求总是返回
+    原始内容(不使用 zstd 直通)，偏移按原始内容计算；If-Range 回传收到的任一 ETag
+    (原始内容的 "<sha256>" 或压缩流的 "<sha256>-zstd")均可。
+
     **认证**: 需要 X-API-TOKEN header
     """
-    file_path = _safe_backup_path(backup_id)
+    record, file_path = await _resolve_backup(backup_id)
+    last_modified = formatdate(record.mtime_ns / 1e9, usegmt=True)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": record.etag,
+        "Last-Modified": last_modified,
+        "Content-Disposition": _content_disposition(record.stored_name),
+    }
+    if record.storage == "chunked":
+        headers["Vary"] = "Accept-Encoding"
 
-    if not file_path.exists() or not file_path.is_file():
-        raise HTTPException(status_code=404, detail=f"备份文件不存在: {backup_id}")
+    byte_range = None
+    if "range" in request.headers and _if_range_matches(
+        request.headers.get("if-range"), record.etag, record.mtime_ns
+    ):
+        try:
+            byte_range = _parse_range(request.headers["range"], record.file_size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{record.file_size}"},
+            )
 
-    # 提取纯文件名作为下载时的 filename
-    download_name = file_path.name
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{record.file_size}"
+        headers["Content-Length"] = str(end - start)
+        return StreamingResponse(
+            _backup_content(record, file_path, start, end),
+            status_code=206,
+            media_type="application/octet-stream",
+            headers=headers,
+        )
+
+    # 带 Range 的请求(包括 If-Range 不一致时回退的完整响应)总是返回原始内容，
+    # 续传时的字节偏移与 ETag 都以原始内容为准
+    if (
+        record.storage == "chunked"
+        and "range" not in request.headers
+        and _accepts_zstd(request.headers.get("accept-encoding"))
+    ):
+        recipe = await backup_manifest.recipe(record.backup_id)
+        # 压缩流是另一种表示，ETag 需与原始内容区分
+        headers["ETag"] = _zstd_etag(record.etag)
+        headers["Content-Encoding"] = "zstd"
+        # 仍有未压缩的块时压缩流长度无法预先确定，使用分块传输
+        length = compressed_length(recipe)
+        if length is not None:
+            headers["Content-Length"] = str(length)
+        return StreamingResponse(
+            stream_recipe_zstd(chunk_store, recipe),
+            media_type="application/octet-stream",
+            headers=headers,
+        )
 
-    return FileResponse(
-        path=file_path,
+    headers["Content-Length"] = str(record.file_size)
+    return StreamingResponse(
+        _backup_content(record, file_path),
         media_type="application/octet-stream",
-        filename=download_name,
+        headers=headers,
+    )
+
+
+@router.post("/archive")
+async def archive_backups(
+    payload: BackupArchiveRequest,
+    authenticated: bool = Depends(verify_token),
+):
+    """
+    把多个备份打包为一个 ZIP 下载.
+
+    边读取边输出(ZIP 条目使用数据描述符)，不生成临时文件；条目路径即 backup_id。
+    默认仅存储不压缩，compress=true 时使用 DEFLATE。
+    任一备份不存在时返回 404(在开始输出之前检查)。
+
+    **认证**: 需要 X-API-TOKEN header
+
+    **示例请求**:
+    ```bash
+    curl -X POST "http://localhost:3800/api/backup/archive" \\
+         -H "X-API-TOKEN: your-token" -H "Content-Type: application/json" \\
+         -d '{"backup_ids": ["2025-01-27/novel_app_backup.db", "2025-01-28/novel_app_backup.db"]}' \\
+         -o backups.zip
+    ```
+    """
+    members = []
+    for backup_id in dict.fromkeys(payload.backup_ids):
+        record, file_path = await _resolve_backup(backup_id)
+        members.append(
+            ArchiveMember(
+                name=record.backup_id,
+                size=record.file_size,
+                modified=record.uploaded_at,
+                content=_backup_content(record, file_path),
+            )
+        )
+
+    archive_name = f"backups_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_zip(members, compress=payload.compress),
+        media_type="application/zip",
+        headers={"Content-Disposition": _content_disposition(archive_name)},
     )
 
 
@@ -244,7 +826,15 @@ async def delete_backup(
     """
     file_path = _safe_backup_path(backup_id)
 
+    record = await backup_manifest.get(_backup_id(file_path))
+    if record is not None and record.storage == "chunked":
+        # 同时释放不再被其他备份引用的块
+        await backup_manifest.remove(record.backup_id)
+        return {"message": "备份已删除", "backup_id": backup_id}
+
     if not file_path.exists() or not file_path.is_file():
+        # 文件已被外部删除时顺带清理清单中的残留记录
+        await backup_manifest.remove(_backup_id(file_path))
         raise HTTPException(status_code=404, detail=f"备份文件不存在: {backup_id}")
 
     try:
@@ -252,12 +842,14 @@ async def delete_backup(
     except OSError as e:
         raise HTTPException(status_code=500, detail=f"删除失败: {str(e)}")
 
+    await backup_manifest.remove(_backup_id(file_path))
+
     # 清理空的日期目录
     parent_dir = file_path.parent
     try:
         # 仅当 BACKUP_DIR 的直接子目录为空时清理
         if (
-            parent_dir != BACKUP_DIR
+            parent_dir != BACKUP_DIR.resolve()
             and parent_dir.is_dir()
             and not any(parent_dir.iterdir())
         ):
@@ -270,3 +862,45 @@ async def delete_backup(
         "message": "备份已删除",
         "backup_id": backup_id,
     }
+
+
+@router.get("/stats", response_model=BackupStatsResponse)
+async def backup_stats(
+    authenticated: bool = Depends(verify_token),
+):
+    """
+    备份存储统计.
+
+    返回备份数量、原始大小之和与实际占用空间，以及去重存储的去重比与压缩比。
+
+    **认证**: 需要 X-API-TOKEN header
+    """
+    return BackupStatsResponse(**await backup_manifest.stats())
+
+
+@router.post("/retention", response_model=BackupRetentionResponse)
+async def run_backup_retention(
+    dry_run: bool = Query(True, description="只返回保留/删除计划，不删除"),
+    daily: int | None = Query(None, ge=0, description="覆盖每组保留的天数"),
+    weekly: int | None = Query(None, ge=0, description="覆盖每组保留的周数"),
+    monthly: int | None = Query(None, ge=0, description="覆盖每组保留的月数"),
+    authenticated: bool = Depends(verify_token),
+):
+    """
+    按祖父-父-子策略清理过期备份.
+
+    同一文件名的备份为一组，保留最近若干天/周/月中每个周期最新的一份，其余分批删除。
+    默认 dry_run，只返回每个备份的保留原因与将要删除的备份；未指定的保留数取
+    BACKUP_RETENTION_* 配置。开启 BACKUP_RETENTION_ENABLED 后也会定期自动执行；
+    其他进程正在执行删除时返回 skipped=true。
+
+    **认证**: 需要 X-API-TOKEN header
+    """
+    policy = RetentionPolicy.from_settings()
+    policy = RetentionPolicy(
+        daily=policy.daily if daily is None else daily,
+        weekly=policy.weekly if weekly is None else weekly,
+        monthly=policy.monthly if monthly is None else monthly,
+    )
+    report = await backup_retention_service.run_once(dry_run=dry_run, policy=policy)
+    return BackupRetentionResponse(**report.to_dict())
@@ -2,64 +2,428 @@
 """
 Client log upload API routes.
 
-POST /api/logs/upload - Upload batch of client logs
+POST /api/logs/upload - Upload batch of client logs (JSON or streamed NDJSON)
+GET /api/logs - Search client logs (filters + message full-text, keyset pagination)
+GET /api/logs/export - Stream matching client logs as NDJSON / CSV (optionally gzip)
+GET /api/logs/groups - Top client errors aggregated by fingerprint
+GET /api/logs/stats - Per-minute / per-hour log counts from rollups
+GET /api/logs/partitions - Client log partitions and row counts
+POST /api/logs/retention - Drop expired client log partitions
 """
 
 import json
 import logging
+from datetime import datetime, timedelta, timezone
+from typing import Literal
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...database import get_db
+from ...constants import (
+    LOG_GROUPS_DEFAULT_LIMIT,
+    LOG_GROUPS_MAX_LIMIT,
+    LOG_INGEST_RETRY_AFTER,
+    LOG_SEARCH_DEFAULT_LIMIT,
+    LOG_SEARCH_MAX_LIMIT,
+    LOG_STATS_DEFAULT_BUCKETS,
+    LOG_STATS_MAX_BUCKETS,
+    LOG_STREAM_MAX_LINE_BYTES,
+    LOG_STREAM_WAIT_TIMEOUT,
+    LOG_UPLOAD_MAX_ENTRIES,
+)
+from ...database import get_async_db
 from ...deps.auth import verify_token
-from ...models.client_log import ClientLog
-from ...schemas import LogUploadRequest, LogUploadResponse
+from ...models.client_log import ClientLogGroup, ClientLogRollup
+from ...schemas import (
+    ClientLogGroupItem,
+    ClientLogGroupsResponse,
+    ClientLogItem,
+    ClientLogListResponse,
+    ClientLogStatsItem,
+    ClientLogStatsResponse,
+    LogEntrySchema,
+    LogUploadRequest,
+    LogUploadResponse,
+)
+from ...services.log_export import EXPORT_FORMATS, export_logs, log_row_to_dict
+from ...services.log_ingest import log_ingest_buffer, rollup_bucket
+from ...services.log_partitions import log_partition_manager
+from ...services.log_search import LogCursor, LogQuery, search_logs
+from ...services.log_stream import (
+    CorruptStreamError,
+    UnsupportedEncodingError,
+    iter_lines,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/logs", tags=["logs"])
 
+# NDJSON 上报的 Content-Type
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl")
+
+
+def _to_row(entry: LogEntrySchema) -> dict:
+    """日志条目转换为 client_logs 行."""
+    return {
+        "level": entry.level,
+        "message": entry.message,
+        "stack_trace": entry.stack_trace,
+        "category": entry.category,
+        "tags": json.dumps(entry.tags) if entry.tags else None,
+        "timestamp": entry.timestamp,
+    }
+
+
+def _to_utc(value: datetime | None) -> datetime | None:
+    """带时区的时间换算为不带时区的 UTC(数据库中按 UTC 存储)."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _buffer_full(received: int, rejected: int, resume_line: int) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={
+            "message": "日志缓冲区已满，请稍后重试",
+            "received": received,
+            "rejected": rejected,
+            "resume_line": resume_line,
+        },
+        headers={"Retry-After": str(LOG_INGEST_RETRY_AFTER)},
+    )
+
 
 @router.post(
     "/upload",
     response_model=LogUploadResponse,
     dependencies=[Depends(verify_token)],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": LogUploadRequest.model_json_schema()},
+                "application/x-ndjson": {
+                    "schema": {
+                        "type": "string",
+                        "description": "每行一条 LogEntrySchema JSON，"
+                        "可用 Content-Encoding: gzip / zstd 压缩",
+                    }
+                },
+            },
+        }
+    },
 )
-async def upload_logs(
-    request: LogUploadRequest,
-    db: Session = Depends(get_db),
-) -> LogUploadResponse:
+async def upload_logs(request: Request) -> LogUploadResponse:
     """
     上传客户端日志
 
-    接收客户端批量上报的日志并存入数据库。
-    单次最多接收 50 条日志。
+    支持两种请求体：
+    - application/json: LogUploadRequest，单次最多 LOG_UPLOAD_MAX_ENTRIES 条
+    - application/x-ndjson: 每行一条日志，可用 gzip / zstd 压缩，条数不限；
+      服务端边接收边解析，逐行校验，无效行计入 rejected 并跳过
+
+    日志放入缓冲区后即返回，由后台批量写入数据库。
+    缓冲区已满时返回 503 与 Retry-After，客户端应保留日志稍后重试；
+    NDJSON 上报的 503 / 400 响应中 resume_line 为已处理的非空行数，
+    重试时跳过这些行续传即可。
     """
-    count = 0
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_CONTENT_TYPES:
+        return await _upload_ndjson(request)
+
     try:
-        for entry in request.logs:
-            db.add(
-                ClientLog(
-                    level=entry.level,
-                    message=entry.message,
-                    stack_trace=entry.stack_trace,
-                    category=entry.category,
-                    tags=json.dumps(entry.tags) if entry.tags else None,
-                    timestamp=entry.timestamp,
-                )
+        payload = LogUploadRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors()) from e
+
+    rows = [_to_row(entry) for entry in payload.logs]
+    if not log_ingest_buffer.offer(rows):
+        logger.warning(f"日志缓冲区已满，拒绝 {len(rows)} 条客户端日志")
+        raise HTTPException(
+            status_code=503,
+            detail="日志缓冲区已满，请稍后重试",
+            headers={"Retry-After": str(LOG_INGEST_RETRY_AFTER)},
+        )
+
+    count = len(rows)
+    logger.debug(f"接收 {count} 条客户端日志")
+    return LogUploadResponse(received=count, message=f"成功接收 {count} 条日志")
+
+
+async def _upload_ndjson(request: Request) -> LogUploadResponse:
+    """流式解析 NDJSON 请求体，每凑满一批放入缓冲区."""
+    received = rejected = 0
+    # 已处理(已放入缓冲区或已判定无效)的非空行数
+    line_no = resume_line = 0
+    rows: list[dict] = []
+    try:
+        async for line in iter_lines(
+            request.stream(),
+            request.headers.get("content-encoding"),
+            LOG_STREAM_MAX_LINE_BYTES,
+        ):
+            line_no += 1
+            try:
+                if line is None:
+                    raise ValueError("行过长")
+                rows.append(_to_row(LogEntrySchema.model_validate_json(line)))
+            except ValueError:  # pydantic ValidationError 是 ValueError 的子类
+                rejected += 1
+                continue
+            if len(rows) >= LOG_UPLOAD_MAX_ENTRIES:
+                if not await log_ingest_buffer.put(rows, LOG_STREAM_WAIT_TIMEOUT):
+                    raise _buffer_full(received, rejected, resume_line)
+                received += len(rows)
+                resume_line = line_no
+                rows = []
+    except UnsupportedEncodingError as e:
+        raise HTTPException(status_code=415, detail=str(e)) from e
+    except CorruptStreamError as e:
+        # 已放入缓冲区的日志保留，响应中说明已接收的行数
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": f"压缩数据损坏: {e}",
+                "received": received,
+                "rejected": rejected,
+                "resume_line": resume_line,
+            },
+        ) from e
+
+    if rows:
+        if not await log_ingest_buffer.put(rows, LOG_STREAM_WAIT_TIMEOUT):
+            raise _buffer_full(received, rejected, resume_line)
+        received += len(rows)
+
+    logger.info(f"NDJSON 上报: 接收 {received} 条，丢弃 {rejected} 条无效日志")
+    return LogUploadResponse(
+        received=received,
+        rejected=rejected,
+        message=f"成功接收 {received} 条日志，丢弃 {rejected} 条无效日志",
+    )
+
+
+def _log_query(
+    level: str | None = Query(None, description="日志级别"),
+    category: str | None = Query(None, description="日志分类"),
+    tag: str | None = Query(None, max_length=100, description="包含该标签"),
+    since: datetime | None = Query(None, description="客户端时间下界(含)"),
+    until: datetime | None = Query(None, description="客户端时间上界(不含)"),
+    q: str | None = Query(
+        None,
+        min_length=1,
+        max_length=200,
+        description="消息全文检索(PostgreSQL 按词匹配，SQLite 按子串匹配)",
+    ),
+) -> LogQuery:
+    """检索与导出共用的过滤参数."""
+    return LogQuery(
+        level=level,
+        category=category,
+        tag=tag,
+        since=_to_utc(since),
+        until=_to_utc(until),
+        q=q,
+    )
+
+
+@router.get(
+    "",
+    response_model=ClientLogListResponse,
+    dependencies=[Depends(verify_token)],
+)
+async def list_logs(
+    query: LogQuery = Depends(_log_query),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor"),
+    limit: int = Query(
+        LOG_SEARCH_DEFAULT_LIMIT, ge=1, le=LOG_SEARCH_MAX_LIMIT, description="每页条数"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+) -> ClientLogListResponse:
+    """
+    检索客户端日志
+
+    按客户端时间倒序返回，过滤条件与消息全文检索均走索引。
+    翻页时把响应中的 next_cursor 原样传回 cursor 参数。
+    """
+    after = None
+    if cursor:
+        try:
+            after = LogCursor.decode(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    page = await search_logs(db, query, after=after, limit=limit)
+    return ClientLogListResponse(
+        items=[ClientLogItem(**log_row_to_dict(row)) for row in page.items],
+        next_cursor=page.next_cursor.encode() if page.next_cursor else None,
+    )
+
+
+@router.get("/export", dependencies=[Depends(verify_token)])
+async def export_client_logs(
+    query: LogQuery = Depends(_log_query),
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="导出格式"),
+    compress: bool = Query(False, description="是否 gzip 压缩"),
+) -> StreamingResponse:
+    """
+    导出客户端日志
+
+    过滤条件与 GET /api/logs 相同，按客户端时间升序以 NDJSON 或 CSV 流式返回
+    (SQLite 下按分片先后依次输出)。通过服务端游标分批读取，导出范围再大
+    内存占用也不变。
+    """
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"client-logs-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.{extension}"
+    if compress:
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        export_logs(query, format, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get(
+    "/groups",
+    response_model=ClientLogGroupsResponse,
+    dependencies=[Depends(verify_token)],
+)
+async def top_log_groups(
+    limit: int = Query(
+        LOG_GROUPS_DEFAULT_LIMIT, ge=1, le=LOG_GROUPS_MAX_LIMIT, description="返回条数"
+    ),
+    level: str | None = Query(None, description="日志级别"),
+    category: str | None = Query(None, description="日志分类"),
+    since: datetime | None = Query(None, description="只返回该时间之后仍出现过的错误"),
+    db: AsyncSession = Depends(get_async_db),
+) -> ClientLogGroupsResponse:
+    """
+    高频客户端错误
+
+    直接读取按指纹聚合的 client_log_groups，按累计出现次数倒序返回，
+    不扫描 client_logs。
+    """
+    query = select(ClientLogGroup)
+    if level is not None:
+        query = query.where(ClientLogGroup.level == level)
+    if category is not None:
+        query = query.where(ClientLogGroup.category == category)
+    if since is not None:
+        query = query.where(ClientLogGroup.last_seen >= _to_utc(since))
+    groups = await db.scalars(
+        query.order_by(ClientLogGroup.count.desc(), ClientLogGroup.fingerprint).limit(
+            limit
+        )
+    )
+    return ClientLogGroupsResponse(
+        items=[
+            ClientLogGroupItem(
+                fingerprint=group.fingerprint,
+                level=group.level,
+                category=group.category,
+                message=group.message,
+                stack_trace=group.stack_trace,
+                count=group.count,
+                first_seen=group.first_seen.isoformat(),
+                last_seen=group.last_seen.isoformat(),
             )
-            count += 1
+            for group in groups
+        ]
+    )
 
-        db.commit()
-        logger.info(f"成功接收 {count} 条客户端日志")
-        return LogUploadResponse(
-            received=count, message=f"成功接收 {count} 条日志"
+
+@router.get(
+    "/stats",
+    response_model=ClientLogStatsResponse,
+    dependencies=[Depends(verify_token)],
+)
+async def log_stats(
+    granularity: Literal["minute", "hour"] = Query("hour", description="时间粒度"),
+    since: datetime | None = Query(None, description="统计起点(含)，默认最近若干个桶"),
+    until: datetime | None = Query(None, description="统计终点(不含)，默认当前时间"),
+    level: str | None = Query(None, description="日志级别"),
+    category: str | None = Query(None, description="日志分类"),
+    db: AsyncSession = Depends(get_async_db),
+) -> ClientLogStatsResponse:
+    """
+    客户端日志计数统计
+
+    读取写入日志时增量维护的 client_log_rollups 汇总行，按客户端时间分桶，
+    查询代价只与时间桶数有关，不扫描 client_logs。未指定 since 时，
+    分钟粒度统计最近 60 分钟，小时粒度统计最近 24 小时；
+    单次最多覆盖 LOG_STATS_MAX_BUCKETS 个桶。
+    """
+    step = timedelta(minutes=1) if granularity == "minute" else timedelta(hours=1)
+    until = _to_utc(until) or datetime.now(timezone.utc).replace(tzinfo=None)
+    since = rollup_bucket(
+        _to_utc(since) or until - step * LOG_STATS_DEFAULT_BUCKETS[granularity],
+        granularity,
+    )
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since 必须早于 until")
+    if (until - since) / step > LOG_STATS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"时间范围过大：{granularity} 粒度最多 {LOG_STATS_MAX_BUCKETS} 个时间桶",
+        )
+
+    query = select(ClientLogRollup).where(
+        ClientLogRollup.granularity == granularity,
+        ClientLogRollup.bucket >= since,
+        ClientLogRollup.bucket < until,
+    )
+    if level is not None:
+        query = query.where(ClientLogRollup.level == level)
+    if category is not None:
+        query = query.where(ClientLogRollup.category == category)
+    rollups = (
+        await db.scalars(
+            query.order_by(
+                ClientLogRollup.bucket, ClientLogRollup.level, ClientLogRollup.category
+            )
         )
+    ).all()
+    return ClientLogStatsResponse(
+        granularity=granularity,
+        since=since.isoformat(),
+        until=until.isoformat(),
+        total=sum(rollup.count for rollup in rollups),
+        items=[
+            ClientLogStatsItem(
+                bucket=rollup.bucket.isoformat(),
+                level=rollup.level,
+                category=rollup.category,
+                count=rollup.count,
+            )
+            for rollup in rollups
+        ],
+    )
 
-    except Exception as e:
-        db.rollback()
-        logger.error(f"日志上报处理失败: {e}")
-        return LogUploadResponse(
-            received=0, message=f"处理失败: {e!s}"
-        )
\ No newline at end of file
+
+@router.get("/partitions", dependencies=[Depends(verify_token)])
+async def list_log_partitions() -> dict:
+    """
+    列出客户端日志分区
+
+    返回分区粒度以及各分区(SQLite 为分片表)的行数。
+    """
+    return await log_partition_manager.stats()
+
+
+@router.post("/retention", dependencies=[Depends(verify_token)])
+async def run_log_retention() -> dict:
+    """
+    立即执行一次客户端日志分区维护
+
+    创建未来分区，整体删除结束时间早于保留期(LOG_RETENTION_DAYS)的分区，
+    并删除过期的错误聚合分组与计数汇总。后台也会按 LOG_MAINTENANCE_INTERVAL 定期执行。
+    """
+    return await log_partition_manager.run_once()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Task history API routes.
+
+GET /api/tasks - 按类型/状态/模型/时间范围列出历史生成任务（键集分页）
+POST /api/tasks/retention - 立即执行一次任务清理(默认 dry_run)
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...constants import TASK_HISTORY_DEFAULT_PAGE_SIZE, TASK_HISTORY_MAX_PAGE_SIZE
+from ...database import get_async_db
+from ...deps.auth import verify_token
+from ...schemas import TaskHistoryItem, TaskHistoryResponse, TaskRetentionResponse
+from ...services.task_repository import TASK_MODELS, TaskCursor, TaskRepository
+from ...services.task_retention import task_retention_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/tasks", tags=["tasks"])
+
+
+def _to_utc(value: datetime | None) -> datetime | None:
+    """带时区的时间统一换算为 UTC(数据库中按 UTC 存储)."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc)
+
+
+@router.get(
+    "",
+    response_model=TaskHistoryResponse,
+    dependencies=[Depends(verify_token)],
+)
+async def list_tasks(
+    type: Literal["t2i", "i2v"] | None = Query(
+        None, description="任务类型: t2i / i2v，不填则两者都返回"
+    ),
+    status: Literal["pending", "completed", "failed"] | None = Query(
+        None, description="任务状态"
+    ),
+    model_name: str | None = Query(None, max_length=100, description="模型名称"),
+    created_after: datetime | None = Query(None, description="创建时间下界(含)"),
+    created_before: datetime | None = Query(None, description="创建时间上界(不含)"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor"),
+    limit: int = Query(
+        TASK_HISTORY_DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=TASK_HISTORY_MAX_PAGE_SIZE,
+        description="每页条数",
+    ),
+    db: AsyncSession = Depends(get_async_db),
+) -> TaskHistoryResponse:
+    """
+    列出历史生成任务
+
+    按创建时间倒序返回，一次请求即可重建图库，无需逐个 task_id 轮询。
+    翻页时把响应中的 next_cursor 原样传回 cursor 参数。
+    """
+    after = None
+    if cursor:
+        try:
+            after = TaskCursor.decode(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    kinds = [type] if type else sorted(TASK_MODELS)
+    page = await TaskRepository(db).list_history(
+        kinds,
+        status=status,
+        model_name=model_name,
+        created_after=_to_utc(created_after),
+        created_before=_to_utc(created_before),
+        after=after,
+        limit=limit,
+    )
+    return TaskHistoryResponse(
+        items=[
+            TaskHistoryItem(
+                task_id=row.prompt_id,
+                type=row.kind,
+                status=row.status,
+                model_name=row.model_name,
+                created_at=row.created_at.isoformat(),
+            )
+            for row in page.items
+        ],
+        next_cursor=page.next_cursor.encode() if page.next_cursor else None,
+    )
+
+
+@router.post("/retention", response_model=TaskRetentionResponse)
+async def run_task_retention(
+    dry_run: bool = Query(True, description="只统计将要删除的任务，不删除"),
+    authenticated: bool = Depends(verify_token),
+) -> TaskRetentionResponse:
+    """
+    立即执行一次任务清理
+
+    按各状态的保留天数分批删除过期任务(可选归档)，清理本地缓存媒体，
+    返回删除行数与回收的磁盘空间。默认 dry_run，只返回将要删除的数量；
+    传 dry_run=false 才实际删除。开启 TASK_RETENTION_ENABLED 后也会定期自动执行。
+    """
+    report = await task_retention_service.run_once(dry_run=dry_run)
+    return TaskRetentionResponse(**report.to_dict())
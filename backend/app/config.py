@@ -34,14 +34,80 @@ class Settings(BaseSettings):
     # Database settings for caching functionality
     database_url: str = "sqlite:///novel_cache.db"
 
+    # SQLite 嵌入式模式配置（database_url 为 SQLite 时生效）
+    sqlite_busy_timeout_ms: int = 5000  # 锁冲突时的等待时间（毫秒）
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # 内存映射读取大小（字节）
+    sqlite_single_writer: bool = True  # 进程内写事务排队执行
+
     # ComfyUI服务配置
     comfyui_api_url: str = "http://host.docker.internal:8188"
     # ComfyUI 模型目录（容器内路径），用于模型文件上传落地
     comfyui_models_dir: str = Field(default="/app/models", alias="COMFYUI_MODELS_DIR")
 
+    # ComfyUI 调用弹性配置
+    comfyui_max_retries: int = 2  # 幂等读请求的最大重试次数
+    comfyui_breaker_failure_threshold: int = 5  # 连续失败多少次触发熔断
+    comfyui_breaker_reset_timeout: float = 30.0  # 熔断冷却时间（秒）
+    comfyui_health_probe_interval: float = 10.0  # 后台健康探测间隔（秒）
+
     # 图生视频相关配置
     video_generation_timeout: int = 600  # 10分钟
 
+    # 文生图批量提交配置
+    text2img_batch_concurrency: int = 4  # 批量提交到 ComfyUI 的最大并发数
+    text2img_batch_poll_interval: float = 2.0  # 批次长轮询刷新状态的间隔（秒）
+
+    # 生成任务队列（开启后 API 只入队，由 worker 进程提交到 ComfyUI）
+    generation_queue_enabled: bool = False
+    generation_worker_batch_size: int = 8  # worker 每轮最多认领的任务数
+    generation_worker_poll_interval: float = 1.0  # 队列为空时的轮询间隔（秒）
+    generation_job_max_attempts: int = 5  # 单个任务最多提交尝试次数
+    generation_job_lease_seconds: int = 300  # 认领租约，超时视为 worker 崩溃
+    generation_job_track_interval: float = 5.0  # 已提交任务的结果检查间隔（秒）
+
+    # 客户端日志缓冲写入（上报接口只入缓冲区，后台批量写库）
+    log_ingest_queue_size: int = 20000  # 缓冲区最多容纳的日志行数，满时返回 503
+    log_ingest_batch_size: int = 1000  # 单次批量写入的最大行数
+    log_ingest_flush_interval: float = 1.0  # 最长写入间隔（秒）
+
+    # 客户端日志分区（PostgreSQL 分区表 / SQLite 分片表，过期分区整体删除）
+    log_partition_interval: str = "month"  # 分区粒度: month / day
+    log_partition_premake: int = 2  # PostgreSQL 提前创建的未来分区数
+    log_retention_days: int = 90  # 日志保留天数，0 表示不清理
+    log_maintenance_interval: float = 3600.0  # 分区维护间隔（秒）
+    log_rollup_minute_days: int = 7  # 分钟级计数汇总保留天数（小时级同日志保留天数）
+
+    # 任务终态缓存（已完成/失败任务的轮询不再查数据库）
+    task_cache_size: int = 4096  # 最多缓存的任务数，0 表示禁用
+    task_cache_invalidation: bool = False  # 通过 PostgreSQL NOTIFY 跨进程失效
+
+    # 任务保留策略（定期清理过期任务行、队列记录与本地缓存媒体）
+    task_retention_enabled: bool = False
+    task_retention_interval: float = 3600.0  # 清理间隔（秒）
+    task_retention_completed_days: int = 30  # 已完成任务保留天数
+    task_retention_failed_days: int = 7  # 失败任务保留天数
+    task_retention_pending_days: int = 7  # 长期未结束的 pending 任务保留天数
+    task_retention_batch_size: int = 500  # 单个事务最多删除的行数
+    task_retention_archive_dir: str = ""  # 非空时删除前归档为 NDJSON(gzip)
+    task_retention_purge_comfyui_history: bool = True  # 同时删除 ComfyUI history 记录
+
+    # 数据库备份存储（备份清单为目录下的 .manifest.sqlite3，启动时与目录对账）
+    backup_dir: str = "backups"
+    backup_dedup_enabled: bool = True  # 新上传的备份切块去重存储（关闭后保存完整文件）
+    backup_compress_level: int = 3  # 去重块后台 zstd 压缩级别（1-22），0 表示不压缩
+    # 备份保留策略（祖父-父-子）：按原始文件名分组，每组保留最近 N 个有备份的日/周/月
+    # 各自最新的一份，其余删除；三项均为 0 时不清理
+    backup_retention_enabled: bool = False
+    backup_retention_interval: float = 3600.0  # 清理间隔（秒）
+    backup_retention_daily: int = 7
+    backup_retention_weekly: int = 4
+    backup_retention_monthly: int = 12
+    backup_retention_batch_size: int = 100  # 单个清单事务最多删除的备份数
+
+    # 本地媒体缓存（缩略图、联系表等）
+    media_cache_dir: str = "media_cache"
+    contact_sheet_thumb_size: int = 256  # 联系表缩略图最长边（像素）
+
     # 安全配置
     cors_origins: str = "http://localhost:3154"
     jwt_algorithm: str = "HS256"
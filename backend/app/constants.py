@@ -12,10 +12,71 @@
 TIMEOUT_DIFY = 60  # Dify 工作流（AI 处理可能较慢）
 TIMEOUT_VIDEO_GENERATION = 3600  # 视频生成（1小时）
 
+# ComfyUI 各端点截止时间（连接超时, 读取超时），单位秒
+COMFYUI_DEADLINES = {
+    "prompt": (3.05, 30),  # 提交工作流（ComfyUI 只做校验并入队）
+    "upload": (3.05, 60),  # 上传输入图片
+    "history": (3.05, 10),  # 查询任务历史
+    "view": (3.05, 120),  # 下载生成结果（视频可能较大）
+    "queue": (3.05, 5),  # 查询队列
+    "system_stats": (3.05, 5),  # 系统状态（健康检查）
+    "default": (3.05, 30),
+}
+
 # HTTP 缓存常量（秒）
 CACHE_NO_CACHE = 0  # 不缓存
 CACHE_ONE_HOUR = 3600  # 1小时
 CACHE_ONE_DAY = 86400  # 1天
 
+# 文生图批量提交限制
+TEXT2IMG_BATCH_MAX_ITEMS = 50  # 单个批次最多包含的提示词条数
+TEXT2IMG_BATCH_MAX_WAIT = 30  # 批次长轮询最长等待时间（秒）
+
+# 联系表（多图打包）限制
+CONTACT_SHEET_MAX_ITEMS = 100  # 单次打包最多包含的任务数
+
+# 客户端日志上报
+LOG_UPLOAD_MAX_ENTRIES = 500  # 单次上报最多条数
+LOG_INGEST_RETRY_AFTER = 1  # 缓冲区满时建议客户端重试的间隔（秒）
+LOG_STREAM_MAX_LINE_BYTES = 64 * 1024  # NDJSON 上报单行最大字节数
+LOG_STREAM_WAIT_TIMEOUT = 10  # NDJSON 上报等待缓冲区腾出空间的最长时间（秒）
+
+# 客户端错误聚合
+LOG_FINGERPRINT_LEVELS = ("error",)  # 计算指纹并聚合计数的日志级别
+LOG_FINGERPRINT_MAX_FRAMES = 8  # 指纹只取堆栈的前若干帧
+LOG_GROUPS_DEFAULT_LIMIT = 20  # 高频错误列表默认条数
+LOG_GROUPS_MAX_LIMIT = 200  # 高频错误列表最多条数
+
+# 客户端日志检索、导出与统计
+LOG_SEARCH_DEFAULT_LIMIT = 50  # 日志检索默认每页条数
+LOG_SEARCH_MAX_LIMIT = 500  # 日志检索每页最多条数
+LOG_EXPORT_BATCH_SIZE = 1000  # 日志导出每次从服务端游标读取的行数
+LOG_EXPORT_CHUNK_BYTES = 64 * 1024  # 日志导出每段输出的大小（压缩前）
+LOG_STATS_DEFAULT_BUCKETS = {"minute": 60, "hour": 24}  # 未指定时间范围时统计最近的桶数
+LOG_STATS_MAX_BUCKETS = 1440  # 单次统计最多覆盖的时间桶数
+
+# 数据库备份
+BACKUP_LIST_DEFAULT_PAGE_SIZE = 200  # 列表默认每页条数
+BACKUP_LIST_MAX_PAGE_SIZE = 1000  # 列表每页最多条数
+BACKUP_UPLOAD_CHUNK_BYTES = 1024 * 1024  # 上传写盘与计算哈希的分块大小
+BACKUP_TEMP_MAX_AGE = 24 * 3600  # 上传临时文件残留超过该时长（秒）后由对账删除
+# 去重分块长度（字节）。修改后新旧备份的切块边界不再一致，已有的块无法复用
+BACKUP_CHUNK_MIN_SIZE = 4 * 1024
+BACKUP_CHUNK_AVG_SIZE = 16 * 1024  # 需为 2 的幂
+BACKUP_CHUNK_MAX_SIZE = 64 * 1024
+BACKUP_STREAM_BYTES = 1024 * 1024  # 下载去重备份时每次从块存储读取的大小
+BACKUP_COMPRESS_BATCH = 256  # 后台压缩每批处理的块数
+BACKUP_COMPRESS_INTERVAL = 600.0  # 后台压缩定期补扫间隔（秒），上传后会立即唤醒
+BACKUP_PASSTHROUGH_COMPRESS_LEVEL = 1  # 压缩流下载时尚未压缩的块即时压缩的级别
+BACKUP_ARCHIVE_MAX_ITEMS = 100  # 单次打包下载最多包含的备份数
+# 断点续传上传
+BACKUP_RESUMABLE_MAX_CHUNK_SIZE = 32 * 1024 * 1024  # 单个分块上限（分块在内存中校验后写入）
+BACKUP_RESUMABLE_MAX_CHUNKS = 100000  # 单个上传的分块数上限
+BACKUP_UPLOAD_SESSION_MAX_AGE = 3 * 24 * 3600  # 上传会话超过该时长（秒）没有新分块后删除
+
+# 任务历史列表
+TASK_HISTORY_DEFAULT_PAGE_SIZE = 50  # 默认每页条数
+TASK_HISTORY_MAX_PAGE_SIZE = 200  # 每页最多条数
+
 # 数据库字段长度限制
 MAX_IMAGES_JSON_LENGTH = 5000  # 图片列表JSON字符串的最大长度
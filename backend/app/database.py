@@ -6,26 +6,218 @@
 and initialization utilities for the application.
 """
 
-from sqlalchemy import create_engine
+import asyncio
+import weakref
+from collections.abc import AsyncIterator
+from typing import Any
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.util import await_only
 
 from .config import settings
 
-# 创建数据库引擎
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,  # 连接池预检，确保连接有效
-    pool_size=20,  # 增加连接池大小
-    max_overflow=30,  # 增加溢出连接数
-    pool_recycle=3600,  # 1小时回收连接，防止连接泄漏
-    pool_timeout=60,  # 增加获取连接的超时时间
-    echo=False,
+# 异步驱动映射：请求处理器使用异步会话，查询不阻塞事件循环
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(database_url: str) -> str:
+    """把同步连接串转换为对应的异步驱动连接串.
+
+    sqlite:///novel_cache.db -> sqlite+aiosqlite:///novel_cache.db
+    postgresql(+psycopg2)://... -> postgresql+asyncpg://...
+    已指定异步驱动的连接串原样返回。
+    """
+    url = make_url(database_url)
+    async_driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if async_driver is None or url.drivername in (
+        "sqlite+aiosqlite",
+        "postgresql+asyncpg",
+    ):
+        return database_url
+    return url.set(drivername=async_driver).render_as_string(hide_password=False)
+
+
+def is_sqlite(database_url: str) -> bool:
+    """是否为 SQLite 连接串."""
+    return make_url(database_url).get_backend_name() == "sqlite"
+
+
+def engine_options(database_url: str) -> dict[str, Any]:
+    """按数据库类型返回引擎参数.
+
+    SQLite 是嵌入式单写者数据库，大连接池只会放大 "database is locked" 竞争：
+    不设置 pool_size / max_overflow，由 SQLAlchemy 选择默认连接池，
+    并用 busy timeout 代替立即失败。其他数据库沿用服务端连接池配置。
+    """
+    if is_sqlite(database_url):
+        return {
+            "connect_args": {
+                "timeout": settings.sqlite_busy_timeout_ms / 1000,
+                "check_same_thread": False,
+            },
+            "echo": False,
+        }
+    return {
+        "pool_pre_ping": True,  # 连接池预检，确保连接有效
+        "pool_size": 20,  # 增加连接池大小
+        "max_overflow": 30,  # 增加溢出连接数
+        "pool_recycle": 3600,  # 1小时回收连接，防止连接泄漏
+        "pool_timeout": 60,  # 增加获取连接的超时时间
+        "echo": False,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    """SQLite 连接建立时设置 PRAGMA.
+
+    - WAL: 读写互不阻塞，读可以与唯一的写者并发
+    - synchronous=NORMAL: WAL 模式下只在 checkpoint 时 fsync，断电最多丢最近事务
+    - mmap / 内存临时表: 减少读路径的系统调用与临时文件
+    - busy_timeout: 锁冲突时等待而不是立即报错
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+# 每个事件循环一把写锁（锁绑定创建时的事件循环）
+_writer_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+    weakref.WeakKeyDictionary()
 )
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+
+
+def _writer_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _writer_locks.get(loop)
+    if lock is None:
+        lock = _writer_locks[loop] = asyncio.Lock()
+    return lock
+
+
+def install_sqlite_writer_gate(target: AsyncEngine) -> None:
+    """让异步引擎上的 SQLite 写事务排队串行执行.
+
+    SQLite 同一时刻只允许一个写事务。多个会话同时写时，失败的一方在
+    busy_timeout 内反复重试，既不公平也可能超时报 "database is locked"。
+    这里在连接执行第一条写语句时获取进程内的写锁(先到先得)，DBAPI 提交或回滚
+    完成后释放，写事务依次执行；读语句不加锁，在 WAL 模式下与写者并发。
+    """
+
+    sync_engine = target.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _acquire(conn, _cursor, statement, _parameters, context, _executemany):
+        if conn.info.get("sqlite_writer"):
+            return
+        is_write = (
+            context is not None
+            and (context.isinsert or context.isupdate or context.isdelete)
+        ) or statement.lstrip().upper().startswith(_WRITE_PREFIXES)
+        if not is_write:
+            return
+        lock = _writer_lock()
+        # 异步引擎的语句执行运行在 greenlet 中，可以在这里等待写锁
+        await_only(lock.acquire())
+        conn.info["sqlite_writer"] = lock
+
+    def _release(info: dict) -> None:
+        lock = info.pop("sqlite_writer", None)
+        if lock is not None and lock.locked():
+            lock.release()
+
+    # 连接级 commit/rollback 事件在 DBAPI 提交之前触发，在那里释放写锁会让下一个写者
+    # 在 SQLite 锁仍被占用时开始执行并进入 busy_timeout 等待；这里包装本引擎方言的
+    # do_commit/do_rollback，在 DBAPI 调用结束后释放。已作废的连接不会执行
+    # do_rollback，由连接池 invalidate 事件释放
+    dialect = sync_engine.dialect
+    do_commit, do_rollback = dialect.do_commit, dialect.do_rollback
+
+    def _release_connection(dbapi_connection) -> None:
+        try:
+            info = dbapi_connection.info
+        except NotImplementedError:
+            # 首次连接初始化时的临时代理连接没有 info，也从不持有写锁
+            return
+        _release(info)
+
+    def _do_commit(dbapi_connection) -> None:
+        try:
+            do_commit(dbapi_connection)
+        finally:
+            _release_connection(dbapi_connection)
+
+    def _do_rollback(dbapi_connection) -> None:
+        try:
+            do_rollback(dbapi_connection)
+        finally:
+            _release_connection(dbapi_connection)
+
+    dialect.do_commit = _do_commit  # type: ignore[method-assign]
+    dialect.do_rollback = _do_rollback  # type: ignore[method-assign]
+
+    # 会话异常关闭、连接直接归还连接池或被作废(如事务中途被取消)时兜底释放
+    @event.listens_for(sync_engine.pool, "reset")
+    def _on_reset(_dbapi_connection, connection_record, _reset_state):
+        _release(connection_record.info)
+
+    @event.listens_for(sync_engine.pool, "invalidate")
+    def _on_invalidate(_dbapi_connection, connection_record, _exception):
+        _release(connection_record.info)
+
+
+def create_db_engine(database_url: str) -> Engine:
+    """创建同步引擎(SQLite 使用嵌入式配置)."""
+    db_engine = create_engine(database_url, **engine_options(database_url))
+    if is_sqlite(database_url):
+        event.listen(db_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
+
+def create_async_db_engine(database_url: str) -> AsyncEngine:
+    """创建异步引擎(SQLite 使用嵌入式配置，并按配置启用写事务排队)."""
+    db_engine = create_async_engine(
+        to_async_url(database_url), **engine_options(database_url)
+    )
+    if is_sqlite(database_url):
+        event.listen(db_engine.sync_engine, "connect", apply_sqlite_pragmas)
+        if settings.sqlite_single_writer:
+            install_sqlite_writer_gate(db_engine)
+    return db_engine
+
+
+# 创建数据库引擎
+engine = create_db_engine(settings.database_url)
 
 # 创建会话工厂 - 使用 UPPER_CASE 常量命名
 SESSION_LOCAL = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 创建异步数据库引擎（与同步引擎指向同一数据库）
+async_engine = create_async_db_engine(settings.database_url)
+
+# 异步会话工厂：提交后不过期对象，避免在提交后访问属性时触发隐式 IO
+ASYNC_SESSION_LOCAL = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 # 创建基类
 Base = declarative_base()
 
@@ -39,6 +231,17 @@ def get_db():
         db.close()
 
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """获取异步数据库会话（用于 async 路由的依赖注入）"""
+    async with ASYNC_SESSION_LOCAL() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    """关闭异步引擎的连接池（应用关闭时调用）"""
+    await async_engine.dispose()
+
+
 class DatabaseSession:
     """数据库会话上下文管理器"""
 
@@ -62,7 +265,17 @@ def init_db():
     """初始化数据库（创建所有表）"""
     try:
         # 导入所有模型以确保它们被注册
-        from .models.client_log import ClientLog
+        from .models.client_log import (  # noqa: F401
+            ClientLog,
+            ClientLogGroup,
+            ClientLogRollup,
+        )
+        from .models.generation_job import GenerationJob  # noqa: F401
+        from .services.log_partitions import log_partition_manager
+
+        # client_logs 为分区表(SQLite 为分片视图)，需在 create_all 之前准备
+        with engine.begin() as conn:
+            log_partition_manager.prepare(conn)
 
         # 创建所有表
         Base.metadata.create_all(bind=engine)
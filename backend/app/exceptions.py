@@ -225,6 +225,24 @@ def __init__(
         super().__init__(message, "EXTERNAL_SERVICE_ERROR", **kwargs)
 
 
+class ComfyUIUnavailableError(ExternalServiceError):
+    """ComfyUI 不可用(熔断中)错误"""
+
+    def __init__(
+        self,
+        message: str = "ComfyUI 服务暂不可用",
+        retry_after: int | None = None,
+        **kwargs,
+    ):
+        details = kwargs.get("details", {})
+        if retry_after:
+            details["retry_after"] = retry_after
+        kwargs["details"] = details
+        self.retry_after = retry_after or 0
+
+        super().__init__(message, service_name="comfyui", **kwargs)
+
+
 def handle_exception(exc: Exception, logger=None) -> NovelBuilderException:
     """
     将标准异常转换为自定义异常。
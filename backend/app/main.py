@@ -8,6 +8,7 @@
 
 import logging
 import secrets
+import sqlite3
 from typing import Any
 
 from fastapi import (
@@ -16,39 +17,67 @@
     File,
     Form,
     HTTPException,
+    Query,
     Request,
     UploadFile,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .config import settings
-from .constants import CACHE_ONE_DAY, CACHE_ONE_HOUR, TIMEOUT_FAST
-from .database import get_db, init_db
+from .constants import (
+    CACHE_ONE_DAY,
+    CACHE_ONE_HOUR,
+    TEXT2IMG_BATCH_MAX_WAIT,
+)
+from .database import dispose_async_engine, get_async_db, init_db
 from .deps.auth import verify_token
 from .exceptions import (
+    ComfyUIUnavailableError,
     NovelBuilderException,
     handle_exception,
 )
 from .logging_config import setup_logging
 from .schemas import (
+    AtlasTileInfo,
+    ContactSheetRequest,
+    ContactSheetResponse,
     ModelsResponse,
+    Text2ImgBatchRequest,
+    Text2ImgBatchStatusResponse,
+    Text2ImgBatchSubmitResponse,
     Text2ImgGenerateRequest,
     WorkflowInfo,
 )
+from .services.backup_compression import backup_compressor
+from .services.backup_manifest import backup_manifest
+from .services.backup_retention import backup_retention_scheduler
+from .services.comfyui_health import (
+    get_health_prober,
+    start_health_probers,
+    stop_health_probers,
+)
+from .services.comfyui_transport import CircuitState
+from .services.contact_sheet_service import create_contact_sheet_service
 from .services.image_to_video_service import create_image_to_video_service
+from .services.log_ingest import log_ingest_buffer
+from .services.log_partitions import log_partition_scheduler
+from .services.task_cache import invalidation_listener
+from .services.task_retention import retention_scheduler
 from .services.text2img_service import create_text2img_service
 from .api.routes.backup import router as backup_router
 from .api.routes.logs import router as logs_router
 from .api.routes.models import router as models_router
+from .api.routes.tasks import router as tasks_router
 
 logger = logging.getLogger(__name__)
 
 # 创建文生图和图生视频服务实例
 text2img_service = create_text2img_service()
 image_to_video_service = create_image_to_video_service()
+contact_sheet_service = create_contact_sheet_service()
 
 app = FastAPI(
     title="Novel Builder Backend",
@@ -74,6 +103,7 @@
 app.include_router(backup_router)
 app.include_router(logs_router)
 app.include_router(models_router)
+app.include_router(tasks_router)
 
 
 # 应用启动事件
@@ -85,6 +115,31 @@ async def startup_event() -> None:
     # 初始化数据库
     init_db()
 
+    # 备份清单与备份目录对账（补录/清理启动前在目录外发生的变化）
+    try:
+        await backup_manifest.reconcile()
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"备份清单对账失败: {e}")
+
+    # 启动去重块后台压缩（BACKUP_COMPRESS_LEVEL 为 0 时不启动）
+    backup_compressor.start()
+
+    # 启动备份定期清理（仅开启 BACKUP_RETENTION_ENABLED 时生效）
+    backup_retention_scheduler.start()
+
+    # 启动 ComfyUI 后台健康探测
+    start_health_probers()
+
+    # 启动客户端日志后台批量写入与分区维护
+    log_ingest_buffer.start()
+    log_partition_scheduler.start()
+
+    # 启动任务终态缓存的跨进程失效监听（仅 PostgreSQL 且已开启时生效）
+    invalidation_listener.start()
+
+    # 启动任务定期清理（仅开启 TASK_RETENTION_ENABLED 时生效）
+    retention_scheduler.start()
+
     logger.info("Novel Builder Backend 启动完成")
 
     if settings.debug:
@@ -94,6 +149,21 @@ async def startup_event() -> None:
         logger.warning("当前配置不安全，请检查环境变量设置")
 
 
+# 应用关闭事件
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    await stop_health_probers()
+    await invalidation_listener.stop()
+    await retention_scheduler.stop()
+    await log_partition_scheduler.stop()
+    await backup_retention_scheduler.stop()
+    await backup_compressor.stop()
+    # 先写入缓冲区中剩余的日志，再关闭数据库连接
+    await log_ingest_buffer.stop()
+    await dispose_async_engine()
+    backup_manifest.close()
+
+
 # 全局异常处理器
 @app.exception_handler(NovelBuilderException)
 async def novel_builder_exception_handler(request: Request, exc: NovelBuilderException):
@@ -102,6 +172,18 @@ async def novel_builder_exception_handler(request: Request, exc: NovelBuilderExc
     return JSONResponse(status_code=500, content=exc.to_dict())
 
 
+@app.exception_handler(ComfyUIUnavailableError)
+async def comfyui_unavailable_exception_handler(
+    request: Request, exc: ComfyUIUnavailableError
+):
+    """ComfyUI 熔断中：快速失败返回 503"""
+    return JSONResponse(
+        status_code=503,
+        content=exc.to_dict(),
+        headers={"Retry-After": str(exc.retry_after or 1)},
+    )
+
+
 @app.exception_handler(Exception)
 async def general_exception_handler(
     request: Request, exc: Exception
@@ -126,6 +208,14 @@ def handle_service_exception(
     Returns:
         HTTPException: 格式化的HTTP异常
     """
+    if isinstance(exc, ComfyUIUnavailableError):
+        logger.warning(f"{operation_name}失败: ComfyUI 熔断中")
+        return HTTPException(
+            status_code=503,
+            detail=exc.message,
+            headers={"Retry-After": str(exc.retry_after or 1)},
+        )
+
     expected_types = (ValueError, SQLAlchemyError)
     if isinstance(exc, expected_types):
         logger.warning(f"{operation_name}参数错误: {exc}")
@@ -170,7 +260,7 @@ def security_check() -> dict[str, Any]:
 
 @app.post("/api/text2img/generate", dependencies=[Depends(verify_token)])
 async def text2img_generate(
-    request: Text2ImgGenerateRequest, db: Session = Depends(get_db)
+    request: Text2ImgGenerateRequest, db: AsyncSession = Depends(get_async_db)
 ):
     """
     提交文生图任务
@@ -208,7 +298,7 @@ async def text2img_generate(
     },
     dependencies=[Depends(verify_token)],
 )
-async def text2img_get_image(task_id: str, db: Session = Depends(get_db)):
+async def text2img_get_image(task_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     根据 task_id 获取文生图结果
 
@@ -237,33 +327,174 @@ async def text2img_get_image(task_id: str, db: Session = Depends(get_db)):
         raise handle_service_exception(e, logger, "获取文生图结果")
 
 
+@app.post(
+    "/api/text2img/batch",
+    response_model=Text2ImgBatchSubmitResponse,
+    dependencies=[Depends(verify_token)],
+)
+async def text2img_batch_generate(
+    request: Text2ImgBatchRequest, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量提交文生图任务（如一个章节的全部插图）
+
+    - **items**: 提示词列表，每条可单独指定 model_name / negative_prompt
+
+    所有任务在同一事务内入库，并以有限并发提交到 ComfyUI。
+    返回 batch_id，可通过 GET /api/text2img/batch/{batch_id} 整体轮询；
+    单张图片仍通过 GET /api/text2img/image/{task_id} 获取。
+    """
+    try:
+        batch_id, task_ids = await text2img_service.generate_batch(request.items, db)
+        return Text2ImgBatchSubmitResponse(batch_id=batch_id, task_ids=task_ids)
+    except Exception as e:
+        raise handle_service_exception(e, logger, "批量提交文生图任务")
+
+
+@app.get(
+    "/api/text2img/batch/{batch_id}",
+    response_model=Text2ImgBatchStatusResponse,
+    dependencies=[Depends(verify_token)],
+)
+async def text2img_batch_status(
+    batch_id: str,
+    wait: int = Query(
+        0,
+        ge=0,
+        le=TEXT2IMG_BATCH_MAX_WAIT,
+        description="长轮询等待秒数，0 表示立即返回当前状态",
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    查询文生图批次状态
+
+    - **batch_id**: 批量提交时返回的批次ID
+    - **wait**: 长轮询秒数；批次内仍有任务生成中时最多等待该时长，
+      任务全部结束即提前返回
+    """
+    try:
+        result = await text2img_service.get_batch(batch_id, db, wait=wait)
+    except Exception as e:
+        raise handle_service_exception(e, logger, "查询文生图批次")
+    if result is None:
+        raise HTTPException(status_code=404, detail="批次不存在")
+    return result
+
+
+@app.post(
+    "/api/text2img/contact-sheet",
+    responses={
+        200: {
+            "content": {
+                "application/json": {
+                    "schema": {"$ref": "#/components/schemas/ContactSheetResponse"}
+                },
+                "application/zip": {"schema": {"type": "string", "format": "binary"}},
+            },
+            "description": "atlas 返回图集偏移表 JSON；zip 直接返回缩略图压缩包",
+        },
+        404: {"description": "列表中没有可用的已完成任务"},
+    },
+    dependencies=[Depends(verify_token)],
+)
+async def text2img_contact_sheet(
+    request: ContactSheetRequest, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    一次性获取多张文生图结果（联系表）
+
+    - **task_ids**: 已完成的文生图任务ID列表
+    - **format**: `atlas` 返回图集偏移表，图集图片通过 `image_url` 下载；
+      `zip` 直接返回缩略图压缩包（跳过的任务ID见 `X-Missing-Tasks` header）
+
+    结果按任务集合哈希缓存，相同请求直接复用。
+    """
+    try:
+        sheet = await contact_sheet_service.build(request.task_ids, request.format, db)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise handle_service_exception(e, logger, "生成联系表")
+
+    if sheet.format == "zip":
+        return FileResponse(
+            path=sheet.path,
+            media_type="application/zip",
+            filename=f"contact_sheet_{sheet.sheet_id[:12]}.zip",
+            headers={"X-Missing-Tasks": ",".join(sheet.missing)},
+        )
+
+    return ContactSheetResponse(
+        sheet_id=sheet.sheet_id,
+        image_url=f"/api/text2img/contact-sheet/{sheet.sheet_id}",
+        width=sheet.width,
+        height=sheet.height,
+        tiles=[AtlasTileInfo(**tile.__dict__) for tile in sheet.tiles],
+        missing=sheet.missing,
+    )
+
+
+@app.get(
+    "/api/text2img/contact-sheet/{sheet_id}",
+    response_class=FileResponse,
+    responses={
+        200: {
+            "content": {
+                "image/jpeg": {"schema": {"type": "string", "format": "binary"}}
+            },
+            "description": "图集图片",
+        },
+        404: {"description": "图集不存在或已过期"},
+    },
+    dependencies=[Depends(verify_token)],
+)
+async def text2img_contact_sheet_image(sheet_id: str):
+    """
+    下载图集图片
+
+    - **sheet_id**: POST /api/text2img/contact-sheet 返回的联系表ID
+    """
+    path = contact_sheet_service.get_atlas_path(sheet_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="图集不存在或已过期")
+    return FileResponse(
+        path=path,
+        media_type="image/jpeg",
+        headers={
+            # sheet_id 是内容哈希，内容不会变化
+            "Cache-Control": f"public, max-age={CACHE_ONE_DAY}, immutable",
+            "X-Content-Type-Options": "nosniff",
+        },
+    )
+
+
 @app.get("/text2img/health", dependencies=[Depends(verify_token)])
 async def text2img_health_check():
-    """检查ComfyUI服务健康状态"""
-    import requests
+    """检查ComfyUI服务健康状态
 
-    try:
-        comfyui_url = settings.comfyui_api_url
-        response = requests.get(f"{comfyui_url}/system_stats", timeout=TIMEOUT_FAST)
-
-        if response.status_code == 200:
-            return {
-                "status": "healthy",
-                "message": "ComfyUI服务正常",
-                "services": {"comfyui": True, "api_accessible": True},
-            }
-        else:
-            return {
-                "status": "unhealthy",
-                "message": f"ComfyUI服务响应异常: {response.status_code}",
-                "services": {"comfyui": False, "api_accessible": False},
-            }
-    except requests.RequestException as e:
-        return {
-            "status": "unhealthy",
-            "message": f"无法连接ComfyUI服务: {e!s}",
-            "services": {"comfyui": False, "api_accessible": False},
-        }
+    返回后台探测的缓存快照（延迟、显存、队列长度）与熔断器状态，
+    不会为每次调用向 ComfyUI 发起探测。
+    """
+    prober = get_health_prober()
+    snapshot = await prober.get_snapshot()
+    breaker = prober.transport.breaker.snapshot()
+    healthy = snapshot.healthy and breaker["state"] != CircuitState.OPEN.value
+
+    if healthy:
+        message = "ComfyUI服务正常"
+    elif breaker["state"] == CircuitState.OPEN.value:
+        message = "ComfyUI服务熔断中"
+    else:
+        message = snapshot.error or "ComfyUI服务异常"
+
+    return {
+        "status": "healthy" if healthy else "unhealthy",
+        "message": message,
+        "services": {"comfyui": healthy, "api_accessible": healthy},
+        "comfyui": {**snapshot.to_dict(), "stale": prober.is_stale()},
+        "circuit_breaker": breaker,
+    }
 
 
 # ================= 图生视频 API =================
@@ -274,7 +505,7 @@ async def image_to_video_generate(
     prompt: str = Form(..., description="视频生成提示词"),
     model_name: str | None = Form(None, description="模型名称（可选）"),
     image: UploadFile = File(..., description="输入图片"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     提交图生视频任务
@@ -310,7 +541,7 @@ async def image_to_video_generate(
     },
     dependencies=[Depends(verify_token)],
 )
-async def image_to_video_get_video(task_id: str, db: Session = Depends(get_db)):
+async def image_to_video_get_video(task_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     根据 task_id 获取图生视频结果
 
@@ -401,13 +632,29 @@ def index():
         "endpoints": [
             "POST /api/text2img/generate - 提交文生图任务",
             "GET /api/text2img/image/{task_id} - 获取文生图结果",
+            "POST /api/text2img/batch - 批量提交文生图任务",
+            "GET /api/text2img/batch/{batch_id} - 查询文生图批次状态(支持长轮询)",
+            "POST /api/text2img/contact-sheet - 多张文生图结果打包(zip/图集)",
+            "GET /api/text2img/contact-sheet/{sheet_id} - 下载图集图片",
             "GET /text2img/health - ComfyUI服务健康检查",
             "POST /api/image-to-video/generate - 提交图生视频任务",
             "GET /api/image-to-video/video/{task_id} - 获取图生视频结果",
             "GET /api/models - 获取可用模型列表",
+            "GET /api/tasks - 历史任务列表(按类型/状态/模型/时间过滤，游标分页)",
+            "POST /api/tasks/retention - 立即执行一次任务清理",
             "POST /api/backup/upload - 上传数据库备份",
+            "POST /api/backup/upload/init - 断点续传上传数据库备份（分块并行）",
             "GET /api/backup/list - 列出已上传的备份",
-            "GET /api/backup/download/{backup_id} - 下载备份文件",
+            "GET /api/backup/download/{backup_id} - 下载备份文件（支持 Range 续传）",
+            "POST /api/backup/archive - 多个备份打包为 ZIP 下载",
+            "GET /api/backup/stats - 备份存储统计（去重比）",
+            "POST /api/backup/retention - 按日/周/月保留策略清理过期备份（默认 dry-run）",
             "POST /api/logs/upload - 上报客户端日志",
+            "GET /api/logs - 检索客户端日志（过滤 + 全文检索）",
+            "GET /api/logs/export - 导出客户端日志（NDJSON / CSV）",
+            "GET /api/logs/groups - 高频客户端错误（按指纹聚合）",
+            "GET /api/logs/stats - 客户端日志分钟/小时计数统计",
+            "GET /api/logs/partitions - 客户端日志分区与行数",
+            "POST /api/logs/retention - 立即删除过期的客户端日志分区",
         ],
     }
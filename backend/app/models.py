@@ -6,12 +6,17 @@
 """
 
 # 重新导出分散在各个文件中的模型，确保使用统一的Base
-from .models.client_log import ClientLog
-from .models.text2img import ImageToVideoTask, Text2ImgTask
+from .models.client_log import ClientLog, ClientLogGroup, ClientLogRollup
+from .models.generation_job import GenerationJob
+from .models.text2img import ImageToVideoTask, Text2ImgBatch, Text2ImgTask
 
 # 导出所有模型，方便其他模块导入
 __all__ = [
     "ClientLog",
+    "ClientLogGroup",
+    "ClientLogRollup",
     "Text2ImgTask",
+    "Text2ImgBatch",
     "ImageToVideoTask",
+    "GenerationJob",
 ]
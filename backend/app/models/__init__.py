@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
-from .text2img import ImageToVideoTask, Text2ImgTask
+from .generation_job import GenerationJob
+from .text2img import ImageToVideoTask, Text2ImgBatch, Text2ImgTask
 
-__all__ = ["Text2ImgTask", "ImageToVideoTask"]
+__all__ = ["Text2ImgTask", "Text2ImgBatch", "ImageToVideoTask", "GenerationJob"]
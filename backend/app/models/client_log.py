@@ -7,7 +7,7 @@
 
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, Text
 
 from ..database import Base
 
@@ -31,12 +31,67 @@ class ClientLog(Base):
     received_at = Column(
         DateTime, default=lambda: datetime.now(timezone.utc)
     )  # server-side timestamp
+    fingerprint = Column(
+        String(40), nullable=True
+    )  # 错误指纹(归一化 message + stack_trace 的 SHA-1)，非错误日志为空
 
     __table_args__ = (
         Index("idx_level_timestamp", "level", "timestamp"),
         Index("idx_received_at", "received_at"),
         Index("idx_category_timestamp", "category", "timestamp"),
+        Index("idx_fingerprint_timestamp", "fingerprint", "timestamp"),
     )
 
     def __repr__(self):
-        return f"<ClientLog(id={self.id}, level={self.level}, timestamp={self.timestamp})>"
+        return (
+            f"<ClientLog(id={self.id}, level={self.level}, timestamp={self.timestamp})>"
+        )
+
+
+class ClientLogGroup(Base):
+    """客户端错误聚合表
+
+    相同指纹的错误日志聚合为一行，写入日志时累加计数，
+    查询高频错误无需扫描 client_logs。
+    """
+
+    __tablename__ = "client_log_groups"
+
+    fingerprint = Column(String(40), primary_key=True)
+    level = Column(String(10), nullable=False)
+    category = Column(String(20), nullable=False)
+    message = Column(Text, nullable=False)  # 首次出现时的原始消息(样例)
+    stack_trace = Column(Text, nullable=True)  # 首次出现时的堆栈(样例)
+    count = Column(BigInteger, nullable=False, default=0)
+    first_seen = Column(DateTime, nullable=False)  # 最早的客户端时间戳(UTC)
+    last_seen = Column(DateTime, nullable=False)  # 最近的客户端时间戳(UTC)
+
+    __table_args__ = (
+        Index("idx_log_group_count", "count"),
+        Index("idx_log_group_last_seen", "last_seen"),
+    )
+
+    def __repr__(self):
+        return f"<ClientLogGroup(fingerprint={self.fingerprint}, count={self.count})>"
+
+
+class ClientLogRollup(Base):
+    """客户端日志计数汇总表
+
+    写入日志时按 (粒度, 时间桶, 级别, 分类) 累加计数，粒度为分钟和小时。
+    仪表盘统计直接读取汇总行，行数只与时间范围有关，不扫描 client_logs。
+    """
+
+    __tablename__ = "client_log_rollups"
+
+    granularity = Column(String(6), primary_key=True)  # minute / hour
+    bucket = Column(DateTime, primary_key=True)  # 时间桶起点(客户端时间戳，UTC)
+    level = Column(String(10), primary_key=True)
+    category = Column(String(20), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"<ClientLogRollup(granularity={self.granularity}, bucket={self.bucket}, "
+            f"level={self.level}, category={self.category}, count={self.count})>"
+        )
@@ -0,0 +1,65 @@
+"""
+生成任务队列模型.
+
+开启 settings.generation_queue_enabled 后，API 进程只负责把文生图/图生视频任务
+写入 generation_job 表，由独立的 worker 进程(python -m app.worker)认领、
+提交到 ComfyUI 并跟踪结果。任务的 prompt_id 在入队时预先生成，
+与 text2img_task / image_to_video_task 中的 prompt_id 一致。
+"""
+
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String, Text
+from sqlalchemy.sql import func
+
+from ..database import Base
+
+
+class GenerationJob(Base):
+    """生成任务队列模型."""
+
+    __tablename__ = "generation_job"
+
+    id = Column(Integer, primary_key=True, comment="主键ID")
+    kind = Column(String(10), nullable=False, comment="任务类型: t2i/i2v")
+    prompt_id = Column(
+        String(255),
+        unique=True,
+        nullable=False,
+        index=True,
+        comment="预生成的 ComfyUI prompt_id",
+    )
+    model_name = Column(String(100), nullable=False, comment="使用的模型名称")
+    payload = Column(
+        Text, nullable=False, comment="提交参数 JSON(prompt/negative_prompt 等)"
+    )
+    input_data = Column(
+        LargeBinary, nullable=True, comment="输入图片二进制(仅图生视频)"
+    )
+    status = Column(
+        String(20),
+        nullable=False,
+        default="queued",
+        comment="队列状态: queued/submitting/submitted/done/failed",
+    )
+    attempts = Column(Integer, nullable=False, default=0, comment="已尝试提交次数")
+    available_at = Column(
+        DateTime(timezone=True), server_default=func.now(), comment="最早可被认领的时间"
+    )
+    locked_by = Column(String(100), nullable=True, comment="认领该任务的 worker 标识")
+    locked_at = Column(DateTime(timezone=True), nullable=True, comment="认领时间")
+    last_error = Column(Text, nullable=True, comment="最近一次错误信息")
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), comment="创建时间"
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        comment="更新时间",
+    )
+
+    __table_args__ = (
+        Index("idx_generation_job_status_available", "status", "available_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<GenerationJob(prompt_id='{self.prompt_id}', status='{self.status}')>"
@@ -1,14 +1,43 @@
 """
 文生图与图生视频任务模型.
 
-本模块包含文生图(Text2ImgTask)和图生视频(ImageToVideoTask)的数据库模型。
-两者统一以 ComfyUI 的 prompt_id 作为对外任务标识(task_id)。
+本模块包含文生图(Text2ImgTask)、文生图批次(Text2ImgBatch)和图生视频
+(ImageToVideoTask)的数据库模型。任务统一以 ComfyUI 的 prompt_id 作为对外任务
+标识(task_id)；批次以 batch_id 作为对外清单标识。
 """
 
-from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, text
 from sqlalchemy.sql import func
 
 from ..database import Base
+from ..utils.datetime_utils import utcnow
+
+# 部分索引条件：只索引 pending 任务(pending 扫描的数据量远小于全表)
+_PENDING_ONLY = text("status = 'pending'")
+
+
+def _task_indexes(table: str) -> tuple[Index, ...]:
+    """任务表的状态/模型复合索引、pending 部分索引与历史列表覆盖索引."""
+    return (
+        Index(f"idx_{table}_status_created", "status", "created_at"),
+        Index(f"idx_{table}_model_status", "model_name", "status"),
+        # 历史列表覆盖索引：列表接口只读这些列，无需回表
+        Index(
+            f"idx_{table}_listing",
+            "created_at",
+            "id",
+            "status",
+            "model_name",
+            "prompt_id",
+        ),
+        Index(
+            f"idx_{table}_pending_created",
+            "created_at",
+            "id",
+            postgresql_where=_PENDING_ONLY,
+            sqlite_where=_PENDING_ONLY,
+        ),
+    )
 
 
 class Text2ImgTask(Base):
@@ -30,15 +59,47 @@ class Text2ImgTask(Base):
     )
     filename = Column(String(500), nullable=True, comment="生成成功后的图片文件名")
     error_message = Column(Text, nullable=True, comment="错误信息")
+    # 由应用侧写入创建时间：SQLite 的 CURRENT_TIMESTAMP 不含微秒，与绑定参数的
+    # 字符串格式不一致，会导致 (created_at, id) 键集分页在同一秒内的记录上判断出错
     created_at = Column(
-        DateTime(timezone=True), server_default=func.now(), comment="创建时间"
+        DateTime(timezone=True),
+        default=utcnow,
+        server_default=func.now(),
+        comment="创建时间",
     )
     completed_at = Column(DateTime(timezone=True), nullable=True, comment="完成时间")
+    batch_id = Column(
+        String(64), nullable=True, index=True, comment="所属批次ID(单独提交时为空)"
+    )
+    batch_index = Column(Integer, nullable=True, comment="在批次中的序号(从0开始)")
+
+    __table_args__ = _task_indexes("text2img_task")
 
     def __repr__(self) -> str:
         return f"<Text2ImgTask(prompt_id='{self.prompt_id}', status='{self.status}')>"
 
 
+class Text2ImgBatch(Base):
+    """文生图批次模型(章节插图一次性提交的任务清单)."""
+
+    __tablename__ = "text2img_batch"
+
+    id = Column(Integer, primary_key=True, comment="主键ID")
+    batch_id = Column(
+        String(64), unique=True, nullable=False, index=True, comment="批次ID, 对外即 manifest ID"
+    )
+    total = Column(Integer, nullable=False, comment="批次内任务总数")
+    submit_errors = Column(
+        Text, nullable=True, comment="提交失败的条目 JSON: {序号: 错误信息}"
+    )
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), comment="创建时间"
+    )
+
+    def __repr__(self) -> str:
+        return f"<Text2ImgBatch(batch_id='{self.batch_id}', total={self.total})>"
+
+
 class ImageToVideoTask(Base):
     """图生视频任务模型."""
 
@@ -57,9 +118,14 @@ class ImageToVideoTask(Base):
     video_filename = Column(String(500), nullable=True, comment="生成成功后的视频文件名(可含 subfolder/filename)")
     error_message = Column(Text, nullable=True, comment="错误信息")
     created_at = Column(
-        DateTime(timezone=True), server_default=func.now(), comment="创建时间"
+        DateTime(timezone=True),
+        default=utcnow,
+        server_default=func.now(),
+        comment="创建时间",
     )
     completed_at = Column(DateTime(timezone=True), nullable=True, comment="完成时间")
 
+    __table_args__ = _task_indexes("image_to_video_task")
+
     def __repr__(self) -> str:
         return f"<ImageToVideoTask(prompt_id='{self.prompt_id}', status='{self.status}')>"
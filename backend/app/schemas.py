@@ -6,8 +6,17 @@
 for request validation and response serialization.
 """
 
+from typing import Any, Literal
+
 from pydantic import BaseModel, Field
 
+from .constants import (
+    BACKUP_ARCHIVE_MAX_ITEMS,
+    CONTACT_SHEET_MAX_ITEMS,
+    LOG_UPLOAD_MAX_ENTRIES,
+    TEXT2IMG_BATCH_MAX_ITEMS,
+)
+
 
 # ============================================================================
 # 文生图功能相关API模式
@@ -30,6 +39,145 @@ class Text2ImgGenerateRequest(BaseModel):
     )
 
 
+class Text2ImgBatchItem(BaseModel):
+    """文生图批量提交中的单条提示词."""
+
+    prompt: str = Field(..., min_length=1, max_length=5000, description="图片生成提示词")
+    model_name: str | None = Field(
+        None, max_length=100, description="模型名称(可选，默认使用默认模型)"
+    )
+    negative_prompt: str | None = Field(
+        None, max_length=5000, description="负向提示词(可选，规则同单条提交)"
+    )
+
+
+class Text2ImgBatchRequest(BaseModel):
+    """文生图批量提交请求模式."""
+
+    items: list[Text2ImgBatchItem] = Field(
+        ...,
+        min_length=1,
+        max_length=TEXT2IMG_BATCH_MAX_ITEMS,
+        description=f"待提交的提示词列表（1-{TEXT2IMG_BATCH_MAX_ITEMS}条）",
+    )
+
+
+class Text2ImgBatchSubmitResponse(BaseModel):
+    """文生图批量提交响应模式."""
+
+    batch_id: str = Field(..., description="批次ID，用于整体轮询")
+    task_ids: list[str | None] = Field(
+        ..., description="按提交顺序排列的 task_id，提交失败的条目为 null"
+    )
+
+
+class Text2ImgBatchItemStatus(BaseModel):
+    """批次内单个任务的状态."""
+
+    index: int = Field(..., description="在批次中的序号(从0开始)")
+    task_id: str | None = Field(None, description="任务ID，提交失败时为空")
+    status: str = Field(..., description="任务状态: pending/completed/failed")
+    error_message: str | None = Field(None, description="失败原因")
+
+
+class Text2ImgBatchStatusResponse(BaseModel):
+    """文生图批次状态响应模式."""
+
+    batch_id: str = Field(..., description="批次ID")
+    total: int = Field(..., description="任务总数")
+    pending: int = Field(..., description="生成中的任务数")
+    completed: int = Field(..., description="已完成的任务数")
+    failed: int = Field(..., description="失败的任务数")
+    done: bool = Field(..., description="批次内所有任务是否均已结束")
+    items: list[Text2ImgBatchItemStatus] = Field(
+        default_factory=list, description="按序号排列的任务状态"
+    )
+    circuit_breaker: dict[str, Any] | None = Field(
+        None,
+        description="ComfyUI 熔断导致部分任务未刷新时的熔断器状态，这些任务返回已保存的状态",
+    )
+
+
+class ContactSheetRequest(BaseModel):
+    """联系表(多图打包)请求模式."""
+
+    task_ids: list[str] = Field(
+        ...,
+        min_length=1,
+        max_length=CONTACT_SHEET_MAX_ITEMS,
+        description=f"已完成的文生图任务ID列表（1-{CONTACT_SHEET_MAX_ITEMS}个）",
+    )
+    format: Literal["zip", "atlas"] = Field(
+        "atlas", description="打包格式: zip(缩略图压缩包) / atlas(拼接图集+偏移表)"
+    )
+
+
+class AtlasTileInfo(BaseModel):
+    """图集中单张缩略图的偏移信息."""
+
+    task_id: str = Field(..., description="任务ID")
+    x: int = Field(..., description="左上角横坐标(像素)")
+    y: int = Field(..., description="左上角纵坐标(像素)")
+    width: int = Field(..., description="缩略图宽度(像素)")
+    height: int = Field(..., description="缩略图高度(像素)")
+
+
+class ContactSheetResponse(BaseModel):
+    """图集响应模式."""
+
+    sheet_id: str = Field(..., description="联系表ID(任务集合哈希)")
+    image_url: str = Field(..., description="图集图片下载地址")
+    width: int = Field(..., description="图集宽度(像素)")
+    height: int = Field(..., description="图集高度(像素)")
+    tiles: list[AtlasTileInfo] = Field(default_factory=list, description="偏移表")
+    missing: list[str] = Field(
+        default_factory=list, description="未完成/不存在/拉取失败而被跳过的任务ID"
+    )
+
+
+# ============================================================================
+# 任务历史相关API模式
+# ============================================================================
+
+
+class TaskHistoryItem(BaseModel):
+    """任务历史条目(只包含列表覆盖索引中的字段)."""
+
+    task_id: str = Field(..., description="任务ID")
+    type: Literal["t2i", "i2v"] = Field(..., description="任务类型: t2i 文生图 / i2v 图生视频")
+    status: str = Field(..., description="任务状态: pending/completed/failed")
+    model_name: str = Field(..., description="使用的模型名称")
+    created_at: str = Field(..., description="创建时间(ISO格式)")
+
+
+class TaskHistoryResponse(BaseModel):
+    """任务历史列表响应."""
+
+    items: list[TaskHistoryItem] = Field(
+        default_factory=list, description="任务列表(按创建时间倒序)"
+    )
+    next_cursor: str | None = Field(
+        None, description="下一页游标，传给 cursor 参数翻页；为空表示没有更多"
+    )
+
+
+class TaskRetentionResponse(BaseModel):
+    """任务保留策略执行结果."""
+
+    started_at: str = Field(..., description="开始时间(ISO格式)")
+    dry_run: bool = Field(..., description="是否只统计，不删除")
+    duration_ms: float = Field(0.0, description="耗时(毫秒)")
+    deleted: dict[str, dict[str, int]] = Field(
+        default_factory=dict,
+        description="按任务类型/状态统计的删除(dry_run 时为将要删除)行数",
+    )
+    deleted_batches: int = Field(0, description="删除的文生图批次数")
+    archived: int = Field(0, description="归档的任务数")
+    media_files: int = Field(0, description="回收的缓存文件数")
+    media_bytes: int = Field(0, description="回收的缓存空间(字节)")
+    comfyui_history_deleted: int = Field(0, description="删除的 ComfyUI history 条数")
+
+
 # ============================================================================
 # 模型管理相关API模式
 # ============================================================================
@@ -70,6 +218,65 @@ class BackupUploadResponse(BaseModel):
     file_size: int = Field(..., description="文件大小(字节)")
     uploaded_at: str = Field(..., description="上传时间(ISO格式)")
     stored_name: str = Field(..., description="存储文件名")
+    sha256: str | None = Field(None, description="文件内容 SHA-256(十六进制)")
+    stored_bytes: int | None = Field(
+        None, description="本次实际新写入的字节数(去重存储时只计新增的块)"
+    )
+
+
+class BackupUploadInitRequest(BaseModel):
+    """备份断点续传初始化请求."""
+
+    filename: str = Field(..., description="备份文件名(.db / .zip)")
+    total_size: int = Field(..., ge=0, description="文件总大小(字节)")
+    chunk_size: int = Field(..., gt=0, description="分块大小(字节)")
+    sha256: str | None = Field(
+        None,
+        pattern=r"^[0-9a-fA-F]{64}$",
+        description="整个文件的 SHA-256，提供时完成上传会校验",
+    )
+
+
+class BackupUploadInitResponse(BaseModel):
+    """备份断点续传初始化响应."""
+
+    upload_id: str = Field(..., description="上传任务唯一标识(UUID)")
+    chunk_size: int = Field(..., description="分块大小(字节)")
+    total_chunks: int = Field(..., description="分块总数")
+
+
+class BackupChunkUploadResponse(BaseModel):
+    """备份分块上传响应."""
+
+    index: int = Field(..., description="分块序号")
+    received_bytes: int = Field(..., description="已接收字节数")
+    sha256: str = Field(..., description="分块 SHA-256")
+
+
+class BackupUploadStatusResponse(BaseModel):
+    """备份断点续传状态响应."""
+
+    upload_id: str = Field(..., description="上传任务唯一标识")
+    filename: str = Field(..., description="备份文件名")
+    total_size: int = Field(..., description="文件总大小(字节)")
+    chunk_size: int = Field(..., description="分块大小(字节)")
+    total_chunks: int = Field(..., description="分块总数")
+    received_indices: list[int] = Field(
+        default_factory=list, description="已接收的分块序号集合"
+    )
+    complete: bool = Field(..., description="是否所有分块均已接收")
+
+
+class BackupArchiveRequest(BaseModel):
+    """多个备份打包下载请求."""
+
+    backup_ids: list[str] = Field(
+        ...,
+        min_length=1,
+        max_length=BACKUP_ARCHIVE_MAX_ITEMS,
+        description="要打包的备份 backup_id 列表(重复的只打包一次)",
+    )
+    compress: bool = Field(False, description="是否 DEFLATE 压缩，默认仅存储")
 
 
 class BackupInfo(BaseModel):
@@ -80,13 +287,73 @@ class BackupInfo(BaseModel):
     stored_name: str = Field(..., description="存储文件名")
     backup_id: str = Field(..., description="备份唯一标识(相对路径)")
     uploaded_at: str = Field(..., description="上传时间(ISO格式)")
+    sha256: str | None = Field(
+        None, description="文件内容 SHA-256(十六进制)；非经上传接口写入的文件为空"
+    )
 
 
 class BackupListResponse(BaseModel):
     """备份列表响应."""
 
     backups: list[BackupInfo] = Field(
-        default_factory=list, description="备份列表(按时间倒序)"
+        default_factory=list, description="备份列表(默认按上传时间倒序)"
+    )
+    total: int = Field(0, description="备份总数")
+    next_cursor: str | None = Field(
+        None, description="下一页游标，传给 cursor 参数翻页；为空表示没有更多"
+    )
+
+
+class BackupStatsResponse(BaseModel):
+    """备份存储统计."""
+
+    backups: int = Field(..., description="备份总数")
+    chunked_backups: int = Field(..., description="去重存储的备份数")
+    logical_bytes: int = Field(..., description="所有备份的原始大小之和")
+    stored_bytes: int = Field(..., description="实际占用(完整文件 + 压缩后的去重块)")
+    chunks: int = Field(..., description="去重块数量")
+    chunk_bytes: int = Field(..., description="去重块总大小")
+    dedup_ratio: float | None = Field(
+        None, description="去重比: 去重备份原始大小 / 去重块总大小"
+    )
+    compressed_chunks: int = Field(0, description="已 zstd 压缩的去重块数量")
+    chunk_stored_bytes: int = Field(0, description="去重块实际占用(压缩后)")
+    compression_ratio: float | None = Field(
+        None, description="压缩比: 去重块总大小 / 去重块实际占用"
+    )
+
+
+class BackupRetentionItem(BaseModel):
+    """保留策略对单个备份的决定."""
+
+    backup_id: str = Field(..., description="备份ID")
+    filename: str = Field(..., description="原始文件名(分组依据)")
+    uploaded_at: str = Field(..., description="上传时间(ISO格式)")
+    file_size: int = Field(..., description="原始大小(字节)")
+    keep: bool = Field(..., description="是否保留")
+    reasons: list[str] = Field(
+        default_factory=list, description="满足的保留规则(daily/weekly/monthly)"
+    )
+
+
+class BackupRetentionResponse(BaseModel):
+    """备份保留策略执行结果."""
+
+    started_at: str = Field(..., description="开始时间(ISO格式)")
+    dry_run: bool = Field(..., description="是否只计算计划")
+    skipped: bool = Field(False, description="其他进程正在执行，本次跳过")
+    policy: dict[str, int] = Field(..., description="每组保留的日/周/月份数")
+    duration_ms: float = Field(0.0, description="耗时(毫秒)")
+    groups: int = Field(0, description="备份分组数")
+    kept: int = Field(0, description="保留的备份数")
+    deleted: int = Field(0, description="删除(dry_run 时为将要删除)的备份数")
+    deleted_batches: int = Field(0, description="删除事务批数")
+    deleted_bytes: int = Field(0, description="删除的备份原始大小之和")
+    freed_bytes: int = Field(0, description="实际释放的空间(完整文件 + 不再被引用的块)")
+    failed: int = Field(0, description="删除失败的备份数")
+    items: list[BackupRetentionItem] = Field(
+        default_factory=list,
+        description="dry_run 时为全部备份的决定，否则为实际删除的备份",
     )
 
 
@@ -114,8 +381,8 @@ class LogUploadRequest(BaseModel):
     logs: list[LogEntrySchema] = Field(
         ...,
         min_length=1,
-        max_length=50,
-        description="待上报的日志列表（1-50条）",
+        max_length=LOG_UPLOAD_MAX_ENTRIES,
+        description=f"待上报的日志列表（1-{LOG_UPLOAD_MAX_ENTRIES}条）",
     )
 
 
@@ -123,9 +390,77 @@ class LogUploadResponse(BaseModel):
     """日志上报响应"""
 
     received: int = Field(..., description="成功接收的日志条数")
+    rejected: int = Field(0, description="校验失败被丢弃的日志条数（NDJSON 上报）")
     message: str = Field(..., description="响应消息")
 
 
+class ClientLogItem(BaseModel):
+    """检索到的客户端日志"""
+
+    id: int = Field(..., description="日志ID")
+    level: str = Field(..., description="日志级别")
+    category: str = Field(..., description="日志分类")
+    message: str = Field(..., description="日志消息内容")
+    stack_trace: _Optional[str] = Field(None, description="堆栈信息")
+    tags: list[str] = Field(default_factory=list, description="日志标签列表")
+    timestamp: str = Field(..., description="客户端时间戳 (UTC)")
+    received_at: _Optional[str] = Field(None, description="服务端接收时间 (UTC)")
+    fingerprint: _Optional[str] = Field(None, description="错误指纹")
+
+
+class ClientLogListResponse(BaseModel):
+    """日志检索响应"""
+
+    items: list[ClientLogItem] = Field(
+        default_factory=list, description="日志列表(按客户端时间倒序)"
+    )
+    next_cursor: _Optional[str] = Field(
+        None, description="下一页游标，传给 cursor 参数翻页；为空表示没有更多"
+    )
+
+
+class ClientLogStatsItem(BaseModel):
+    """一个时间桶内某级别、某分类的日志条数"""
+
+    bucket: str = Field(..., description="时间桶起点 (UTC)")
+    level: str = Field(..., description="日志级别")
+    category: str = Field(..., description="日志分类")
+    count: int = Field(..., description="日志条数")
+
+
+class ClientLogStatsResponse(BaseModel):
+    """日志统计响应"""
+
+    granularity: str = Field(..., description="时间粒度: minute / hour")
+    since: str = Field(..., description="统计起点 (UTC，含)")
+    until: str = Field(..., description="统计终点 (UTC，不含)")
+    total: int = Field(0, description="范围内日志总条数")
+    items: list[ClientLogStatsItem] = Field(
+        default_factory=list, description="按时间桶、级别、分类排序的计数"
+    )
+
+
+class ClientLogGroupItem(BaseModel):
+    """聚合后的客户端错误"""
+
+    fingerprint: str = Field(..., description="错误指纹")
+    level: str = Field(..., description="日志级别")
+    category: str = Field(..., description="日志分类")
+    message: str = Field(..., description="首次出现时的消息")
+    stack_trace: _Optional[str] = Field(None, description="首次出现时的堆栈")
+    count: int = Field(..., description="累计出现次数")
+    first_seen: str = Field(..., description="最早出现时间 (UTC)")
+    last_seen: str = Field(..., description="最近出现时间 (UTC)")
+
+
+class ClientLogGroupsResponse(BaseModel):
+    """高频错误列表响应"""
+
+    items: list[ClientLogGroupItem] = Field(
+        default_factory=list, description="按出现次数倒序的错误聚合"
+    )
+
+
 # ============================================================================
 # ComfyUI 模型文件分块上传相关 API 模式
 # ============================================================================
@@ -0,0 +1,76 @@
+"""
+多个备份打包为 ZIP 流式下载.
+
+zipfile 写入不可 seek 的输出时会在每个条目后追加数据描述符(CRC 与大小)，不需要
+回写本地文件头，因此可以边读取备份边输出：各条目内容逐段写入 ZipFile，写出的字节
+从内存缓冲区取出后立即发送，内存占用与备份大小无关，也不生成临时文件。
+"""
+
+import asyncio
+import io
+import zipfile
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class ArchiveMember:
+    """ZIP 中的一个条目."""
+
+    name: str  # 条目路径
+    size: int  # 原始大小，用于决定是否使用 ZIP64
+    modified: datetime
+    content: AsyncIterator[bytes]
+
+
+class _ZipSink(io.RawIOBase):
+    """ZipFile 的输出：不可 seek，写入的字节暂存到下次 drain."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+async def stream_zip(
+    members: Iterable[ArchiveMember], compress: bool = False
+) -> AsyncIterator[bytes]:
+    """依次读取各条目内容并输出 ZIP 流.
+
+    Args:
+        members: 条目(内容在轮到该条目时才开始读取)
+        compress: 使用 DEFLATE 压缩，默认仅存储(备份已去重/压缩存储，打包只为一次下载)
+    """
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, "w", compression=compression, allowZip64=True)
+    for member in members:
+        info = zipfile.ZipInfo(member.name, date_time=_zip_time(member.modified))
+        info.compress_type = compression
+        entry = archive.open(info, "w", force_zip64=member.size >= zipfile.ZIP64_LIMIT)
+        async for data in member.content:
+            # CRC 与压缩在线程池中计算
+            await asyncio.to_thread(entry.write, data)
+            if output := sink.drain():
+                yield output
+        entry.close()
+        if output := sink.drain():
+            yield output
+    archive.close()
+    yield sink.drain()
+
+
+def _zip_time(modified: datetime) -> tuple[int, int, int, int, int, int]:
+    # ZIP 时间戳不早于 1980 年
+    return max(modified, datetime(1980, 1, 1)).timetuple()[:6]
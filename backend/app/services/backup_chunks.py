@@ -0,0 +1,387 @@
+"""
+备份内容分块存储(内容定义分块 + 去重).
+
+客户端每天上传的 novel_app_backup.db 大部分内容不变，整份保存会让备份目录随天数
+线性增长。这里把备份按内容切成变长块，以块的 SHA-256 命名存放在 .chunks/ 下，
+备份本身只是清单中的一组有序块引用，重复上传只写入变化的块。
+
+切块边界(content-defined chunking):
+- 每个字节经固定的随机表映射为 1 个比特，连续 W 个字节的比特串即滑动窗口指纹，
+  窗口等于给定模式时在窗口末尾切分。边界只由附近 W 个字节决定，内容插入/删除
+  只影响附近的边界，之后的块仍与旧备份对齐
+- 参照 FastCDC 的归一化分块：块长未到平均值前使用较长(较难匹配)的模式，超过后
+  换用较短的模式，并限制最小/最大块长，使块长集中在平均值附近
+- 窗口匹配通过 bytes.translate + bytes.find 在 C 层完成，不逐字节执行 Python 代码
+
+映射表、模式与块长参数一经确定不能修改，否则新旧备份的切块边界不再一致，去重失效。
+
+块先以原始内容写入，之后由后台压缩任务(backup_compression)压缩为独立的 zstd 帧
+<哈希>.zst 并删除原始文件；压缩后不变小的块保持原样。每个块都是独立的帧，备份的
+任意位置都可以从所在块开始解压，读取时按清单中的压缩状态选择文件，找不到时再尝试
+另一种形式(压缩任务可能刚好替换了块文件)。
+
+除 stream_recipe 外，这里的方法均为阻塞 I/O，由调用方通过 asyncio.to_thread 在线程池中执行。
+"""
+
+import asyncio
+import hashlib
+import os
+import struct
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+import zstandard
+
+from ..constants import (
+    BACKUP_CHUNK_AVG_SIZE,
+    BACKUP_CHUNK_MAX_SIZE,
+    BACKUP_CHUNK_MIN_SIZE,
+    BACKUP_PASSTHROUGH_COMPRESS_LEVEL,
+    BACKUP_STREAM_BYTES,
+)
+
+# 字节 -> 比特 映射表(由 SHA-256 派生，固定不变)
+_BIT_TABLE = bytes(hashlib.sha256(bytes([i])).digest()[0] & 1 for i in range(256))
+# 窗口模式：取同一随机比特串的前缀，块长未到平均值前多匹配 2 个比特，之后少 2 个
+_PATTERN_BITS = "10110011100010110100111001010011"
+_AVG_BITS = BACKUP_CHUNK_AVG_SIZE.bit_length() - 1
+_PATTERN_STRICT = bytes(int(bit) for bit in _PATTERN_BITS[: _AVG_BITS + 2])
+_PATTERN_LOOSE = bytes(int(bit) for bit in _PATTERN_BITS[: _AVG_BITS - 2])
+
+CHUNK_DIR_NAME = ".chunks"
+ZSTD_SUFFIX = ".zst"
+
+# zstd 可跳过帧与 seekable 格式的魔数(见 zstd contrib/seekable_format)
+_SKIPPABLE_MAGIC = 0x184D2A5E
+_SEEKABLE_MAGIC = 0x8F92EAB1
+
+
+def _find_cut(mapped: bytes, start: int, end: int) -> int:
+    """返回 mapped[start:end] 中第一个块的结束位置(相对整个缓冲区)."""
+    if end - start <= BACKUP_CHUNK_MIN_SIZE:
+        return end
+    normal = min(start + BACKUP_CHUNK_AVG_SIZE, end)
+    strict = len(_PATTERN_STRICT)
+    index = mapped.find(_PATTERN_STRICT, start + BACKUP_CHUNK_MIN_SIZE - strict, normal)
+    if index >= 0:
+        return index + strict
+    loose = len(_PATTERN_LOOSE)
+    index = mapped.find(_PATTERN_LOOSE, normal - loose, end)
+    if index >= 0:
+        return index + loose
+    return end
+
+
+def iter_chunks(blocks: Iterable[bytes]) -> Iterator[bytes]:
+    """把连续的数据块按内容定义边界重新切分.
+
+    Args:
+        blocks: 按顺序读取的原始数据(任意大小)
+
+    Yields:
+        切分后的块，拼接后与输入完全一致
+    """
+    buffer = b""
+    for block in blocks:
+        if not block:
+            continue
+        buffer += block
+        if len(buffer) < BACKUP_CHUNK_MAX_SIZE:
+            continue
+        mapped = buffer.translate(_BIT_TABLE)
+        offset = 0
+        # 剩余不足一个最大块时等待更多数据，避免在缓冲区末尾提前切分
+        while len(buffer) - offset >= BACKUP_CHUNK_MAX_SIZE:
+            cut = _find_cut(mapped, offset, offset + BACKUP_CHUNK_MAX_SIZE)
+            yield buffer[offset:cut]
+            offset = cut
+        buffer = buffer[offset:]
+
+    mapped = buffer.translate(_BIT_TABLE)
+    offset = 0
+    while offset < len(buffer):
+        cut = _find_cut(
+            mapped, offset, min(offset + BACKUP_CHUNK_MAX_SIZE, len(buffer))
+        )
+        yield buffer[offset:cut]
+        offset = cut
+
+
+def read_blocks(source: BinaryIO, block_size: int) -> Iterator[bytes]:
+    """按块读取二进制文件对象直到结束."""
+    while block := source.read(block_size):
+        yield block
+
+
+def seek_table(frames: list[tuple[int, int]]) -> bytes:
+    """生成 zstd seekable 格式的跳转表(位于末尾的可跳过帧).
+
+    Args:
+        frames: 按顺序的 (压缩后长度, 解压后长度)
+    """
+    entries = b"".join(struct.pack("<II", c_size, d_size) for c_size, d_size in frames)
+    # 帧描述符为 0：表项不带校验和
+    footer = struct.pack("<IBI", len(frames), 0, _SEEKABLE_MAGIC)
+    header = struct.pack("<II", _SKIPPABLE_MAGIC, len(entries) + len(footer))
+    return header + entries + footer
+
+
+def seek_table_size(frame_count: int) -> int:
+    """跳转表的字节数."""
+    return 8 + 8 * frame_count + 9
+
+
+class ChunkRef(NamedTuple):
+    """备份引用的一个块."""
+
+    digest: str
+    size: int  # 原始长度
+    compressed: bool = False  # 清单记录的块文件是否为 zstd 帧
+    stored_size: int | None = None  # 压缩后的长度(未压缩时为空)
+    offset: int = 0  # 在备份中的起始位置
+
+
+@dataclass
+class IngestResult:
+    """一次写入的结果."""
+
+    size: int = 0
+    sha256: str = ""
+    # 有序的 (块哈希, 块长度)
+    chunks: list[tuple[str, int]] = field(default_factory=list)
+    new_chunks: int = 0
+    new_bytes: int = 0
+
+
+class ChunkStore:
+    """按 SHA-256 寻址的块文件存储: <root>/<哈希前两位>/<哈希>."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, digest: str, compressed: bool = False) -> Path:
+        name = digest + ZSTD_SUFFIX if compressed else digest
+        return self.root / digest[:2] / name
+
+    def ingest(self, blocks: Iterable[bytes]) -> IngestResult:
+        """切块并写入尚不存在的块，同时计算整个文件的大小与 SHA-256."""
+        result = IngestResult()
+        whole = hashlib.sha256()
+        for chunk in iter_chunks(blocks):
+            whole.update(chunk)
+            digest = hashlib.sha256(chunk).hexdigest()
+            if self._write(digest, chunk):
+                result.new_chunks += 1
+                result.new_bytes += len(chunk)
+            result.chunks.append((digest, len(chunk)))
+            result.size += len(chunk)
+        result.sha256 = whole.hexdigest()
+        return result
+
+    def read(self, digest: str, compressed: bool = False) -> bytes:
+        """读取块的原始内容(压缩块解压后返回).
+
+        Raises:
+            OSError: 块文件不存在或读取失败
+        """
+        return self.read_many([ChunkRef(digest, 0, compressed)])
+
+    def read_many(self, refs: Iterable[ChunkRef]) -> bytes:
+        """按顺序读取多个块的原始内容并拼接."""
+        dctx = zstandard.ZstdDecompressor()
+        parts = []
+        for ref in refs:
+            data, compressed = self._read_stored(ref.digest, ref.compressed)
+            parts.append(dctx.decompress(data) if compressed else data)
+        return b"".join(parts)
+
+    def read_frames(self, refs: Iterable[ChunkRef]) -> list[tuple[bytes, int]]:
+        """按顺序读取多个块的 zstd 帧，返回 [(帧, 解压后长度)].
+
+        尚未压缩或不可压缩的块以低压缩级别即时压缩为帧。
+        """
+        cctx = None
+        frames = []
+        for ref in refs:
+            data, compressed = self._read_stored(ref.digest, ref.compressed)
+            if compressed:
+                frames.append((data, ref.size))
+                continue
+            if cctx is None:
+                cctx = _compressor(BACKUP_PASSTHROUGH_COMPRESS_LEVEL)
+            frames.append((cctx.compress(data), len(data)))
+        return frames
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).exists() or self.path(digest, True).exists()
+
+    def compress(self, digests: Iterable[str], level: int) -> dict[str, int | None]:
+        """把原始块压缩为 <哈希>.zst.
+
+        原始块文件保留，由调用方在清单登记压缩状态后通过 discard_raw 删除。
+
+        Returns:
+            {块哈希: 压缩后长度}，压缩后不变小的块为 None；两种块文件都不存在的块不返回
+        """
+        cctx = _compressor(level)
+        results: dict[str, int | None] = {}
+        for digest in digests:
+            target = self.path(digest, True)
+            try:
+                # 其他进程已压缩过
+                results[digest] = target.stat().st_size
+                continue
+            except FileNotFoundError:
+                pass
+            try:
+                data = self.path(digest).read_bytes()
+            except FileNotFoundError:
+                continue
+            frame = cctx.compress(data)
+            if len(frame) >= len(data):
+                results[digest] = None
+                continue
+            self._write_file(target, frame)
+            results[digest] = len(frame)
+        return results
+
+    def discard_raw(self, digests: Iterable[str]) -> None:
+        """删除已有压缩版本的原始块文件."""
+        for digest in digests:
+            self.path(digest).unlink(missing_ok=True)
+
+    def delete(self, digests: Iterable[str]) -> int:
+        """删除块文件(原始与压缩两种形式)，返回释放的字节数."""
+        freed = 0
+        for digest in digests:
+            for path in (self.path(digest), self.path(digest, True)):
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                freed += size
+        return freed
+
+    def cleanup_temp(self, max_age: float) -> int:
+        """删除写入中断残留的临时块文件，返回删除数量."""
+        if not self.root.is_dir():
+            return 0
+        expire_before = time.time() - max_age
+        removed = 0
+        for directory in self.root.iterdir():
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory):
+                if not entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.stat().st_mtime < expire_before:
+                        Path(entry.path).unlink()
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    def _read_stored(self, digest: str, compressed: bool) -> tuple[bytes, bool]:
+        """读取块文件，返回 (文件内容, 是否为 zstd 帧)."""
+        try:
+            return self.path(digest, compressed).read_bytes(), compressed
+        except FileNotFoundError:
+            # 压缩任务可能在读取清单后替换了块文件
+            return self.path(digest, not compressed).read_bytes(), not compressed
+
+    def _write(self, digest: str, data: bytes) -> bool:
+        """写入原始块文件，块(任一形式)已存在时跳过并返回 False."""
+        if self.exists(digest):
+            return False
+        self._write_file(self.path(digest), data)
+        return True
+
+    @staticmethod
+    def _write_file(path: Path, data: bytes) -> None:
+        """先写临时文件并 fsync，再重命名为目标文件."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with temp.open("wb") as out:
+                out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+            temp.replace(path)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+
+
+def _compressor(level: int) -> zstandard.ZstdCompressor:
+    # 帧头写入原始长度，解压时可一次分配
+    return zstandard.ZstdCompressor(level=level, write_content_size=True)
+
+
+def _batches(recipe: list[ChunkRef]) -> Iterator[list[ChunkRef]]:
+    """把块列表按约 BACKUP_STREAM_BYTES 的原始大小分批."""
+    batch: list[ChunkRef] = []
+    batch_size = 0
+    for ref in recipe:
+        batch.append(ref)
+        batch_size += ref.size
+        if batch_size >= BACKUP_STREAM_BYTES:
+            yield batch
+            batch, batch_size = [], 0
+    if batch:
+        yield batch
+
+
+async def stream_recipe(
+    store: ChunkStore,
+    recipe: list[ChunkRef],
+    skip: int = 0,
+    length: int | None = None,
+) -> AsyncIterator[bytes]:
+    """按块列表顺序输出备份的原始内容，每批在线程池中读取并解压.
+
+    Args:
+        store: 块存储
+        recipe: 有序的块列表(可以是备份的一段)
+        skip: 跳过第一个块开头的字节数
+        length: 最多输出的字节数，None 表示输出到最后一个块结束
+    """
+    for batch in _batches(recipe):
+        data = await asyncio.to_thread(store.read_many, batch)
+        if skip:
+            data, skip = data[skip:], 0
+        if length is not None:
+            data = data[:length]
+            length -= len(data)
+        if data:
+            yield data
+        if length == 0:
+            return
+
+
+async def stream_recipe_zstd(
+    store: ChunkStore, recipe: list[ChunkRef]
+) -> AsyncIterator[bytes]:
+    """按块列表顺序输出 zstd seekable 格式的压缩流.
+
+    每个块是一个独立的帧，末尾追加跳转表；标准 zstd 解码器会忽略跳转表，
+    解压结果即备份原始内容。
+    """
+    table: list[tuple[int, int]] = []
+    for batch in _batches(recipe):
+        frames = await asyncio.to_thread(store.read_frames, batch)
+        table.extend((len(frame), size) for frame, size in frames)
+        yield b"".join(frame for frame, _ in frames)
+    yield seek_table(table)
+
+
+def compressed_length(recipe: list[ChunkRef]) -> int | None:
+    """stream_recipe_zstd 输出的总长度；存在未压缩的块时无法预先确定，返回 None."""
+    if not all(ref.compressed and ref.stored_size is not None for ref in recipe):
+        return None
+    return sum(ref.stored_size for ref in recipe) + seek_table_size(len(recipe))
@@ -0,0 +1,102 @@
+"""
+去重块后台压缩.
+
+备份数据库以小说正文为主，zstd 压缩率很高。上传时块以原始内容写入(不拖慢上传)，
+这里的后台任务在上传后被唤醒，并按 BACKUP_COMPRESS_INTERVAL 定期补扫，把清单中
+待压缩的块压缩为独立的 zstd 帧：
+1. 按哈希顺序分批读取待压缩的块
+2. 在线程池中压缩并写入 <哈希>.zst(原始文件保留)
+3. 在清单中登记压缩状态与压缩后大小
+4. 删除已登记块的原始文件
+
+任一步骤中断都不会丢失数据：读取块时两种形式都会尝试，下次运行时已存在的 .zst
+直接登记。settings.backup_compress_level 为 0 时不启动。
+
+只压缩去重存储的块：以完整文件保存的备份(关闭 BACKUP_DEDUP_ENABLED 后上传的，以及
+启用去重之前的历史备份)保持原样，下载与 Range 续传直接读取文件。
+"""
+
+import asyncio
+import contextlib
+import logging
+
+from ..config import settings
+from ..constants import BACKUP_COMPRESS_BATCH, BACKUP_COMPRESS_INTERVAL
+from .backup_manifest import BackupManifest, backup_manifest
+
+logger = logging.getLogger(__name__)
+
+
+class BackupCompressor:
+    """压缩去重块的后台任务."""
+
+    def __init__(self, manifest: BackupManifest):
+        """初始化压缩任务.
+
+        Args:
+            manifest: 备份清单(其块存储中的块会被压缩)
+        """
+        self.manifest = manifest
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def start(self) -> None:
+        """在当前事件循环中启动."""
+        if settings.backup_compress_level <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(self._wakeup))
+
+    def notify(self) -> None:
+        """有新块写入，尽快开始压缩."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        """停止后台压缩."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+            self._wakeup = None
+
+    async def run_once(self) -> dict[str, int]:
+        """压缩当前所有待压缩的块，返回压缩/不可压缩的块数及压缩块的总大小."""
+        store = self.manifest.chunk_store
+        result = {"compressed": 0, "incompressible": 0, "stored_bytes": 0}
+        after = ""
+        while digests := await self.manifest.pending_chunks(
+            after, BACKUP_COMPRESS_BATCH
+        ):
+            after = digests[-1]
+            sizes = await asyncio.to_thread(
+                store.compress, digests, settings.backup_compress_level
+            )
+            compressed = set(await self.manifest.mark_compressed(sizes))
+            await asyncio.to_thread(store.discard_raw, compressed)
+            for digest, stored_size in sizes.items():
+                if stored_size is None:
+                    result["incompressible"] += 1
+                elif digest in compressed:
+                    result["compressed"] += 1
+                    result["stored_bytes"] += stored_size
+        if result["compressed"] or result["incompressible"]:
+            logger.info(f"备份块压缩完成: {result}")
+        return result
+
+    async def _run(self, wakeup: asyncio.Event) -> None:
+        while True:
+            # 先清除再扫描，扫描期间写入的块会再触发一轮
+            wakeup.clear()
+            try:
+                await self.run_once()
+            except Exception as e:  # 后台循环不能因单次异常退出
+                logger.error(f"备份块压缩异常: {e}")
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(wakeup.wait(), BACKUP_COMPRESS_INTERVAL)
+
+
+# 全局实例
+backup_compressor = BackupCompressor(backup_manifest)
@@ -0,0 +1,759 @@
+"""
+数据库备份清单.
+
+备份文件按 backups/YYYY-MM-DD/<文件名> 存放。列表接口原先每次请求都 rglob 整个目录
+并逐个 stat，备份数量多时每次翻页都是一次全目录遍历。这里把备份元信息记录在备份
+目录下的 SQLite 清单(.manifest.sqlite3)中：
+- 上传/删除时增量更新清单
+- 启动时对账一次：补录目录中有而清单中没有的文件，删除文件已不存在的记录，
+  更新大小或修改时间有变化的记录
+- 列表按 (排序字段, backup_id) 索引键集分页，不再访问备份目录
+- 去重存储的备份(storage=chunked)在目录中没有对应文件，内容是 backup_chunks 中
+  按顺序排列的块引用(块文件见 backup_chunks.ChunkStore)，不参与目录对账；
+  删除备份时同一事务内删除不再被任何备份引用的块
+- 块的压缩状态记录在 chunks.codec：NULL 待压缩 / zstd 已压缩 / none 不可压缩，
+  stored_size 为块文件实际大小；由后台压缩任务(backup_compression)更新
+
+清单与备份文件放在同一目录，随备份目录一起挂载/迁移；清单丢失或损坏时删除后重启，
+由对账重建(原始文件名会退化为存储文件名，对账补录的记录没有 SHA-256)。
+清单结构版本记录在 PRAGMA user_version。
+
+清单使用标准库 sqlite3(阻塞 I/O)，对外的异步方法均在线程池中执行。
+"""
+
+import asyncio
+import base64
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from ..config import settings
+from ..constants import BACKUP_TEMP_MAX_AGE
+from .backup_chunks import CHUNK_DIR_NAME, ChunkRef, ChunkStore, IngestResult
+from .backup_store import candidate_names, is_temp_file, original_filename
+
+logger = logging.getLogger(__name__)
+
+# 备份存储目录
+BACKUP_DIR = Path(settings.backup_dir)
+
+MANIFEST_NAME = ".manifest.sqlite3"
+BACKUP_EXTENSIONS = (".db", ".zip")
+
+# 列表排序字段 -> 清单列
+SORT_COLUMNS = {
+    "uploaded_at": "uploaded_ns",
+    "file_size": "file_size",
+    "filename": "stored_name",
+}
+
+# 清单结构迁移：第 N 项把 user_version 从 N 升到 N+1
+_MIGRATIONS: tuple[tuple[str, ...], ...] = (
+    (
+        """
+        CREATE TABLE IF NOT EXISTS backups (
+            backup_id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            stored_name TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            uploaded_ns INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_backups_uploaded ON backups (uploaded_ns, backup_id)",
+        "CREATE INDEX IF NOT EXISTS idx_backups_size ON backups (file_size, backup_id)",
+        "CREATE INDEX IF NOT EXISTS idx_backups_name ON backups (stored_name, backup_id)",
+    ),
+    ("ALTER TABLE backups ADD COLUMN sha256 TEXT",),
+    (
+        "ALTER TABLE backups ADD COLUMN storage TEXT NOT NULL DEFAULT 'file'",
+        """
+        CREATE TABLE IF NOT EXISTS chunks (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            created_ns INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS backup_chunks (
+            backup_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (backup_id, seq)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_backup_chunks_hash ON backup_chunks (hash)",
+    ),
+    (
+        "ALTER TABLE chunks ADD COLUMN codec TEXT",
+        "ALTER TABLE chunks ADD COLUMN stored_size INTEGER",
+        # 只索引待压缩的块，压缩任务按哈希顺序分批读取
+        "CREATE INDEX IF NOT EXISTS idx_chunks_pending ON chunks (hash) WHERE codec IS NULL",
+    ),
+    # 保留策略按原始文件名分组、按上传时间排序
+    (
+        "CREATE INDEX IF NOT EXISTS idx_backups_filename "
+        "ON backups (filename, uploaded_ns, backup_id)",
+    ),
+)
+
+
+def is_backup_file(name: str) -> bool:
+    """是否为备份文件(.db / .zip)."""
+    return name.lower().endswith(BACKUP_EXTENSIONS)
+
+
+@dataclass(frozen=True)
+class BackupRecord:
+    """清单中的一条备份记录."""
+
+    backup_id: str  # 相对备份目录的 POSIX 路径
+    filename: str  # 上传时的原始文件名
+    stored_name: str  # 存储文件名
+    file_size: int
+    uploaded_ns: int  # 上传时间(纳秒时间戳)
+    mtime_ns: int  # 文件修改时间，对账时用于发现变化
+    sha256: str | None = None  # 上传时计算；对账补录或文件被改动时为空
+    storage: str = "file"  # file: 目录中的完整文件 / chunked: 去重块引用
+
+    @property
+    def uploaded_at(self) -> datetime:
+        """上传时间(本地时间)."""
+        return datetime.fromtimestamp(self.uploaded_ns / 1e9)
+
+    @property
+    def etag(self) -> str:
+        """强 ETag：内容的 SHA-256，未知时(对账补录)退化为大小与修改时间."""
+        if self.sha256:
+            return f'"{self.sha256}"'
+        return f'"{self.file_size:x}-{self.mtime_ns:x}"'
+
+    @classmethod
+    def from_file(
+        cls,
+        root: Path,
+        path: Path,
+        filename: str | None = None,
+        sha256: str | None = None,
+    ) -> "BackupRecord":
+        """根据备份文件生成记录，上传时间取文件修改时间.
+
+        未给出原始文件名时(对账补录)由存储文件名去掉追加的时间戳后缀还原，
+        使补录的记录与同名上传的备份归入同一组(见 services/backup_retention.py)。
+        """
+        stat = path.stat()
+        return cls(
+            backup_id=path.relative_to(root).as_posix(),
+            filename=filename or original_filename(path.name),
+            stored_name=path.name,
+            file_size=stat.st_size,
+            uploaded_ns=stat.st_mtime_ns,
+            mtime_ns=stat.st_mtime_ns,
+            sha256=sha256,
+        )
+
+
+@dataclass(frozen=True)
+class BackupCursor:
+    """键集分页游标: 排序字段及上一页最后一条记录的 (排序值, backup_id)."""
+
+    sort: str
+    value: Any
+    backup_id: str
+
+    def encode(self) -> str:
+        """编码为 URL 安全的不透明字符串."""
+        raw = json.dumps([self.sort, self.value, self.backup_id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "BackupCursor":
+        """解析游标字符串.
+
+        Raises:
+            ValueError: 游标格式不正确
+        """
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            sort, value, backup_id = json.loads(base64.urlsafe_b64decode(padded))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"无效的分页游标: {token}") from e
+        if sort not in SORT_COLUMNS or not isinstance(backup_id, str):
+            raise ValueError(f"无效的分页游标: {token}")
+        return cls(sort, value, backup_id)
+
+
+@dataclass
+class BackupPage:
+    """一页备份记录."""
+
+    items: list[BackupRecord]
+    total: int
+    next_cursor: BackupCursor | None = None
+
+
+class BackupManifest:
+    """备份目录下的 SQLite 清单."""
+
+    def __init__(self, root: Path, chunk_store: ChunkStore):
+        self.root = root
+        self.chunk_store = chunk_store
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self.root / MANIFEST_NAME
+
+    async def add_file(
+        self, path: Path, filename: str | None = None, sha256: str | None = None
+    ) -> BackupRecord:
+        """登记(或覆盖)一个已写入的备份文件."""
+        return await self._run(self._add_file, path, filename, sha256)
+
+    async def add_chunked(
+        self, directory: str, filename: str, stored_name: str, result: IngestResult
+    ) -> BackupRecord:
+        """登记一个已写入块存储的备份.
+
+        Args:
+            directory: 所在日期目录，如 "2025-07-15"
+            filename: 上传时的原始文件名
+            stored_name: 期望的存储文件名，与已有备份重名时追加时间戳
+            result: 块存储写入结果
+
+        Raises:
+            FileNotFoundError: 引用的块在登记前被并发删除(客户端重试即可)
+        """
+        return await self._run(
+            self._add_chunked, directory, filename, stored_name, result
+        )
+
+    async def recipe(
+        self, backup_id: str, start: int = 0, end: int | None = None
+    ) -> list[ChunkRef]:
+        """去重备份的有序块列表(含压缩状态与偏移).
+
+        Args:
+            backup_id: 备份标识
+            start: 只返回覆盖 [start, end) 的块
+            end: 范围结束位置(不含)，None 表示到末尾
+        """
+        return await self._run(self._recipe, backup_id, start, end)
+
+    async def pending_chunks(self, after: str, limit: int) -> list[str]:
+        """按哈希顺序列出 after 之后尚未压缩的块."""
+        return await self._run(self._pending_chunks, after, limit)
+
+    async def mark_compressed(self, results: dict[str, int | None]) -> list[str]:
+        """登记块的压缩结果(ChunkStore.compress 的返回值).
+
+        Returns:
+            已登记为 zstd 的块，调用方随后删除其原始文件
+        """
+        return await self._run(self._mark_compressed, results)
+
+    async def remove(self, backup_id: str) -> bool:
+        """删除记录(去重备份同时释放不再被引用的块)，返回记录是否存在."""
+        deleted, _ = await self._run(self._remove_many, [backup_id])
+        return deleted > 0
+
+    async def remove_many(self, backup_ids: list[str]) -> tuple[int, int]:
+        """在一个事务中删除多条记录，返回 (删除的记录数, 释放的块字节数)."""
+        return await self._run(self._remove_many, backup_ids)
+
+    async def records_by_filename(self) -> list[BackupRecord]:
+        """全部记录，按原始文件名分组、组内按上传时间倒序."""
+        return await self._run(self._records_by_filename)
+
+    async def discard_chunks(self, digests: set[str]) -> int:
+        """删除写入后未登记(如校验失败)且不被任何备份引用的块，返回释放的字节数."""
+        return await self._run(self._discard_chunks, digests)
+
+    async def stats(self) -> dict[str, Any]:
+        """备份数量、原始大小与实际占用空间."""
+        return await self._run(self._stats)
+
+    @contextlib.contextmanager
+    def try_lock(self, name: str) -> Iterator[bool]:
+        """跨进程互斥(不等待)：对备份目录下的 .<name>.lock 加 flock.
+
+        多个 worker 进程共用同一个备份目录时，保证同一时间只有一个进程执行
+        同类维护任务；进程退出时锁自动释放。返回是否取得锁。
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.root / f".{name}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+        finally:
+            os.close(fd)  # 关闭文件即释放锁
+
+    def contains(self, backup_id: str) -> bool:
+        """清单中是否已有该 backup_id(阻塞调用，供线程池中的写入流程使用)."""
+        return self._locked(self._get, backup_id) is not None
+
+    async def get(self, backup_id: str) -> BackupRecord | None:
+        """按 backup_id 读取记录."""
+        return await self._run(self._get, backup_id)
+
+    async def page(
+        self,
+        sort: str = "uploaded_at",
+        descending: bool = True,
+        after: BackupCursor | None = None,
+        limit: int = 100,
+    ) -> BackupPage:
+        """按排序字段键集分页列出备份.
+
+        Raises:
+            ValueError: 游标与排序字段不一致
+        """
+        if after is not None and after.sort != sort:
+            raise ValueError("分页游标与排序字段不一致")
+        return await self._run(self._page, sort, descending, after, limit)
+
+    async def reconcile(self) -> dict[str, int]:
+        """扫描备份目录并与清单对账，返回补录/删除/更新的记录数及清理的临时文件数."""
+        return await self._run(self._reconcile)
+
+    def close(self) -> None:
+        """关闭清单连接."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(self._locked, fn, *args)
+
+    def _locked(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            return fn(self._connect(), *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            # isolation_level=None: 事务由 _transaction 显式控制
+            conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA busy_timeout = {settings.sqlite_busy_timeout_ms}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            try:
+                self._migrate(conn)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _transaction(conn: sqlite3.Connection) -> Iterator[None]:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= len(_MIGRATIONS):
+            return
+        with self._transaction(conn):
+            # 多个进程可能同时启动，取得写锁后重新读取版本
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, statements in enumerate(
+                _MIGRATIONS[version:], start=version + 1
+            ):
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target}")
+        logger.info(f"备份清单结构已升级到版本 {len(_MIGRATIONS)}: {self.path}")
+
+    def _add_file(
+        self,
+        conn: sqlite3.Connection,
+        path: Path,
+        filename: str | None,
+        sha256: str | None,
+    ) -> BackupRecord:
+        record = BackupRecord.from_file(self.root, path, filename, sha256)
+        with self._transaction(conn):
+            self._insert(conn, [record])
+        return record
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, records: list[BackupRecord]) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO backups "
+            "(backup_id, filename, stored_name, file_size, uploaded_ns, mtime_ns, "
+            "sha256, storage) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    r.backup_id,
+                    r.filename,
+                    r.stored_name,
+                    r.file_size,
+                    r.uploaded_ns,
+                    r.mtime_ns,
+                    r.sha256,
+                    r.storage,
+                )
+                for r in records
+            ],
+        )
+
+    def _add_chunked(
+        self,
+        conn: sqlite3.Connection,
+        directory: str,
+        filename: str,
+        stored_name: str,
+        result: IngestResult,
+    ) -> BackupRecord:
+        now_ns = time.time_ns()
+        with self._transaction(conn):
+            for candidate in candidate_names(stored_name):
+                backup_id = f"{directory}/{candidate}"
+                taken = conn.execute(
+                    "SELECT 1 FROM backups WHERE backup_id = ?", (backup_id,)
+                ).fetchone()
+                if not taken and not (self.root / backup_id).exists():
+                    break
+            record = BackupRecord(
+                backup_id=backup_id,
+                filename=filename,
+                stored_name=candidate,
+                file_size=result.size,
+                uploaded_ns=now_ns,
+                mtime_ns=now_ns,
+                sha256=result.sha256,
+                storage="chunked",
+            )
+            self._insert(conn, [record])
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunks (hash, size, created_ns) VALUES (?, ?, ?)",
+                [(digest, size, now_ns) for digest, size in result.chunks],
+            )
+            rows = []
+            offset = 0
+            for seq, (digest, size) in enumerate(result.chunks):
+                rows.append((backup_id, seq, digest, offset, size))
+                offset += size
+            conn.executemany(
+                "INSERT INTO backup_chunks (backup_id, seq, hash, offset, size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            # 写入块与登记之间，块可能因其他备份被删除而被清理；
+            # 删除在同一把写锁内进行，这里检查通过即可保证引用有效
+            for digest in {digest for digest, _ in result.chunks}:
+                if not self.chunk_store.exists(digest):
+                    raise FileNotFoundError(f"备份块已被清理: {digest}")
+        return record
+
+    def _recipe(
+        self, conn: sqlite3.Connection, backup_id: str, start: int, end: int | None
+    ) -> list[ChunkRef]:
+        sql = (
+            'SELECT b.hash, b.size, b."offset", c.codec, c.stored_size '
+            "FROM backup_chunks b LEFT JOIN chunks c ON c.hash = b.hash "
+            'WHERE b.backup_id = ? AND b."offset" + b.size > ?'
+        )
+        params: list[Any] = [backup_id, start]
+        if end is not None:
+            sql += ' AND b."offset" < ?'
+            params.append(end)
+        return [
+            ChunkRef(
+                digest=row["hash"],
+                size=row["size"],
+                compressed=row["codec"] == "zstd",
+                stored_size=row["stored_size"],
+                offset=row["offset"],
+            )
+            for row in conn.execute(sql + " ORDER BY b.seq", params)
+        ]
+
+    @staticmethod
+    def _pending_chunks(conn: sqlite3.Connection, after: str, limit: int) -> list[str]:
+        return [
+            row["hash"]
+            for row in conn.execute(
+                "SELECT hash FROM chunks WHERE codec IS NULL AND hash > ? "
+                "ORDER BY hash LIMIT ?",
+                (after, limit),
+            )
+        ]
+
+    def _mark_compressed(
+        self, conn: sqlite3.Connection, results: dict[str, int | None]
+    ) -> list[str]:
+        compressed = []
+        with self._transaction(conn):
+            for digest, stored_size in results.items():
+                if stored_size is None:
+                    conn.execute(
+                        "UPDATE chunks SET codec = 'none', stored_size = size "
+                        "WHERE hash = ?",
+                        (digest,),
+                    )
+                    continue
+                cursor = conn.execute(
+                    "UPDATE chunks SET codec = 'zstd', stored_size = ? WHERE hash = ?",
+                    (stored_size, digest),
+                )
+                if cursor.rowcount:
+                    compressed.append(digest)
+                else:
+                    # 压缩期间块随备份删除被释放，删除刚写入的压缩文件；
+                    # 删除与登记都在写锁内，不会误删随后重新上传引用的块
+                    self.chunk_store.delete([digest])
+        return compressed
+
+    def _remove_many(
+        self, conn: sqlite3.Connection, backup_ids: list[str]
+    ) -> tuple[int, int]:
+        deleted = 0
+        digests: set[str] = set()
+        with self._transaction(conn):
+            for backup_id in backup_ids:
+                cursor = conn.execute(
+                    "DELETE FROM backups WHERE backup_id = ?", (backup_id,)
+                )
+                deleted += cursor.rowcount
+                digests.update(
+                    row["hash"]
+                    for row in conn.execute(
+                        "SELECT hash FROM backup_chunks WHERE backup_id = ?",
+                        (backup_id,),
+                    )
+                )
+                conn.execute(
+                    "DELETE FROM backup_chunks WHERE backup_id = ?", (backup_id,)
+                )
+            freed = self._release_chunks(conn, digests) if digests else 0
+        return deleted, freed
+
+    @staticmethod
+    def _records_by_filename(conn: sqlite3.Connection) -> list[BackupRecord]:
+        return [
+            _to_record(row)
+            for row in conn.execute(
+                "SELECT * FROM backups "
+                "ORDER BY filename, uploaded_ns DESC, backup_id DESC"
+            )
+        ]
+
+    def _discard_chunks(self, conn: sqlite3.Connection, digests: set[str]) -> int:
+        with self._transaction(conn):
+            return self._release_chunks(conn, digests)
+
+    def _release_chunks(self, conn: sqlite3.Connection, digests: set[str]) -> int:
+        """删除不再被任何备份引用的块(行与文件)，返回释放的字节数."""
+        orphans = [
+            digest
+            for digest in digests
+            if not conn.execute(
+                "SELECT 1 FROM backup_chunks WHERE hash = ? LIMIT 1", (digest,)
+            ).fetchone()
+        ]
+        conn.executemany("DELETE FROM chunks WHERE hash = ?", [(d,) for d in orphans])
+        return self.chunk_store.delete(orphans)
+
+    def _stats(self, conn: sqlite3.Connection) -> dict[str, Any]:
+        by_storage = {
+            row["storage"]: (row["backups"], row["bytes"])
+            for row in conn.execute(
+                "SELECT storage, count(*) AS backups, coalesce(sum(file_size), 0) AS bytes "
+                "FROM backups GROUP BY storage"
+            )
+        }
+        chunk_count, chunk_bytes, chunk_stored_bytes, compressed_chunks = conn.execute(
+            "SELECT count(*), coalesce(sum(size), 0), "
+            "coalesce(sum(coalesce(stored_size, size)), 0), "
+            "coalesce(sum(codec = 'zstd'), 0) FROM chunks"
+        ).fetchone()
+        file_backups, file_bytes = by_storage.get("file", (0, 0))
+        chunked_backups, chunked_bytes = by_storage.get("chunked", (0, 0))
+        return {
+            "backups": file_backups + chunked_backups,
+            "chunked_backups": chunked_backups,
+            "logical_bytes": file_bytes + chunked_bytes,
+            "stored_bytes": file_bytes + chunk_stored_bytes,
+            "chunks": chunk_count,
+            "chunk_bytes": chunk_bytes,
+            "dedup_ratio": round(chunked_bytes / chunk_bytes, 3)
+            if chunk_bytes
+            else None,
+            "compressed_chunks": compressed_chunks,
+            "chunk_stored_bytes": chunk_stored_bytes,
+            "compression_ratio": round(chunk_bytes / chunk_stored_bytes, 3)
+            if chunk_stored_bytes
+            else None,
+        }
+
+    def _get(self, conn: sqlite3.Connection, backup_id: str) -> BackupRecord | None:
+        row = conn.execute(
+            "SELECT * FROM backups WHERE backup_id = ?", (backup_id,)
+        ).fetchone()
+        return _to_record(row) if row else None
+
+    def _page(
+        self,
+        conn: sqlite3.Connection,
+        sort: str,
+        descending: bool,
+        after: BackupCursor | None,
+        limit: int,
+    ) -> BackupPage:
+        column = SORT_COLUMNS[sort]
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT * FROM backups"
+        params: list[Any] = []
+        if after is not None:
+            sql += f" WHERE ({column}, backup_id) {'<' if descending else '>'} (?, ?)"
+            params += [after.value, after.backup_id]
+        sql += f" ORDER BY {column} {direction}, backup_id {direction} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = conn.execute(sql, params).fetchall()
+        total = conn.execute("SELECT count(*) FROM backups").fetchone()[0]
+        items = [_to_record(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = BackupCursor(sort, last[column], last["backup_id"])
+        return BackupPage(items=items, total=total, next_cursor=next_cursor)
+
+    def _scan(self) -> tuple[list[os.DirEntry], list[os.DirEntry]]:
+        """遍历备份目录，返回 (备份文件, 过期的上传临时文件).
+
+        跳过以 . 开头的目录和其他以 . 开头的文件(清单等)。
+        """
+        files: list[os.DirEntry] = []
+        stale: list[os.DirEntry] = []
+        expire_before = time.time() - BACKUP_TEMP_MAX_AGE
+        stack = [self.root]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if is_temp_file(entry.name):
+                        if entry.stat().st_mtime < expire_before:
+                            stale.append(entry)
+                    elif entry.name.startswith("."):
+                        continue
+                    elif entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file() and is_backup_file(entry.name):
+                        files.append(entry)
+                except OSError:
+                    continue
+        return files, stale
+
+    def _reconcile(self, conn: sqlite3.Connection) -> dict[str, int]:
+        files, stale = self._scan()
+        for entry in stale:
+            with contextlib.suppress(OSError):
+                Path(entry.path).unlink()
+        stale_chunks = self.chunk_store.cleanup_temp(BACKUP_TEMP_MAX_AGE)
+
+        found: dict[str, tuple[int, int, str]] = {}
+        for entry in files:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            backup_id = Path(entry.path).relative_to(self.root).as_posix()
+            found[backup_id] = (stat.st_size, stat.st_mtime_ns, entry.name)
+
+        known = {
+            row["backup_id"]: (row["file_size"], row["mtime_ns"])
+            for row in conn.execute(
+                "SELECT backup_id, file_size, mtime_ns FROM backups "
+                "WHERE storage = 'file'"
+            )
+        }
+        # 与去重备份同名的文件不登记，避免覆盖去重备份的记录
+        chunked = {
+            row["backup_id"]
+            for row in conn.execute(
+                "SELECT backup_id FROM backups WHERE storage = 'chunked'"
+            )
+        }
+        for backup_id in chunked.intersection(found):
+            del found[backup_id]
+        added = [
+            BackupRecord(
+                backup_id, original_filename(name), name, size, mtime_ns, mtime_ns
+            )
+            for backup_id, (size, mtime_ns, name) in found.items()
+            if backup_id not in known
+        ]
+        removed = [(backup_id,) for backup_id in known if backup_id not in found]
+        changed = [
+            (size, mtime_ns, backup_id)
+            for backup_id, (size, mtime_ns, _) in found.items()
+            if backup_id in known and known[backup_id] != (size, mtime_ns)
+        ]
+
+        if added or removed or changed:
+            with self._transaction(conn):
+                self._insert(conn, added)
+                conn.executemany("DELETE FROM backups WHERE backup_id = ?", removed)
+                conn.executemany(
+                    # 内容被改动，上传时的 SHA-256 不再可信
+                    "UPDATE backups SET file_size = ?, mtime_ns = ?, sha256 = NULL "
+                    "WHERE backup_id = ?",
+                    changed,
+                )
+        result = {
+            "total": len(found),
+            "added": len(added),
+            "removed": len(removed),
+            "updated": len(changed),
+            "stale_temp_files": len(stale) + stale_chunks,
+        }
+        logger.info(f"备份清单对账完成: {result}")
+        return result
+
+
+def _to_record(row: sqlite3.Row) -> BackupRecord:
+    return BackupRecord(
+        backup_id=row["backup_id"],
+        filename=row["filename"],
+        stored_name=row["stored_name"],
+        file_size=row["file_size"],
+        uploaded_ns=row["uploaded_ns"],
+        mtime_ns=row["mtime_ns"],
+        sha256=row["sha256"],
+        storage=row["storage"],
+    )
+
+
+chunk_store = ChunkStore(BACKUP_DIR / CHUNK_DIR_NAME)
+backup_manifest = BackupManifest(BACKUP_DIR, chunk_store)
@@ -0,0 +1,289 @@
+"""
+备份保留策略(祖父-父-子).
+
+上传的备份默认永久保留。这里按原始文件名分组(不同设备上传时使用不同文件名即可
+分别计算；对账补录的记录由存储文件名去掉时间戳后缀还原原始文件名)，每组只保留：
+- 最近 settings.backup_retention_daily 个有备份的日子，每天最新的一份
+- 最近 settings.backup_retention_weekly 个有备份的 ISO 周，每周最新的一份
+- 最近 settings.backup_retention_monthly 个有备份的月份，每月最新的一份
+
+同一份备份可以同时满足多条规则，不满足任何规则的删除。日/周/月按服务端本地时间
+划分。候选备份完全来自备份清单(不遍历备份目录)，每 backup_retention_batch_size 个
+备份一个清单事务：完整文件先删除文件再删除记录，去重备份在同一事务内释放不再被
+引用的块。dry_run 只计算结果，不删除。多个进程(uvicorn worker)共用备份目录时，
+通过清单目录下的文件锁保证同一时间只有一个进程执行删除，其余进程本次跳过。
+"""
+
+import asyncio
+import contextlib
+import itertools
+import logging
+import time
+from collections.abc import Callable, Hashable
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any
+
+from ..config import settings
+from .backup_manifest import BackupManifest, BackupRecord, backup_manifest
+
+logger = logging.getLogger(__name__)
+
+RETENTION_LOCK_NAME = "retention"
+
+# 规则名 -> 上传时间所在的周期
+_PERIODS: dict[str, Callable[[datetime], Hashable]] = {
+    "daily": lambda at: at.date(),
+    "weekly": lambda at: at.isocalendar()[:2],
+    "monthly": lambda at: (at.year, at.month),
+}
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """每组保留的日/周/月份数."""
+
+    daily: int
+    weekly: int
+    monthly: int
+
+    @classmethod
+    def from_settings(cls) -> "RetentionPolicy":
+        return cls(
+            daily=settings.backup_retention_daily,
+            weekly=settings.backup_retention_weekly,
+            monthly=settings.backup_retention_monthly,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """三项均为 0 时视为未配置，不删除任何备份."""
+        return self.daily > 0 or self.weekly > 0 or self.monthly > 0
+
+
+def plan_group(
+    records: list[BackupRecord], policy: RetentionPolicy
+) -> dict[str, list[str]]:
+    """计算一组备份的保留原因.
+
+    Args:
+        records: 同一文件名的备份，按上传时间倒序
+        policy: 保留策略
+
+    Returns:
+        {backup_id: 满足的规则列表}，列表为空的备份应删除
+    """
+    reasons: dict[str, list[str]] = {record.backup_id: [] for record in records}
+    for rule, count in asdict(policy).items():
+        period_of = _PERIODS[rule]
+        seen: set[Hashable] = set()
+        for record in records:
+            period = period_of(record.uploaded_at)
+            if period in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(period)
+            reasons[record.backup_id].append(rule)
+    return reasons
+
+
+@dataclass
+class BackupRetentionReport:
+    """一次保留策略执行的结果."""
+
+    started_at: str
+    dry_run: bool
+    policy: dict[str, int]
+    duration_ms: float = 0.0
+    groups: int = 0
+    kept: int = 0
+    deleted: int = 0
+    deleted_batches: int = 0
+    deleted_bytes: int = 0  # 删除的备份原始大小之和
+    freed_bytes: int = 0  # 实际释放的空间(完整文件 + 不再被引用的块)
+    failed: int = 0
+    skipped: bool = False  # 其他进程正在执行，本次跳过
+    # dry_run 时为全部备份的保留/删除决定，否则为实际删除的备份
+    items: list[dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        """转换为可序列化的字典."""
+        return asdict(self)
+
+
+class BackupRetentionService:
+    """备份保留策略服务类."""
+
+    def __init__(self, manifest: BackupManifest):
+        """初始化保留策略服务.
+
+        Args:
+            manifest: 备份清单
+        """
+        self.manifest = manifest
+        self._lock = asyncio.Lock()
+
+    async def run_once(
+        self, dry_run: bool = False, policy: RetentionPolicy | None = None
+    ) -> BackupRetentionReport:
+        """执行一次保留策略.
+
+        同一进程内排队执行；删除时另外取得跨进程文件锁，其他进程正在执行时
+        本次跳过(report.skipped)。
+
+        Args:
+            dry_run: 只计算要删除的备份，不删除
+            policy: 保留策略，默认取配置
+
+        Returns:
+            执行结果
+        """
+        policy = policy or RetentionPolicy.from_settings()
+        async with self._lock:
+            report = BackupRetentionReport(
+                started_at=datetime.now().isoformat(),
+                dry_run=dry_run,
+                policy=asdict(policy),
+            )
+            if not policy.enabled:
+                return report
+            if dry_run:
+                await self._apply(report, policy)
+                return report
+            with self.manifest.try_lock(RETENTION_LOCK_NAME) as acquired:
+                if not acquired:
+                    report.skipped = True
+                    return report
+                await self._apply(report, policy)
+            return report
+
+    async def _apply(
+        self, report: BackupRetentionReport, policy: RetentionPolicy
+    ) -> None:
+        """计算保留计划，非 dry_run 时分批删除过期备份."""
+        dry_run = report.dry_run
+        started = time.perf_counter()
+        expired: list[BackupRecord] = []
+        records = await self.manifest.records_by_filename()
+        for _, grouped in itertools.groupby(records, key=lambda r: r.filename):
+            group = list(grouped)
+            reasons = plan_group(group, policy)
+            report.groups += 1
+            for record in group:
+                keep = reasons[record.backup_id]
+                if keep:
+                    report.kept += 1
+                else:
+                    expired.append(record)
+                if dry_run:
+                    report.items.append(_item(record, keep))
+
+        if dry_run:
+            report.deleted = len(expired)
+            report.deleted_bytes = sum(r.file_size for r in expired)
+        else:
+            batch_size = max(1, settings.backup_retention_batch_size)
+            for offset in range(0, len(expired), batch_size):
+                await self._delete_batch(expired[offset : offset + batch_size], report)
+
+        report.duration_ms = (time.perf_counter() - started) * 1000
+        if not dry_run and (report.deleted or report.failed):
+            logger.info(
+                f"备份保留策略执行完成: {report.groups} 组, 保留 {report.kept}, "
+                f"删除 {report.deleted} ({report.deleted_batches} 批), "
+                f"释放 {report.freed_bytes} 字节, 失败 {report.failed}"
+            )
+
+    async def _delete_batch(
+        self, records: list[BackupRecord], report: BackupRetentionReport
+    ) -> None:
+        """删除一批备份：完整文件先删除文件，再在一个事务中删除记录."""
+        files = [r for r in records if r.storage != "chunked"]
+        unlinked, freed = await asyncio.to_thread(self._unlink_files, files)
+        removable = [
+            r for r in records if r.storage == "chunked" or r.backup_id in unlinked
+        ]
+        _, freed_chunks = await self.manifest.remove_many(
+            [r.backup_id for r in removable]
+        )
+
+        report.deleted += len(removable)
+        report.deleted_batches += 1
+        report.deleted_bytes += sum(r.file_size for r in removable)
+        report.freed_bytes += freed + freed_chunks
+        report.failed += len(records) - len(removable)
+        report.items.extend(_item(r, []) for r in removable)
+
+    def _unlink_files(self, records: list[BackupRecord]) -> tuple[set[str], int]:
+        """删除完整备份文件及随之变空的日期目录，返回 (已删除的 backup_id, 释放字节数)."""
+        unlinked: set[str] = set()
+        freed = 0
+        for record in records:
+            path = self.manifest.root / record.backup_id
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                freed += size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除过期备份失败: {path}: {e}")
+                continue
+            unlinked.add(record.backup_id)
+            if path.parent != self.manifest.root:
+                with contextlib.suppress(OSError):
+                    path.parent.rmdir()  # 目录非空时失败，忽略
+        return unlinked, freed
+
+
+def _item(record: BackupRecord, reasons: list[str]) -> dict[str, Any]:
+    return {
+        "backup_id": record.backup_id,
+        "filename": record.filename,
+        "uploaded_at": record.uploaded_at.isoformat(),
+        "file_size": record.file_size,
+        "keep": bool(reasons),
+        "reasons": reasons,
+    }
+
+
+class BackupRetentionScheduler:
+    """按 settings.backup_retention_interval 周期执行保留策略的后台任务."""
+
+    def __init__(self, service: BackupRetentionService):
+        """初始化调度器.
+
+        Args:
+            service: 保留策略服务
+        """
+        self.service = service
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """在当前事件循环中启动(未开启 backup_retention_enabled 时不启动)."""
+        if not settings.backup_retention_enabled:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台清理."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.service.run_once()
+            except Exception as e:  # 后台循环不能因单次异常退出
+                logger.error(f"备份保留策略执行异常: {e}")
+            await asyncio.sleep(settings.backup_retention_interval)
+
+
+# 全局服务实例
+backup_retention_service = BackupRetentionService(backup_manifest)
+backup_retention_scheduler = BackupRetentionScheduler(backup_retention_service)
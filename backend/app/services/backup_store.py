@@ -0,0 +1,167 @@
+"""
+数据库备份文件写入.
+
+上传的备份先按块写入同目录下以 . 开头的临时文件，写入的同时计算大小与 SHA-256，
+fsync 后原子重命名为最终文件名(断点续传的数据文件已在备份目录内落盘，直接重命名)。写入过程中断只会留下临时文件：列表、下载与
+清单对账都会跳过以 . 开头的文件，对账时顺带删除超过 BACKUP_TEMP_MAX_AGE 的残留。
+
+除 stream_file 外，这里的函数均为阻塞 I/O，由调用方通过 asyncio.to_thread 在线程池中执行。
+"""
+
+import asyncio
+import hashlib
+import itertools
+import os
+import re
+import uuid
+from collections.abc import AsyncIterator, Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO
+
+from ..constants import BACKUP_STREAM_BYTES, BACKUP_UPLOAD_CHUNK_BYTES
+
+TEMP_PREFIX = ".upload-"
+TEMP_SUFFIX = ".part"
+# candidate_names 在同名文件已存在时生成的存储文件名: <stem>_HHMMSS[_序号]<suffix>
+_STAMPED_NAME = re.compile(r"(?P<stem>.+)_\d{6}(?:_\d+)?(?P<suffix>\.[^.]+)")
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    """写入完成的备份文件."""
+
+    path: Path
+    size: int
+    sha256: str
+
+
+def is_temp_file(name: str) -> bool:
+    """是否为上传临时文件."""
+    return name.startswith(TEMP_PREFIX) and name.endswith(TEMP_SUFFIX)
+
+
+def candidate_names(filename: str) -> Iterator[str]:
+    """依次给出候选存储文件名：原名、追加时间戳、再追加序号."""
+    yield filename
+    name = Path(filename)
+    stem = f"{name.stem}_{datetime.now().strftime('%H%M%S')}"
+    yield f"{stem}{name.suffix}"
+    for index in itertools.count(1):
+        yield f"{stem}_{index}{name.suffix}"
+
+
+def original_filename(stored_name: str) -> str:
+    """candidate_names 的逆过程：去掉存储文件名中追加的 _HHMMSS(_序号) 后缀."""
+    match = _STAMPED_NAME.fullmatch(stored_name)
+    return f"{match['stem']}{match['suffix']}" if match else stored_name
+
+
+def available_path(
+    directory: Path, filename: str, taken: Callable[[Path], bool] | None = None
+) -> Path:
+    """目录下可用的存储路径：同名文件已存在时追加时间戳，不覆盖历史备份.
+
+    Args:
+        directory: 目标目录
+        filename: 期望的文件名
+        taken: 额外判断路径是否已被占用(如去重备份没有对应文件)
+    """
+    paths = (directory / candidate for candidate in candidate_names(filename))
+    return next(
+        path
+        for path in paths
+        if not path.exists() and not (taken is not None and taken(path))
+    )
+
+
+def store_upload(
+    source: BinaryIO,
+    directory: Path,
+    filename: str,
+    taken: Callable[[Path], bool] | None = None,
+) -> StoredFile:
+    """把上传内容写入目录，返回最终路径、大小与 SHA-256.
+
+    Args:
+        source: 上传内容(可读的二进制文件对象)
+        directory: 目标目录(需已存在)
+        filename: 期望的存储文件名，同名时追加时间戳
+        taken: 同 available_path
+
+    Raises:
+        OSError: 写入或重命名失败(临时文件已清理)
+    """
+    temp = directory / f"{TEMP_PREFIX}{uuid.uuid4().hex}{TEMP_SUFFIX}"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with temp.open("wb") as out:
+            while chunk := source.read(BACKUP_UPLOAD_CHUNK_BYTES):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        # 写完再确定文件名，缩短与同名上传的竞争窗口
+        path = available_path(directory, filename, taken)
+        temp.replace(path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return StoredFile(path=path, size=size, sha256=digest.hexdigest())
+
+
+def file_sha256(path: Path) -> str:
+    """计算文件内容的 SHA-256."""
+    with path.open("rb") as source:
+        return hashlib.file_digest(source, "sha256").hexdigest()
+
+
+def move_into(
+    source: Path,
+    directory: Path,
+    filename: str,
+    taken: Callable[[Path], bool] | None = None,
+) -> Path:
+    """把已落盘的文件(同一文件系统)重命名为目录下的备份文件，返回最终路径.
+
+    Args:
+        source: 已 fsync 的文件
+        directory: 目标目录(需已存在)
+        filename: 期望的存储文件名，同名时追加时间戳
+        taken: 同 available_path
+    """
+    path = available_path(directory, filename, taken)
+    source.replace(path)
+    return path
+
+
+async def stream_file(
+    path: Path, start: int = 0, length: int | None = None
+) -> AsyncIterator[bytes]:
+    """输出备份文件的一段内容，每次在线程池中读取 BACKUP_STREAM_BYTES.
+
+    Args:
+        path: 备份文件
+        start: 起始位置
+        length: 输出的字节数，None 表示到文件末尾
+    """
+    source = await asyncio.to_thread(path.open, "rb")
+    try:
+        await asyncio.to_thread(source.seek, start)
+        while length is None or length > 0:
+            size = (
+                BACKUP_STREAM_BYTES
+                if length is None
+                else min(length, BACKUP_STREAM_BYTES)
+            )
+            data = await asyncio.to_thread(source.read, size)
+            if not data:
+                return
+            if length is not None:
+                length -= len(data)
+            yield data
+    finally:
+        await asyncio.to_thread(source.close)
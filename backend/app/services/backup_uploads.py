@@ -0,0 +1,212 @@
+"""
+备份断点续传上传会话.
+
+协议与模型分块上传(api/routes/models.py)一致：init / chunk / status / complete / cancel。
+不同之处：
+- 会话目录 backups/.uploads/<upload_id>/ 以 . 开头，不出现在备份列表与对账中
+- 初始化时按总大小创建数据文件 data，各分块按 index * chunk_size 直接写入对应位置，
+  互不重叠，客户端可以并行上传；分块落盘并 fsync 后创建标记文件 <index>.ok，
+  状态查询按标记文件返回已接收的分块
+- 每个分块附带 SHA-256，校验通过才写入；完成时数据文件即完整备份：
+  去重存储直接从中切块写入，完整文件存储直接重命名，不再拼接复制一遍
+- 完成时先把会话目录重命名为 .<upload_id>.complete 占用会话，防止重复完成
+
+这里的方法均为阻塞 I/O，由调用方通过 asyncio.to_thread 在线程池中执行。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from ..constants import BACKUP_RESUMABLE_MAX_CHUNK_SIZE, BACKUP_RESUMABLE_MAX_CHUNKS
+from .backup_manifest import BACKUP_DIR
+
+UPLOAD_DIR_NAME = ".uploads"
+META_NAME = "meta.json"
+DATA_NAME = "data"
+RECEIVED_SUFFIX = ".ok"
+CLAIMED_SUFFIX = ".complete"
+
+
+@dataclass(frozen=True)
+class UploadSession:
+    """一个断点续传上传会话."""
+
+    upload_id: str
+    filename: str
+    total_size: int
+    chunk_size: int
+    sha256: str | None  # 客户端声明的整个文件的 SHA-256，完成时校验
+    created_at: str
+
+    @property
+    def total_chunks(self) -> int:
+        return -(-self.total_size // self.chunk_size)
+
+    def chunk_length(self, index: int) -> int:
+        """第 index 个分块的长度(最后一块可能不足 chunk_size)."""
+        return min(self.chunk_size, self.total_size - index * self.chunk_size)
+
+
+class UploadSessionStore:
+    """备份目录下的上传会话: <root>/<upload_id>/{meta.json, data, <index>.ok}."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def create(
+        self, filename: str, total_size: int, chunk_size: int, sha256: str | None
+    ) -> UploadSession:
+        """创建会话并按总大小预先创建数据文件.
+
+        Raises:
+            ValueError: 大小或分块参数不合法
+        """
+        if total_size < 0:
+            raise ValueError("total_size 不能为负")
+        if not 0 < chunk_size <= BACKUP_RESUMABLE_MAX_CHUNK_SIZE:
+            raise ValueError(
+                f"chunk_size 必须在 1 到 {BACKUP_RESUMABLE_MAX_CHUNK_SIZE} 之间"
+            )
+        session = UploadSession(
+            upload_id=str(uuid.uuid4()),
+            filename=filename,
+            total_size=total_size,
+            chunk_size=chunk_size,
+            sha256=sha256.lower() if sha256 else None,
+            created_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        )
+        if session.total_chunks > BACKUP_RESUMABLE_MAX_CHUNKS:
+            raise ValueError("分块数量超过上限，请增大 chunk_size")
+
+        directory = self.root / session.upload_id
+        directory.mkdir(parents=True)
+        try:
+            with (directory / DATA_NAME).open("wb") as data:
+                data.truncate(total_size)
+            (directory / META_NAME).write_text(
+                json.dumps(asdict(session), ensure_ascii=False), encoding="utf-8"
+            )
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return session
+
+    def get(self, upload_id: str) -> UploadSession:
+        """读取会话.
+
+        Raises:
+            FileNotFoundError: 会话不存在、已完成或已过期
+        """
+        return self._load(self._directory(upload_id))
+
+    def write_chunk(
+        self, session: UploadSession, index: int, data: bytes, sha256: str
+    ) -> None:
+        """校验分块后写入数据文件对应位置，fsync 后标记为已接收.
+
+        重复上传同一分块会覆盖原内容。
+
+        Raises:
+            ValueError: 序号越界、长度或 SHA-256 不一致
+            FileNotFoundError: 会话已完成、取消或过期
+        """
+        if not 0 <= index < session.total_chunks:
+            raise ValueError(f"分块序号超出范围: {index}")
+        if len(data) != session.chunk_length(index):
+            raise ValueError(
+                f"分块 {index} 长度应为 {session.chunk_length(index)}，实际 {len(data)}"
+            )
+        if hashlib.sha256(data).hexdigest() != sha256.lower():
+            raise ValueError(f"分块 {index} SHA-256 校验失败")
+        directory = self._directory(session.upload_id)
+        fd = os.open(directory / DATA_NAME, os.O_WRONLY)
+        try:
+            os.pwrite(fd, data, index * session.chunk_size)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        (directory / f"{index}{RECEIVED_SUFFIX}").touch()
+
+    def received(self, session: UploadSession) -> list[int]:
+        """已接收的分块序号(升序)."""
+        indices = []
+        for entry in os.scandir(self._directory(session.upload_id)):
+            index = entry.name.removesuffix(RECEIVED_SUFFIX)
+            if (
+                entry.name.endswith(RECEIVED_SUFFIX)
+                and index.isdigit()
+                and int(index) < session.total_chunks
+            ):
+                indices.append(int(index))
+        return sorted(indices)
+
+    def claim(self, upload_id: str) -> tuple[UploadSession, Path]:
+        """占用会话准备完成，返回 (会话, 数据文件路径).
+
+        占用后会话不再接受分块，完成失败时通过 release 归还。
+
+        Raises:
+            FileNotFoundError: 会话不存在或已被占用
+        """
+        directory = self._directory(upload_id)
+        claimed = self.root / f".{upload_id}{CLAIMED_SUFFIX}"
+        directory.rename(claimed)
+        # 重命名不会更新目录自身的修改时间：刷新一下，避免完成过程中被 cleanup
+        # 当作过期会话删除(完成中断残留的占用目录仍会在 max_age 后清理)
+        os.utime(claimed)
+        return self._load(claimed), claimed / DATA_NAME
+
+    def release(self, upload_id: str) -> None:
+        """归还已占用的会话，客户端可重试完成."""
+        (self.root / f".{upload_id}{CLAIMED_SUFFIX}").rename(self._directory(upload_id))
+
+    def discard(self, upload_id: str) -> None:
+        """删除会话(无论是否已被占用)."""
+        shutil.rmtree(self._directory(upload_id), ignore_errors=True)
+        shutil.rmtree(self.root / f".{upload_id}{CLAIMED_SUFFIX}", ignore_errors=True)
+
+    def cleanup(self, max_age: float) -> int:
+        """删除超过 max_age 秒没有新分块的会话，返回删除数量.
+
+        已占用(正在完成)的会话从占用时起计算。
+        """
+        if not self.root.is_dir():
+            return 0
+        expire_before = time.time() - max_age
+        removed = 0
+        for entry in os.scandir(self.root):
+            try:
+                # 每接收一个分块都会在目录中创建标记文件，目录修改时间即最后活动时间
+                if entry.is_dir() and entry.stat().st_mtime < expire_before:
+                    shutil.rmtree(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def _directory(self, upload_id: str) -> Path:
+        # upload_id 来自 URL，只接受 create 生成的规范 UUID，防止路径穿越
+        try:
+            valid = str(uuid.UUID(upload_id)) == upload_id
+        except ValueError:
+            valid = False
+        if not valid:
+            raise FileNotFoundError(f"上传会话不存在: {upload_id}")
+        return self.root / upload_id
+
+    @staticmethod
+    def _load(directory: Path) -> UploadSession:
+        try:
+            meta = json.loads((directory / META_NAME).read_text(encoding="utf-8"))
+        except ValueError as e:
+            raise FileNotFoundError(f"上传会话元信息损坏: {directory}") from e
+        return UploadSession(**meta)
+
+
+upload_sessions = UploadSessionStore(BACKUP_DIR / UPLOAD_DIR_NAME)
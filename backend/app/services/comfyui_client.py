@@ -18,6 +18,7 @@
 from requests.exceptions import RequestException
 
 from ..workflow_config.workflow_config import workflow_config_manager
+from .comfyui_transport import get_comfyui_transport
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +59,7 @@ def __init__(self, base_url: str, workflow_path: str):
             workflow_path: 工作流JSON文件路径
         """
         self.base_url = base_url.rstrip("/")
+        self.transport = get_comfyui_transport(self.base_url)
         self.workflow_path = workflow_path
         self.workflow_json = None
         self._load_workflow()
@@ -85,7 +87,10 @@ def _load_workflow(self) -> None:
             raise
 
     async def generate_image(
-        self, prompt: str, negative_prompt: str | None = None
+        self,
+        prompt: str,
+        negative_prompt: str | None = None,
+        prompt_id: str | None = None,
     ) -> str | None:
         """生成图片.
 
@@ -93,6 +98,8 @@ async def generate_image(
             prompt: 图片生成提示词
             negative_prompt: 负向提示词(可选);仅当工作流 JSON 含
                 「负向提示词在这里替换」占位符时生效,找不到则静默忽略
+            prompt_id: 预生成的 prompt_id(可选，队列模式使用);
+                不指定时由 ComfyUI 生成
 
         Returns:
             任务ID，如果生成失败则返回None
@@ -105,11 +112,12 @@ async def generate_image(
             # 准备工作流数据（返回JSON字符串）
             workflow_json_str = self._prepare_workflow(prompt, negative_prompt)
 
-            # 调用ComfyUI API
-            response = requests.post(
-                f"{self.base_url}/prompt",
-                json={"prompt": json.loads(workflow_json_str)},
-                timeout=None,  # 移除超时限制
+            # 调用ComfyUI API（经传输层在线程中执行，不阻塞事件循环，便于批量并发提交）
+            response = await self.transport.arequest(
+                "POST",
+                "/prompt",
+                "prompt",
+                json=self._prompt_body(workflow_json_str, prompt_id),
             )
 
             if response.status_code == 200:
@@ -187,7 +195,9 @@ async def check_task_status(self, task_id: str) -> dict[str, Any]:
             任务状态信息
         """
         try:
-            response = requests.get(f"{self.base_url}/history/{task_id}", timeout=10)
+            response = await self.transport.arequest(
+                "GET", f"/history/{task_id}", "history"
+            )
 
             if response.status_code == 200:
                 history = response.json()
@@ -300,9 +310,8 @@ async def get_media_data(self, filename: str) -> bytes | None:
             媒体文件二进制数据，失败则返回None
         """
         try:
-            response = requests.get(
-                self.get_media_url(filename),
-                timeout=None,  # 移除超时限制
+            response = await self.transport.arequest(
+                "GET", "/view", "view", params={"filename": filename}
             )
 
             if response.status_code == 200:
@@ -327,7 +336,11 @@ async def get_image_data(self, filename: str) -> bytes | None:
         return await self.get_media_data(filename)
 
     async def generate_video(
-        self, prompt: str, image_data: bytes, image_filename: str = "input_image.png"
+        self,
+        prompt: str,
+        image_data: bytes,
+        image_filename: str = "input_image.png",
+        prompt_id: str | None = None,
     ) -> str | None:
         """生成视频（图生视频）.
 
@@ -335,6 +348,7 @@ async def generate_video(
             prompt: 视频生成提示词
             image_data: 输入图片的二进制数据
             image_filename: 图片文件名（用于ComfyUI内部处理）
+            prompt_id: 预生成的 prompt_id（可选，队列模式使用）
 
         Returns:
             任务ID，如果生成失败则返回None
@@ -346,8 +360,8 @@ async def generate_video(
         try:
             # 第一步：上传图片到ComfyUI
             files = {"image": (image_filename, image_data, "image/png")}
-            upload_response = requests.post(
-                f"{self.base_url}/upload/image", files=files, timeout=None
+            upload_response = await self.transport.arequest(
+                "POST", "/upload/image", "upload", files=files
             )
 
             if upload_response.status_code != 200:
@@ -371,10 +385,11 @@ async def generate_video(
             )
 
             # 调用ComfyUI API
-            response = requests.post(
-                f"{self.base_url}/prompt",
-                json={"prompt": json.loads(workflow_json_str)},
-                timeout=None,  # 移除超时限制
+            response = await self.transport.arequest(
+                "POST",
+                "/prompt",
+                "prompt",
+                json=self._prompt_body(workflow_json_str, prompt_id),
             )
 
             if response.status_code == 200:
@@ -396,6 +411,14 @@ async def generate_video(
             logger.error(f"ComfyUI视频生成失败: {e}")
             return None
 
+    @staticmethod
+    def _prompt_body(workflow_json_str: str, prompt_id: str | None) -> dict[str, Any]:
+        """组装 /prompt 请求体；指定 prompt_id 时一并提交."""
+        body: dict[str, Any] = {"prompt": json.loads(workflow_json_str)}
+        if prompt_id:
+            body["prompt_id"] = prompt_id
+        return body
+
     def _prepare_workflow(
         self,
         prompt: str,
@@ -549,12 +572,11 @@ async def health_check(self) -> bool:
         Returns:
             服务是否可用
         """
-        try:
-            response = requests.get(f"{self.base_url}/system_stats", timeout=5)
-            return response.status_code == 200
-        except (OSError, requests.RequestException, ValueError, json.JSONDecodeError) as e:
-            logger.error(f"ComfyUI健康检查失败: {e}")
-            return False
+        # 读取后台探测的缓存快照，不再每次调用都请求 ComfyUI
+        from .comfyui_health import get_health_prober
+
+        snapshot = await get_health_prober(self.base_url).get_snapshot()
+        return snapshot.healthy
 
 
 def create_comfyui_client(
@@ -0,0 +1,189 @@
+"""
+ComfyUI 后台健康探测.
+
+每个 ComfyUI 节点一个后台探测协程，按固定间隔请求 /system_stats 与 /queue，
+记录延迟、显存与队列长度。健康检查接口与各服务的 health_check 只读取
+缓存的快照，不再每次调用都向 ComfyUI 发请求。
+
+探测请求同样经过 ComfyUITransport：熔断期间探测快速失败；冷却期满后，
+探测请求即作为熔断器的半开试探请求，服务恢复后自动闭合。
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+import requests
+
+from ..config import settings
+from ..exceptions import ComfyUIUnavailableError
+from .comfyui_transport import get_comfyui_transport
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ComfyUIHealthSnapshot:
+    """单次探测结果快照."""
+
+    healthy: bool
+    checked_at: datetime
+    latency_ms: float | None = None
+    vram_total: int | None = None
+    vram_free: int | None = None
+    queue_running: int | None = None
+    queue_pending: int | None = None
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """转换为可序列化的字典."""
+        data = asdict(self)
+        data["checked_at"] = self.checked_at.isoformat()
+        return data
+
+
+class ComfyUIHealthProber:
+    """单个 ComfyUI 节点的后台健康探测器."""
+
+    def __init__(self, base_url: str, interval: float | None = None):
+        """初始化探测器.
+
+        Args:
+            base_url: ComfyUI 服务器基础URL
+            interval: 探测间隔(秒)，默认 settings.comfyui_health_probe_interval
+        """
+        self.base_url = base_url.rstrip("/")
+        self.interval = interval or settings.comfyui_health_probe_interval
+        self.transport = get_comfyui_transport(self.base_url)
+        self.snapshot: ComfyUIHealthSnapshot | None = None
+        self._task: asyncio.Task | None = None
+
+    async def probe_once(self) -> ComfyUIHealthSnapshot:
+        """立即探测一次并更新快照."""
+        started = time.perf_counter()
+        try:
+            stats_response = await self.transport.arequest(
+                "GET", "/system_stats", "system_stats"
+            )
+            latency_ms = (time.perf_counter() - started) * 1000
+            if stats_response.status_code != 200:
+                snapshot = ComfyUIHealthSnapshot(
+                    healthy=False,
+                    checked_at=datetime.now(timezone.utc),
+                    latency_ms=latency_ms,
+                    error=f"system_stats 响应异常: {stats_response.status_code}",
+                )
+            else:
+                snapshot = ComfyUIHealthSnapshot(
+                    healthy=True,
+                    checked_at=datetime.now(timezone.utc),
+                    latency_ms=latency_ms,
+                )
+                self._fill_vram(snapshot, stats_response.json())
+                await self._fill_queue(snapshot)
+        except ComfyUIUnavailableError as e:
+            snapshot = ComfyUIHealthSnapshot(
+                healthy=False, checked_at=datetime.now(timezone.utc), error=e.message
+            )
+        except (requests.RequestException, ValueError) as e:
+            snapshot = ComfyUIHealthSnapshot(
+                healthy=False,
+                checked_at=datetime.now(timezone.utc),
+                error=f"无法连接ComfyUI服务: {e!s}",
+            )
+
+        if self.snapshot is not None and self.snapshot.healthy != snapshot.healthy:
+            logger.info(
+                f"ComfyUI 健康状态变化: {self.base_url} -> "
+                f"{'healthy' if snapshot.healthy else 'unhealthy'}"
+            )
+        self.snapshot = snapshot
+        return snapshot
+
+    async def get_snapshot(self) -> ComfyUIHealthSnapshot:
+        """返回缓存的快照；尚未探测过(如后台探测未启动)时先探测一次."""
+        if self.snapshot is None:
+            return await self.probe_once()
+        return self.snapshot
+
+    def is_stale(self) -> bool:
+        """快照超过 3 个探测间隔未更新，说明后台探测已停止."""
+        if self.snapshot is None:
+            return True
+        age = (datetime.now(timezone.utc) - self.snapshot.checked_at).total_seconds()
+        return age > self.interval * 3
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台探测."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台探测."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_once()
+            except Exception as e:  # 后台循环不能因单次异常退出
+                logger.error(f"ComfyUI 健康探测异常: {e}")
+            await asyncio.sleep(self.interval)
+
+    @staticmethod
+    def _fill_vram(snapshot: ComfyUIHealthSnapshot, stats: dict[str, Any]) -> None:
+        """汇总所有设备的显存信息."""
+        devices = stats.get("devices") or []
+        if devices:
+            snapshot.vram_total = sum(d.get("vram_total") or 0 for d in devices)
+            snapshot.vram_free = sum(d.get("vram_free") or 0 for d in devices)
+
+    async def _fill_queue(self, snapshot: ComfyUIHealthSnapshot) -> None:
+        """读取队列长度；失败不影响整体健康判定."""
+        try:
+            response = await self.transport.arequest("GET", "/queue", "queue")
+            if response.status_code == 200:
+                queue = response.json()
+                snapshot.queue_running = len(queue.get("queue_running") or [])
+                snapshot.queue_pending = len(queue.get("queue_pending") or [])
+        except (requests.RequestException, ValueError, ComfyUIUnavailableError) as e:
+            logger.debug(f"读取 ComfyUI 队列失败: {e}")
+
+
+_probers: dict[str, ComfyUIHealthProber] = {}
+
+
+def get_health_prober(base_url: str | None = None) -> ComfyUIHealthProber:
+    """获取(或创建)指定 ComfyUI 节点的健康探测器.
+
+    Args:
+        base_url: ComfyUI 服务器基础URL，默认 settings.comfyui_api_url
+
+    Returns:
+        该节点的健康探测器
+    """
+    key = (base_url or settings.comfyui_api_url).rstrip("/")
+    prober = _probers.get(key)
+    if prober is None:
+        prober = ComfyUIHealthProber(key)
+        _probers[key] = prober
+    return prober
+
+
+def start_health_probers() -> None:
+    """启动已配置 ComfyUI 节点的后台探测(应用启动时调用)."""
+    get_health_prober().start()
+
+
+async def stop_health_probers() -> None:
+    """停止所有后台探测(应用关闭时调用)."""
+    for prober in list(_probers.values()):
+        await prober.stop()
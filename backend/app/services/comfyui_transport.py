@@ -0,0 +1,279 @@
+"""
+ComfyUI HTTP 传输层.
+
+所有对 ComfyUI 的 HTTP 调用都经过这里，统一提供：
+- 按端点区分的截止时间(连接/读取超时)，不再出现 timeout=None 的无限等待
+- 幂等读请求(/history、/view、/queue、/system_stats)的抖动指数退避重试，
+  重试次数受重试预算约束：连续失败时预算耗尽，自动停止放大流量
+- 熔断器：连续失败达到阈值后熔断，熔断期间直接抛出
+  ComfyUIUnavailableError(API 层映射为 503)，冷却期后放行单个试探请求
+
+传输层按 ComfyUI 节点(base_url)共享，同一节点的所有客户端共用一个熔断器。
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from enum import Enum
+from typing import Any
+
+import requests
+
+from ..config import settings
+from ..constants import COMFYUI_DEADLINES
+from ..exceptions import ComfyUIUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# 允许自动重试的幂等读端点
+IDEMPOTENT_ENDPOINTS = frozenset({"history", "view", "queue", "system_stats"})
+
+# 重试预算：每次重试消耗 1 个令牌，每次成功归还 0.1 个
+_RETRY_BUDGET_MAX = 10.0
+_RETRY_BUDGET_REFILL = 0.1
+
+
+class CircuitState(str, Enum):
+    """熔断器状态枚举"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """线程安全的熔断器.
+
+    CLOSED 下累计连续失败，达到阈值转为 OPEN；OPEN 冷却 reset_timeout 秒后
+    转为 HALF_OPEN，只放行一个试探请求：成功则恢复 CLOSED，失败则重新 OPEN。
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """初始化熔断器.
+
+        Args:
+            failure_threshold: 触发熔断的连续失败次数
+            reset_timeout: 熔断后的冷却时间(秒)
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        """当前状态(OPEN 冷却期满时视为 HALF_OPEN)."""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            return CircuitState.HALF_OPEN
+        return self._state
+
+    def before_call(self) -> None:
+        """请求前检查，熔断中直接抛出 ComfyUIUnavailableError."""
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return
+            if state == CircuitState.HALF_OPEN and not self._trial_in_flight:
+                self._state = CircuitState.HALF_OPEN
+                self._trial_in_flight = True
+                return
+            retry_after = max(
+                1, int(self.reset_timeout - (time.monotonic() - self._opened_at))
+            )
+        raise ComfyUIUnavailableError(retry_after=retry_after)
+
+    def record_success(self) -> None:
+        """记录一次成功调用."""
+        with self._lock:
+            if self._state != CircuitState.CLOSED:
+                logger.info("ComfyUI 熔断器恢复: closed")
+            self._state = CircuitState.CLOSED
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """记录一次失败调用."""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == CircuitState.HALF_OPEN or (
+                self._consecutive_failures >= self.failure_threshold
+                and self._state == CircuitState.CLOSED
+            ):
+                self._state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+                logger.warning(
+                    f"ComfyUI 熔断器打开: 连续失败 {self._consecutive_failures} 次，"
+                    f"{self.reset_timeout}s 后试探恢复"
+                )
+            self._trial_in_flight = False
+
+    def snapshot(self) -> dict[str, Any]:
+        """返回熔断器状态快照(不发起任何请求)."""
+        with self._lock:
+            state = self._current_state()
+            retry_after = 0
+            if state == CircuitState.OPEN:
+                retry_after = max(
+                    1, int(self.reset_timeout - (time.monotonic() - self._opened_at))
+                )
+            return {
+                "state": state.value,
+                "consecutive_failures": self._consecutive_failures,
+                "retry_after": retry_after,
+            }
+
+
+class ComfyUITransport:
+    """单个 ComfyUI 节点的 HTTP 传输层."""
+
+    def __init__(
+        self,
+        base_url: str,
+        breaker: CircuitBreaker | None = None,
+        max_retries: int | None = None,
+        backoff_base: float = 0.5,
+        backoff_max: float = 5.0,
+    ):
+        """初始化传输层.
+
+        Args:
+            base_url: ComfyUI 服务器基础URL
+            breaker: 熔断器(默认按 settings 创建)
+            max_retries: 幂等读请求的最大重试次数(默认 settings.comfyui_max_retries)
+            backoff_base: 退避基数(秒)
+            backoff_max: 单次退避上限(秒)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.breaker = breaker or CircuitBreaker(
+            settings.comfyui_breaker_failure_threshold,
+            settings.comfyui_breaker_reset_timeout,
+        )
+        self.max_retries = (
+            settings.comfyui_max_retries if max_retries is None else max_retries
+        )
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._retry_budget = _RETRY_BUDGET_MAX
+        self._budget_lock = threading.Lock()
+        self._session = requests.Session()
+
+    def request(
+        self, method: str, path: str, endpoint: str, **kwargs: Any
+    ) -> requests.Response:
+        """发送请求(阻塞).
+
+        5xx 与连接/超时异常计为失败；幂等读端点在重试预算允许时
+        以全抖动指数退避重试。最后一次的 5xx 响应原样返回，由调用方处理。
+
+        Args:
+            method: HTTP 方法
+            path: 以 / 开头的路径，如 "/history/<id>"
+            endpoint: 端点名(决定截止时间与是否可重试)，见 COMFYUI_DEADLINES
+            **kwargs: 透传给 requests 的参数(params/json/files 等)
+
+        Returns:
+            HTTP 响应
+
+        Raises:
+            ComfyUIUnavailableError: 熔断中
+            requests.RequestException: 最后一次尝试仍发生连接/超时异常
+            Exception: requests 抛出的其他异常原样抛出(计为失败，不重试)
+        """
+        timeout = COMFYUI_DEADLINES.get(endpoint, COMFYUI_DEADLINES["default"])
+        retryable = endpoint in IDEMPOTENT_ENDPOINTS
+        attempt = 0
+
+        while True:
+            self.breaker.before_call()
+            try:
+                response = self._session.request(
+                    method, f"{self.base_url}{path}", timeout=timeout, **kwargs
+                )
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                if not (retryable and self._should_retry(attempt)):
+                    raise
+                logger.warning(f"ComfyUI {endpoint} 请求异常，准备重试: {e}")
+            except BaseException:
+                # 其他异常(参数错误等)同样要结束本次调用，否则半开状态下的
+                # 试探请求一直处于进行中，熔断器再也不会放行请求
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    self._refill_budget()
+                    return response
+                self.breaker.record_failure()
+                if not (retryable and self._should_retry(attempt)):
+                    return response
+                logger.warning(
+                    f"ComfyUI {endpoint} 返回 {response.status_code}，准备重试"
+                )
+
+            attempt += 1
+            time.sleep(self._backoff(attempt))
+
+    async def arequest(
+        self, method: str, path: str, endpoint: str, **kwargs: Any
+    ) -> requests.Response:
+        """request 的异步版本，在线程池中执行，不阻塞事件循环."""
+        return await asyncio.to_thread(self.request, method, path, endpoint, **kwargs)
+
+    def _should_retry(self, attempt: int) -> bool:
+        """判断是否还能重试：次数未用尽、熔断器未打开且预算充足."""
+        if attempt >= self.max_retries:
+            return False
+        if self.breaker.state != CircuitState.CLOSED:
+            return False
+        with self._budget_lock:
+            if self._retry_budget < 1:
+                return False
+            self._retry_budget -= 1
+            return True
+
+    def _refill_budget(self) -> None:
+        with self._budget_lock:
+            self._retry_budget = min(
+                _RETRY_BUDGET_MAX, self._retry_budget + _RETRY_BUDGET_REFILL
+            )
+
+    def _backoff(self, attempt: int) -> float:
+        """全抖动指数退避: U(0, min(max, base * 2^attempt))."""
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * (2**attempt))
+        )
+
+
+_transports: dict[str, ComfyUITransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_comfyui_transport(base_url: str | None = None) -> ComfyUITransport:
+    """获取(或创建)指定 ComfyUI 节点共享的传输层实例.
+
+    Args:
+        base_url: ComfyUI 服务器基础URL，默认 settings.comfyui_api_url
+
+    Returns:
+        该节点共享的传输层实例
+    """
+    key = (base_url or settings.comfyui_api_url).rstrip("/")
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = ComfyUITransport(key)
+            _transports[key] = transport
+        return transport
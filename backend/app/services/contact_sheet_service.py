@@ -0,0 +1,315 @@
+"""
+文生图联系表(contact sheet)服务.
+
+把多张已完成的文生图结果一次性打包返回，减少移动端逐张下载的往返：
+- zip:   缩略图打包成一个 ZIP
+- atlas: 缩略图拼成一张图集，并附带每张图的偏移表(JSON)
+
+缩略图与打包结果都缓存在本地磁盘：缩略图按 ComfyUI 文件名缓存，
+打包结果按「格式 + 任务集合」的哈希缓存，相同请求直接复用。
+Pillow 的解码/缩放/编码都在线程池中执行，不阻塞事件循环。
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import math
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from PIL import Image
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models.text2img import Text2ImgTask
+from .text2img_service import text2img_service
+
+logger = logging.getLogger(__name__)
+
+# 缩略图/图集统一使用 JPEG，体积小且解码快
+_THUMB_FORMAT = "JPEG"
+_THUMB_QUALITY = 85
+# 并发拉取原图的上限，避免一次请求把 ComfyUI 打满
+_FETCH_CONCURRENCY = 4
+
+
+@dataclass
+class AtlasTile:
+    """图集中单张缩略图的位置."""
+
+    task_id: str
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+@dataclass
+class ContactSheet:
+    """联系表构建结果."""
+
+    sheet_id: str
+    format: str
+    path: Path
+    missing: list[str] = field(default_factory=list)
+    width: int = 0
+    height: int = 0
+    tiles: list[AtlasTile] = field(default_factory=list)
+
+
+class ContactSheetService:
+    """文生图联系表服务类."""
+
+    def __init__(self, cache_dir: str | Path | None = None):
+        """初始化联系表服务.
+
+        Args:
+            cache_dir: 媒体缓存根目录，默认使用 settings.media_cache_dir
+        """
+        root = Path(cache_dir or settings.media_cache_dir)
+        self.thumbnail_dir = root / "thumbnails"
+        self.sheet_dir = root / "sheets"
+
+    async def build(
+        self, task_ids: list[str], sheet_format: str, db: AsyncSession
+    ) -> ContactSheet:
+        """构建(或复用缓存的)联系表.
+
+        Args:
+            task_ids: 文生图任务ID列表，顺序即图集中的排列顺序
+            sheet_format: "zip" 或 "atlas"
+            db: 数据库会话
+
+        Returns:
+            联系表构建结果
+
+        Raises:
+            ValueError: 格式不支持
+            LookupError: 列表中没有任何已完成的任务
+        """
+        if sheet_format not in ("zip", "atlas"):
+            raise ValueError(f"不支持的联系表格式: {sheet_format}")
+
+        # 去重但保留顺序
+        ordered_ids = list(dict.fromkeys(task_ids))
+        rows = await db.execute(
+            select(Text2ImgTask.prompt_id, Text2ImgTask.filename).where(
+                Text2ImgTask.prompt_id.in_(ordered_ids),
+                Text2ImgTask.status == "completed",
+                Text2ImgTask.filename.isnot(None),
+            )
+        )
+        filenames = {row.prompt_id: row.filename for row in rows}
+        entries = [(tid, filenames[tid]) for tid in ordered_ids if tid in filenames]
+        missing = [tid for tid in ordered_ids if tid not in filenames]
+        if not entries:
+            raise LookupError("没有可用的已完成任务")
+
+        sheet_id = self._sheet_id(sheet_format, entries)
+        sheet = self._load_cached(sheet_id, sheet_format)
+        if sheet is None:
+            thumbnails = await self._ensure_thumbnails(entries)
+            available = [
+                (tid, thumbnails[tid]) for tid, _ in entries if tid in thumbnails
+            ]
+            missing.extend(tid for tid, _ in entries if tid not in thumbnails)
+            if not available:
+                raise LookupError("图片在 ComfyUI 上均不可用")
+            if len(available) < len(entries):
+                # 部分原图暂时拉取失败：按实际包含的任务计算哈希，避免不完整的联系表
+                # 缓存在完整任务集合的哈希下，之后的请求仍会重试拉取失败的图片
+                sheet_id = self._sheet_id(
+                    sheet_format,
+                    [(tid, name) for tid, name in entries if tid in thumbnails],
+                )
+                sheet = self._load_cached(sheet_id, sheet_format)
+            if sheet is None:
+                sheet = await self._write(sheet_id, sheet_format, available)
+
+        sheet.missing = missing
+        return sheet
+
+    async def _write(
+        self, sheet_id: str, sheet_format: str, available: list[tuple[str, Path]]
+    ) -> ContactSheet:
+        """在线程池中生成联系表文件."""
+        if sheet_format == "zip":
+            sheet = await asyncio.to_thread(self._write_zip, sheet_id, available)
+        else:
+            sheet = await asyncio.to_thread(self._write_atlas, sheet_id, available)
+        logger.info(
+            f"联系表已生成: sheet_id={sheet_id}, format={sheet_format}, "
+            f"图片数={len(available)}"
+        )
+        return sheet
+
+    def get_atlas_path(self, sheet_id: str) -> Path | None:
+        """返回已缓存图集图片的路径，不存在返回 None."""
+        if not self._is_valid_sheet_id(sheet_id):
+            return None
+        path = self.sheet_dir / f"{sheet_id}.jpg"
+        return path if path.is_file() else None
+
+    def _sheet_id(self, sheet_format: str, entries: list[tuple[str, str]]) -> str:
+        """以「格式 + 缩略图尺寸 + 有序任务集合」计算联系表哈希."""
+        digest = hashlib.sha256()
+        digest.update(f"{sheet_format}:{settings.contact_sheet_thumb_size}".encode())
+        for task_id, filename in entries:
+            digest.update(f"\n{task_id}:{filename}".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _is_valid_sheet_id(sheet_id: str) -> bool:
+        return len(sheet_id) == 64 and all(c in "0123456789abcdef" for c in sheet_id)
+
+    def _load_cached(self, sheet_id: str, sheet_format: str) -> ContactSheet | None:
+        """读取已缓存的联系表(图集需同时存在图片与偏移表)."""
+        if sheet_format == "zip":
+            path = self.sheet_dir / f"{sheet_id}.zip"
+            if path.is_file():
+                return ContactSheet(sheet_id=sheet_id, format="zip", path=path)
+            return None
+
+        path = self.sheet_dir / f"{sheet_id}.jpg"
+        map_path = self.sheet_dir / f"{sheet_id}.json"
+        if not (path.is_file() and map_path.is_file()):
+            return None
+        try:
+            layout = json.loads(map_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return ContactSheet(
+            sheet_id=sheet_id,
+            format="atlas",
+            path=path,
+            width=layout["width"],
+            height=layout["height"],
+            tiles=[AtlasTile(**tile) for tile in layout["tiles"]],
+        )
+
+    def thumbnail_path(self, filename: str) -> Path:
+        """返回 ComfyUI 文件名对应的本地缩略图路径(不保证存在)."""
+        name = hashlib.sha1(filename.encode(), usedforsecurity=False).hexdigest()
+        return self.thumbnail_dir / f"{name}.jpg"
+
+    async def _ensure_thumbnails(
+        self, entries: list[tuple[str, str]]
+    ) -> dict[str, Path]:
+        """确保每个任务都有本地缩略图，返回 task_id -> 缩略图路径.
+
+        原图拉取失败的任务不出现在返回结果中。
+        """
+        semaphore = asyncio.Semaphore(_FETCH_CONCURRENCY)
+
+        async def ensure(task_id: str, filename: str) -> tuple[str, Path | None]:
+            path = self.thumbnail_path(filename)
+            if path.is_file():
+                return task_id, path
+            async with semaphore:
+                data = await asyncio.to_thread(text2img_service.fetch_media, filename)
+                if not data:
+                    return task_id, None
+                try:
+                    await asyncio.to_thread(self._write_thumbnail, data, path)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"生成缩略图失败: {filename}, {e}")
+                    return task_id, None
+            return task_id, path
+
+        results = await asyncio.gather(*(ensure(tid, fn) for tid, fn in entries))
+        return {task_id: path for task_id, path in results if path is not None}
+
+    def _write_thumbnail(self, data: bytes, path: Path) -> None:
+        """解码原图并缩放为缩略图(线程池中执行)."""
+        size = settings.contact_sheet_thumb_size
+        with Image.open(io.BytesIO(data)) as image:
+            thumb = image.convert("RGB")
+            thumb.thumbnail((size, size))
+            buffer = io.BytesIO()
+            thumb.save(buffer, _THUMB_FORMAT, quality=_THUMB_QUALITY)
+        self._atomic_write(path, buffer.getvalue())
+
+    def _write_zip(
+        self, sheet_id: str, available: list[tuple[str, Path]]
+    ) -> ContactSheet:
+        """把缩略图打包为 ZIP(缩略图已是 JPEG，直接存储不再压缩)."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zf:
+            for task_id, thumb_path in available:
+                zf.write(thumb_path, arcname=f"{task_id}.jpg")
+        path = self.sheet_dir / f"{sheet_id}.zip"
+        self._atomic_write(path, buffer.getvalue())
+        return ContactSheet(sheet_id=sheet_id, format="zip", path=path)
+
+    def _write_atlas(
+        self, sheet_id: str, available: list[tuple[str, Path]]
+    ) -> ContactSheet:
+        """把缩略图按网格拼成图集，并写出偏移表."""
+        cell = settings.contact_sheet_thumb_size
+        columns = math.ceil(math.sqrt(len(available)))
+        rows = math.ceil(len(available) / columns)
+        atlas = Image.new("RGB", (columns * cell, rows * cell), (0, 0, 0))
+
+        tiles: list[AtlasTile] = []
+        for position, (task_id, thumb_path) in enumerate(available):
+            x = (position % columns) * cell
+            y = (position // columns) * cell
+            with Image.open(thumb_path) as thumb:
+                atlas.paste(thumb, (x, y))
+                tiles.append(
+                    AtlasTile(
+                        task_id=task_id,
+                        x=x,
+                        y=y,
+                        width=thumb.width,
+                        height=thumb.height,
+                    )
+                )
+
+        buffer = io.BytesIO()
+        atlas.save(buffer, _THUMB_FORMAT, quality=_THUMB_QUALITY)
+        path = self.sheet_dir / f"{sheet_id}.jpg"
+        layout = {
+            "width": atlas.width,
+            "height": atlas.height,
+            "tiles": [tile.__dict__ for tile in tiles],
+        }
+        # 先写偏移表再写图片：_load_cached 以两者同时存在为准
+        self._atomic_write(
+            self.sheet_dir / f"{sheet_id}.json",
+            json.dumps(layout, ensure_ascii=False).encode("utf-8"),
+        )
+        self._atomic_write(path, buffer.getvalue())
+        return ContactSheet(
+            sheet_id=sheet_id,
+            format="atlas",
+            path=path,
+            width=atlas.width,
+            height=atlas.height,
+            tiles=tiles,
+        )
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        """写临时文件后原子替换，避免并发请求读到半截文件."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+
+# 全局服务实例
+contact_sheet_service = ContactSheetService()
+
+
+def create_contact_sheet_service() -> ContactSheetService:
+    """创建联系表服务实例."""
+    return contact_sheet_service
@@ -0,0 +1,265 @@
+"""
+生成任务队列.
+
+API 进程通过 enqueue_* 把任务写入 generation_job 表(与任务行同一事务)，
+worker 进程通过 claim_* 认领任务：
+- PostgreSQL: SELECT ... FOR UPDATE SKIP LOCKED，多个 worker 互不阻塞
+- SQLite(本地模式): 不支持行锁，改为「按条件 UPDATE + 检查 rowcount」的
+  比较并交换认领，保证同一任务只被一个 worker 认领
+
+状态流转: queued → submitting → submitted → done
+                      ↘ (可重试错误) queued   ↘ failed
+"""
+
+import json
+import logging
+import random
+import uuid
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models.generation_job import GenerationJob
+from ..utils.datetime_utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+# 重试退避上限(秒)
+_RETRY_BACKOFF_MAX = 300
+
+
+def new_prompt_id() -> str:
+    """预生成 ComfyUI prompt_id(ComfyUI 接受客户端指定的 prompt_id)."""
+    return str(uuid.uuid4())
+
+
+def enqueue_t2i(
+    db: AsyncSession,
+    prompt_id: str,
+    prompt: str,
+    model_name: str,
+    negative_prompt: str | None = None,
+) -> GenerationJob:
+    """文生图任务入队(只 add 不 commit，由调用方与任务行一起提交)."""
+    job = GenerationJob(
+        kind="t2i",
+        prompt_id=prompt_id,
+        model_name=model_name,
+        payload=json.dumps(
+            {"prompt": prompt, "negative_prompt": negative_prompt}, ensure_ascii=False
+        ),
+        status="queued",
+        attempts=0,
+        available_at=utcnow(),
+    )
+    db.add(job)
+    return job
+
+
+def enqueue_i2v(
+    db: AsyncSession,
+    prompt_id: str,
+    prompt: str,
+    model_name: str,
+    image_bytes: bytes,
+    image_filename: str,
+) -> GenerationJob:
+    """图生视频任务入队(只 add 不 commit，由调用方与任务行一起提交)."""
+    job = GenerationJob(
+        kind="i2v",
+        prompt_id=prompt_id,
+        model_name=model_name,
+        payload=json.dumps(
+            {"prompt": prompt, "image_filename": image_filename}, ensure_ascii=False
+        ),
+        input_data=image_bytes,
+        status="queued",
+        attempts=0,
+        available_at=utcnow(),
+    )
+    db.add(job)
+    return job
+
+
+def job_payload(job: GenerationJob) -> dict[str, Any]:
+    """解析任务提交参数."""
+    return json.loads(job.payload)
+
+
+async def claim_jobs(
+    db: AsyncSession, worker_id: str, limit: int
+) -> list[GenerationJob]:
+    """认领待提交的任务，状态置为 submitting 并累加尝试次数.
+
+    Args:
+        db: 数据库会话
+        worker_id: worker 标识
+        limit: 最多认领条数
+
+    Returns:
+        认领到的任务列表
+    """
+    now = utcnow()
+    condition = and_(
+        GenerationJob.status == "queued", GenerationJob.available_at <= now
+    )
+    return await _claim(
+        db,
+        condition,
+        {
+            "status": "submitting",
+            "locked_by": worker_id,
+            "locked_at": now,
+            "attempts": GenerationJob.attempts + 1,
+        },
+        limit,
+    )
+
+
+async def claim_for_tracking(
+    db: AsyncSession, worker_id: str, limit: int
+) -> list[GenerationJob]:
+    """认领需要跟踪结果的已提交任务.
+
+    每个任务在 settings.generation_job_track_interval 内最多被一个 worker
+    检查一次，多个 worker 不会重复查询 ComfyUI。
+    """
+    now = utcnow()
+    threshold = now - timedelta(seconds=settings.generation_job_track_interval)
+    condition = and_(
+        GenerationJob.status == "submitted",
+        or_(GenerationJob.locked_at.is_(None), GenerationJob.locked_at <= threshold),
+    )
+    return await _claim(
+        db, condition, {"locked_by": worker_id, "locked_at": now}, limit
+    )
+
+
+async def _claim(
+    db: AsyncSession, condition: Any, values: dict[str, Any], limit: int
+) -> list[GenerationJob]:
+    """按条件认领任务：PostgreSQL 用 SKIP LOCKED，其他数据库用比较并交换."""
+    query = (
+        select(GenerationJob.id)
+        .where(condition)
+        .order_by(GenerationJob.id)
+        .limit(limit)
+    )
+
+    if db.get_bind().dialect.name == "postgresql":
+        ids = list(await db.scalars(query.with_for_update(skip_locked=True)))
+        if ids:
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id.in_(ids))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+    else:
+        ids = []
+        for job_id in (await db.scalars(query)).all():
+            result = await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id, condition)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                ids.append(job_id)
+    await db.commit()
+
+    if not ids:
+        return []
+    return list(
+        await db.scalars(
+            select(GenerationJob)
+            .where(GenerationJob.id.in_(ids))
+            .order_by(GenerationJob.id)
+            .execution_options(populate_existing=True)
+        )
+    )
+
+
+async def mark_submitted(db: AsyncSession, job: GenerationJob) -> None:
+    """标记任务已提交到 ComfyUI，等待跟踪结果."""
+    job.status = "submitted"
+    job.locked_at = utcnow()
+    job.last_error = None
+    await db.commit()
+
+
+async def mark_done(db: AsyncSession, job: GenerationJob) -> None:
+    """标记任务已结束(成功或失败的结果已写入任务行)."""
+    job.status = "done"
+    job.input_data = None  # 输入图片已无用，释放空间
+    await db.commit()
+
+
+async def mark_retry(
+    db: AsyncSession,
+    job: GenerationJob,
+    error: str,
+    delay: float | None = None,
+    count_attempt: bool = True,
+) -> bool:
+    """提交失败后重新入队；超过最大尝试次数时标记为 failed.
+
+    Args:
+        db: 数据库会话
+        job: 任务
+        error: 错误信息
+        delay: 指定重试延迟(秒)，默认按尝试次数指数退避
+        count_attempt: 是否计入尝试次数(ComfyUI 熔断时不计入)
+
+    Returns:
+        是否已重新入队(False 表示已标记为 failed)
+    """
+    if not count_attempt:
+        job.attempts = max(0, job.attempts - 1)
+    elif job.attempts >= settings.generation_job_max_attempts:
+        await mark_failed(db, job, error)
+        return False
+
+    if delay is None:
+        delay = min(_RETRY_BACKOFF_MAX, 5 * 2 ** max(0, job.attempts - 1))
+        delay += random.uniform(0, delay / 2)
+    job.status = "queued"
+    job.available_at = utcnow() + timedelta(seconds=delay)
+    job.locked_by = None
+    job.locked_at = None
+    job.last_error = error
+    await db.commit()
+    return True
+
+
+async def mark_failed(db: AsyncSession, job: GenerationJob, error: str) -> None:
+    """标记任务最终失败(调用方负责同步更新任务行)."""
+    job.status = "failed"
+    job.last_error = error
+    job.input_data = None
+    await db.commit()
+
+
+async def requeue_stale(db: AsyncSession) -> int:
+    """把租约过期的 submitting 任务放回队列(认领它的 worker 可能已崩溃).
+
+    Returns:
+        重新入队的任务数
+    """
+    threshold = utcnow() - timedelta(seconds=settings.generation_job_lease_seconds)
+    result = await db.execute(
+        update(GenerationJob)
+        .where(
+            GenerationJob.status == "submitting",
+            GenerationJob.locked_at <= threshold,
+        )
+        .values(status="queued", locked_by=None, locked_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if result.rowcount:
+        logger.warning(f"{result.rowcount} 个生成任务租约过期，已重新入队")
+    return result.rowcount
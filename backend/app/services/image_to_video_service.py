@@ -5,16 +5,22 @@
 设计为「提交即返回 task_id + 单接口取视频」两步模式,不依赖 Dify。
 """
 
+import asyncio
 import logging
-from datetime import datetime
 
 import requests
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
 from ..models.text2img import ImageToVideoTask
+from ..utils.datetime_utils import utcnow
 from ..utils.model_validation import validate_and_get_model
-from .comfyui_client import create_comfyui_client
+from .comfyui_client import ComfyUIClient, create_comfyui_client
+from .comfyui_health import get_health_prober
+from .comfyui_transport import get_comfyui_transport
+from .generation_queue import enqueue_i2v, new_prompt_id
+from .task_cache import task_cache
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +34,7 @@ async def generate(
         model_name: str | None,
         image_bytes: bytes,
         image_filename: str,
-        db: Session,
+        db: AsyncSession,
     ) -> str:
         """提交图生视频任务,立即返回 task_id(即 ComfyUI prompt_id).
 
@@ -46,6 +52,24 @@ async def generate(
             RuntimeError: ComfyUI 提交失败
         """
         model = validate_and_get_model(model_name, "I2V")
+
+        if settings.generation_queue_enabled:
+            # 队列模式:预生成 prompt_id,任务行与队列任务同一事务写入,由 worker 提交
+            prompt_id = new_prompt_id()
+            db.add(
+                ImageToVideoTask(
+                    prompt_id=prompt_id,
+                    prompt=prompt,
+                    model_name=model,
+                    image_filename=image_filename,
+                    status="pending",
+                )
+            )
+            enqueue_i2v(db, prompt_id, prompt, model, image_bytes, image_filename)
+            await db.commit()
+            logger.info(f"图生视频任务已入队: task_id={prompt_id}, model={model}")
+            return prompt_id
+
         client = create_comfyui_client(model_title=model, workflow_type="i2v")
         prompt_id = await client.generate_video(prompt, image_bytes, image_filename)
 
@@ -60,12 +84,12 @@ async def generate(
             status="pending",
         )
         db.add(task)
-        db.commit()
+        await db.commit()
 
         logger.info(f"图生视频任务已提交: task_id={prompt_id}, model={model}")
         return prompt_id
 
-    async def get_video(self, task_id: str, db: Session) -> tuple[bytes | None, int]:
+    async def get_video(self, task_id: str, db: AsyncSession) -> tuple[bytes | None, int]:
         """根据 task_id 获取视频.
 
         Args:
@@ -78,33 +102,56 @@ async def get_video(self, task_id: str, db: Session) -> tuple[bytes | None, int]
               - (None, 202): 仍在生成中
               - (None, 404): 任务不存在或生成失败
         """
-        task = (
-            db.query(ImageToVideoTask)
-            .filter(ImageToVideoTask.prompt_id == task_id)
-            .first()
-        )
-
-        if not task:
-            return None, 404
+        # 已结束的任务直接命中终态缓存，不查数据库
+        cached = task_cache.get("i2v", task_id)
+        if cached is not None:
+            status, video_filename = cached.status, cached.filename
+        else:
+            task = await db.scalar(
+                select(ImageToVideoTask).where(ImageToVideoTask.prompt_id == task_id)
+            )
+            if not task:
+                return None, 404
 
-        if task.status == "failed":
-            return None, 404
+            if task.status != "pending":
+                task_cache.put_task("i2v", task)
+            elif not settings.generation_queue_enabled:
+                # 队列模式下由 worker 跟踪结果，API 进程只读数据库
+                client = create_comfyui_client(
+                    model_title=task.model_name, workflow_type="i2v"
+                )
+                await self._refresh_status(task, client, db)
+            status, video_filename = task.status, task.video_filename
 
-        if task.status == "completed" and task.video_filename:
-            data = self._fetch_video(task.video_filename)
+        if status == "completed" and video_filename:
+            data = await asyncio.to_thread(self._fetch_video, video_filename)
             if data:
                 return data, 200
-            logger.warning(f"视频文件在 ComfyUI 上不存在: {task.video_filename}")
+            logger.warning(f"视频文件在 ComfyUI 上不存在: {video_filename}")
             return None, 404
 
-        # pending: 查询 ComfyUI history
-        client = create_comfyui_client(
-            model_title=task.model_name, workflow_type="i2v"
-        )
-        info = await client.check_task_status(task_id)
+        if status == "failed":
+            return None, 404
+
+        # 仍在排队/运行中
+        return None, 202
+
+    async def _refresh_status(
+        self, task: ImageToVideoTask, client: ComfyUIClient, db: AsyncSession
+    ) -> None:
+        """查询 ComfyUI history 并更新 pending 任务的状态，进入终态时写入终态缓存.
 
+        Args:
+            task: 待刷新的任务(仅处理 pending 状态)
+            client: ComfyUI 客户端
+            db: 数据库会话
+        """
+        if task.status != "pending":
+            return
+
+        info = await client.check_task_status(task.prompt_id)
         if not info:
-            return None, 202
+            return
 
         status_str = info.get("status", {}).get("status_str", "")
 
@@ -113,28 +160,23 @@ async def get_video(self, task_id: str, db: Session) -> tuple[bytes | None, int]
             if not video_filename:
                 task.status = "failed"
                 task.error_message = "任务完成但未找到视频输出"
-                db.commit()
-                return None, 404
+                await db.commit()
+                task_cache.put_task("i2v", task)
+                return
 
             task.status = "completed"
             task.video_filename = video_filename
-            task.completed_at = datetime.now()
-            db.commit()
-
-            data = self._fetch_video(video_filename)
-            if data:
-                return data, 200
-            return None, 404
+            task.completed_at = utcnow()
+            await db.commit()
+            task_cache.put_task("i2v", task)
+            return
 
         if status_str in ("error", "failed"):
             messages = info.get("status", {}).get("messages", [])
             task.status = "failed"
             task.error_message = f"ComfyUI 任务失败: {messages}"
-            db.commit()
-            return None, 404
-
-        # 仍在运行中
-        return None, 202
+            await db.commit()
+            task_cache.put_task("i2v", task)
 
     def _extract_video_filename(self, outputs: dict) -> str | None:
         """从 ComfyUI outputs 中提取视频文件名.
@@ -207,17 +249,18 @@ def _fetch_video(self, video_filename: str) -> bytes | None:
             二进制数据,失败返回 None
         """
         try:
-            comfyui_url = settings.comfyui_api_url
             # 解析 filename 和 subfolder
+            params = {"type": "output"}
             if "/" in video_filename:
                 path_parts = video_filename.split("/")
-                filename = path_parts[-1]
-                subfolder = "/".join(path_parts[:-1])
-                url = f"{comfyui_url}/api/view?filename={filename}&type=output&subfolder={subfolder}"
+                params["filename"] = path_parts[-1]
+                params["subfolder"] = "/".join(path_parts[:-1])
             else:
-                url = f"{comfyui_url}/api/view?filename={video_filename}&type=output"
+                params["filename"] = video_filename
 
-            response = requests.get(url, timeout=120)
+            response = get_comfyui_transport().request(
+                "GET", "/api/view", "view", params=params
+            )
             if response.status_code == 200:
                 logger.info(
                     f"成功获取视频: {video_filename}, 大小: {len(response.content)} bytes"
@@ -230,13 +273,9 @@ def _fetch_video(self, video_filename: str) -> bytes | None:
             return None
 
     async def health_check(self) -> dict[str, bool]:
-        """健康检查."""
-        try:
-            comfyui_url = settings.comfyui_api_url
-            response = requests.get(f"{comfyui_url}/system_stats", timeout=5)
-            return {"comfyui": response.status_code == 200}
-        except requests.RequestException:
-            return {"comfyui": False}
+        """健康检查(读取后台探测的缓存快照)."""
+        snapshot = await get_health_prober().get_snapshot()
+        return {"comfyui": snapshot.healthy}
 
 
 # 全局服务实例
@@ -0,0 +1,76 @@
+"""
+客户端错误指纹.
+
+同一个错误在不同设备、不同时间上报时，消息和堆栈里通常只有数字、地址、
+ID 之类的可变部分不同。把这些部分替换为占位符后取 SHA-1，作为错误指纹：
+- 消息: UUID、十六进制地址、数字、引号中的内容
+- 堆栈: 只取前 LOG_FINGERPRINT_MAX_FRAMES 帧，去掉帧序号、行号/列号与地址
+
+指纹相同的错误在 client_log_groups 中聚合计数。
+"""
+
+import hashlib
+import re
+
+from ..constants import LOG_FINGERPRINT_LEVELS, LOG_FINGERPRINT_MAX_FRAMES
+
+_UUID_RE = re.compile(
+    r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I
+)
+_HEX_RE = re.compile(r"\b0x[0-9a-f]+\b", re.I)
+_QUOTED_RE = re.compile(r"""'[^']*'|"[^"]*\"""")
+_NUMBER_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+# Dart 堆栈帧序号，如 "#12      "
+_FRAME_NO_RE = re.compile(r"^#\d+\s+")
+
+
+def normalize_message(message: str) -> str:
+    """归一化日志消息，去掉可变部分."""
+    message = _UUID_RE.sub("<uuid>", message)
+    message = _HEX_RE.sub("<hex>", message)
+    message = _QUOTED_RE.sub("<str>", message)
+    message = _NUMBER_RE.sub("<n>", message)
+    return _SPACE_RE.sub(" ", message).strip().lower()
+
+
+def normalize_stack_trace(stack_trace: str) -> str:
+    """归一化堆栈，只保留前若干帧的调用位置."""
+    frames = []
+    for line in stack_trace.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        line = _FRAME_NO_RE.sub("", line)
+        line = _HEX_RE.sub("<hex>", line)
+        frames.append(_NUMBER_RE.sub("<n>", line))
+        if len(frames) >= LOG_FINGERPRINT_MAX_FRAMES:
+            break
+    return "\n".join(frames)
+
+
+def compute_fingerprint(
+    level: str, category: str, message: str, stack_trace: str | None
+) -> str | None:
+    """计算日志的错误指纹.
+
+    Args:
+        level: 日志级别
+        category: 日志分类
+        message: 日志消息
+        stack_trace: 堆栈信息
+
+    Returns:
+        40 位十六进制 SHA-1；不参与聚合的级别返回 None
+    """
+    if level not in LOG_FINGERPRINT_LEVELS:
+        return None
+    key = "\x1f".join(
+        (
+            level,
+            category,
+            normalize_message(message),
+            normalize_stack_trace(stack_trace) if stack_trace else "",
+        )
+    )
+    return hashlib.sha1(key.encode("utf-8"), usedforsecurity=False).hexdigest()
@@ -0,0 +1,357 @@
+"""
+客户端日志缓冲写入.
+
+日志上报接口只把日志放入进程内有界缓冲区后立即返回，由后台 flusher
+批量写入 client_logs：
+- 缓冲行数达到 log_ingest_batch_size 或距上次写入超过 log_ingest_flush_interval
+  时触发写入
+- PostgreSQL 使用 COPY，其他数据库使用多行 INSERT
+- 错误级别日志在入缓冲区时计算指纹，写入时在同一事务内按指纹 upsert
+  client_log_groups 的计数与首次/最近出现时间
+- 同一事务内按 (分钟/小时, 级别, 分类) 累加 client_log_rollups 计数，
+  仪表盘统计只读汇总表
+- 缓冲区满时拒绝新的批次(接口返回 503)，由客户端稍后重试，实现背压
+- 进程关闭时先停止 flusher，再把剩余日志全部写入
+
+缓冲区在进程内存中，进程被强制杀死时尚未写入的日志会丢失；
+客户端日志属于尽力而为的数据，以此换取上报接口不等待数据库。
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..config import settings
+from ..database import async_engine
+from ..models.client_log import ClientLogGroup, ClientLogRollup
+from .log_fingerprint import compute_fingerprint
+from .log_partitions import log_partition_manager
+
+logger = logging.getLogger(__name__)
+
+# COPY / INSERT 写入的列(id 由数据库生成)
+LOG_COLUMNS = (
+    "level",
+    "message",
+    "stack_trace",
+    "category",
+    "tags",
+    "timestamp",
+    "received_at",
+    "fingerprint",
+)
+
+# 汇总计数的时间粒度
+ROLLUP_GRANULARITIES = ("minute", "hour")
+
+# 单批写入失败后的最多重试次数，超过后丢弃该批并记录错误
+MAX_FLUSH_ATTEMPTS = 3
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """统一为不带时区的 UTC 时间(client_logs 的时间列不带时区)."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class LogIngestBuffer:
+    """有界日志缓冲区与后台批量写入器."""
+
+    def __init__(
+        self,
+        max_size: int | None = None,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+    ):
+        """初始化缓冲区.
+
+        Args:
+            max_size: 缓冲区最多容纳的日志行数
+            batch_size: 单次写入的最大行数，缓冲行数达到该值时立即写入
+            flush_interval: 最长写入间隔(秒)
+        """
+        self.max_size = max(1, max_size or settings.log_ingest_queue_size)
+        self.batch_size = max(1, batch_size or settings.log_ingest_batch_size)
+        self.flush_interval = flush_interval or settings.log_ingest_flush_interval
+        self._rows: deque[dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.dropped = 0
+
+    def offer(self, rows: list[dict[str, Any]]) -> bool:
+        """放入一批日志，整批接收或整批拒绝.
+
+        Args:
+            rows: 日志行，键为 LOG_COLUMNS
+
+        Returns:
+            缓冲区容量不足时返回 False
+        """
+        if len(self._rows) + len(rows) > self.max_size:
+            self.rejected += len(rows)
+            return False
+        received_at = _naive_utc(datetime.now(timezone.utc))
+        for row in rows:
+            row["timestamp"] = _naive_utc(row["timestamp"])
+            row.setdefault("received_at", received_at)
+            row.setdefault(
+                "fingerprint",
+                compute_fingerprint(
+                    row["level"], row["category"], row["message"], row["stack_trace"]
+                ),
+            )
+            self._rows.append(row)
+        self.accepted += len(rows)
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def put(self, rows: list[dict[str, Any]], timeout: float) -> bool:
+        """放入一批日志，缓冲区已满时最多等待 timeout 秒腾出空间.
+
+        用于流式上报：等待期间不再读取请求体，背压经 TCP 传递给客户端。
+
+        Args:
+            rows: 日志行，键为 LOG_COLUMNS
+            timeout: 最长等待时间(秒)
+
+        Returns:
+            超时仍无空间时返回 False
+        """
+        deadline = time.monotonic() + timeout
+        while len(self._rows) + len(rows) > self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or len(rows) > self.max_size:
+                self.rejected += len(rows)
+                return False
+            self._space.clear()
+            self._wakeup.set()  # 让 flusher 立即写入
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._space.wait(), remaining)
+        return self.offer(rows)
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台写入."""
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台写入，并把缓冲区中剩余的日志全部写入.
+
+        不取消正在执行的写入(取消会中断事务、丢失已取出的批次)，
+        而是通知 flusher 在当前批次完成后退出。
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        # 写入失败的批次最多重试 MAX_FLUSH_ATTEMPTS 次后丢弃，循环必然结束
+        while self._rows:
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """写入一批日志(最多 batch_size 行).
+
+        Returns:
+            写入是否成功；失败的批次放回缓冲区头部等待重试
+        """
+        async with self._flush_lock:
+            batch = [
+                self._rows.popleft()
+                for _ in range(min(self.batch_size, len(self._rows)))
+            ]
+            if not batch:
+                return True
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self._space.set()
+                attempts = batch[0].get("_attempts", 0) + 1
+                if attempts >= MAX_FLUSH_ATTEMPTS:
+                    self.dropped += len(batch)
+                    logger.error(f"客户端日志写入失败，丢弃 {len(batch)} 条: {e}")
+                else:
+                    logger.warning(f"客户端日志写入失败，稍后重试: {e}")
+                    batch[0]["_attempts"] = attempts
+                    self._rows.extendleft(reversed(batch))
+                return False
+            self.written += len(batch)
+            self._space.set()
+            return True
+
+    def stats(self) -> dict[str, int]:
+        """返回缓冲区统计."""
+        return {
+            "queued": len(self._rows),
+            "max_size": self.max_size,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    async def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stopping:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            self._wakeup.clear()
+            if not self._rows:
+                last_flush = time.monotonic()
+                continue
+            ok = await self.flush()
+            last_flush = time.monotonic()
+            if not ok and not self._stopping:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            elif len(self._rows) >= self.batch_size:
+                self._wakeup.set()
+
+    async def _write(self, batch: list[dict[str, Any]]) -> None:
+        async with async_engine.begin() as conn:
+            # 同一批日志可能跨越分区边界，按分区分组后各自写入
+            by_partition: dict[datetime, list[tuple]] = {}
+            for row in batch:
+                start = log_partition_manager.partition_start(row["received_at"])
+                by_partition.setdefault(start, []).append(
+                    tuple(row[column] for column in LOG_COLUMNS)
+                )
+            by_table = {}
+            for start, records in by_partition.items():
+                table = await conn.run_sync(log_partition_manager.insert_target, start)
+                by_table.setdefault(table, []).extend(records)
+            for table, records in by_table.items():
+                if conn.dialect.name == "postgresql":
+                    raw = await conn.get_raw_connection()
+                    await raw.driver_connection.copy_records_to_table(
+                        table.name, records=records, columns=LOG_COLUMNS
+                    )
+                else:
+                    await conn.execute(
+                        insert(table),
+                        [
+                            dict(zip(LOG_COLUMNS, record, strict=True))
+                            for record in records
+                        ],
+                    )
+            await _upsert_groups(conn, batch)
+            await _upsert_rollups(conn, batch)
+
+
+def _group_rows(batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """按指纹聚合一批日志，按指纹排序(多进程并发更新时加锁顺序一致，避免死锁)."""
+    groups: dict[str, dict[str, Any]] = {}
+    for row in batch:
+        fingerprint = row["fingerprint"]
+        if fingerprint is None:
+            continue
+        group = groups.get(fingerprint)
+        if group is None:
+            groups[fingerprint] = {
+                "fingerprint": fingerprint,
+                "level": row["level"],
+                "category": row["category"],
+                "message": row["message"],
+                "stack_trace": row["stack_trace"],
+                "count": 1,
+                "first_seen": row["timestamp"],
+                "last_seen": row["timestamp"],
+            }
+            continue
+        group["count"] += 1
+        group["first_seen"] = min(group["first_seen"], row["timestamp"])
+        group["last_seen"] = max(group["last_seen"], row["timestamp"])
+    return [groups[key] for key in sorted(groups)]
+
+
+async def _upsert_groups(conn: AsyncConnection, batch: list[dict[str, Any]]) -> None:
+    """在写入日志的同一事务内累加错误聚合计数."""
+    groups = _group_rows(batch)
+    if not groups:
+        return
+    table = ClientLogGroup.__table__
+    if conn.dialect.name == "postgresql":
+        stmt = pg_insert(table).values(groups)
+        earliest, latest = func.least, func.greatest
+    else:
+        stmt = sqlite_insert(table).values(groups)
+        # SQLite 的多参数 min()/max() 是标量函数
+        earliest, latest = func.min, func.max
+    excluded = stmt.excluded
+    await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.fingerprint],
+            set_={
+                "count": table.c.count + excluded.count,
+                "first_seen": earliest(table.c.first_seen, excluded.first_seen),
+                "last_seen": latest(table.c.last_seen, excluded.last_seen),
+            },
+        )
+    )
+
+
+def rollup_bucket(moment: datetime, granularity: str) -> datetime:
+    """moment 所在的分钟/小时时间桶起点."""
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+
+def _rollup_rows(batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """按 (粒度, 时间桶, 级别, 分类) 计数一批日志，按主键排序(加锁顺序一致)."""
+    counts: Counter[tuple[str, datetime, str, str]] = Counter()
+    for row in batch:
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = rollup_bucket(row["timestamp"], granularity)
+            counts[(granularity, bucket, row["level"], row["category"])] += 1
+    return [
+        {
+            "granularity": granularity,
+            "bucket": bucket,
+            "level": level,
+            "category": category,
+            "count": count,
+        }
+        for (granularity, bucket, level, category), count in sorted(counts.items())
+    ]
+
+
+async def _upsert_rollups(conn: AsyncConnection, batch: list[dict[str, Any]]) -> None:
+    """在写入日志的同一事务内累加汇总计数."""
+    rollups = _rollup_rows(batch)
+    if not rollups:
+        return
+    table = ClientLogRollup.__table__
+    if conn.dialect.name == "postgresql":
+        stmt = pg_insert(table).values(rollups)
+    else:
+        stmt = sqlite_insert(table).values(rollups)
+    await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_={"count": table.c.count + stmt.excluded.count},
+        )
+    )
+
+
+# 全局缓冲区实例
+log_ingest_buffer = LogIngestBuffer()
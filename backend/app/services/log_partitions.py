@@ -0,0 +1,576 @@
+"""
+client_logs 按时间分区.
+
+client_logs 持续增长，索引随之膨胀，按行 DELETE 清理旧日志代价巨大。
+这里按服务端接收时间(received_at)把日志切分为按月(或按天)的分区，
+清理过期日志只需删除整个分区：
+
+- PostgreSQL: client_logs 为 RANGE (received_at) 分区表，分区名如
+  client_logs_p202610；提前创建未来 log_partition_premake 个分区，
+  过期分区先 DETACH 再 DROP
+- SQLite: 每个分区是一张独立的分片表，client_logs 是 UNION ALL 各分片的视图，
+  读取方式不变；写入直接落到当前分片，首次写入某个时间段时自动建表，
+  分片表的自增 id 从已有最大 id 继续，视图中 id 全局唯一
+
+消息全文检索索引随分区一起维护：PostgreSQL 在父表上建 to_tsvector GIN 索引
+(各分区自动继承)；SQLite 每个分片带一张 FTS5(trigram)外部内容表
+<分片>_fts，由插入触发器同步，删除分片时一并删除。
+
+分区键使用服务端时间而不是客户端上报的 timestamp：客户端时钟不可信，
+按客户端时间分区会产生任意多个零散分区。
+
+从未分区的旧表迁移: PostgreSQL 由 alembic 迁移 20261024_client_log_partitions
+完成；SQLite 启动时把旧表重命名为 client_logs_legacy 并纳入视图，
+其中最新一条日志过期后整表删除。
+"""
+
+import asyncio
+import contextlib
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import (
+    Index,
+    MetaData,
+    Table,
+    delete,
+    func,
+    literal,
+    literal_column,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from ..config import settings
+from ..database import async_engine
+from ..models.client_log import ClientLog, ClientLogGroup, ClientLogRollup
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = ClientLog.__tablename__
+LEGACY_TABLE = f"{PARENT_TABLE}_legacy"
+PARTITION_PREFIX = f"{PARENT_TABLE}_p"
+_PARTITION_RE = re.compile(rf"^{PARTITION_PREFIX}(\d{{6}}|\d{{8}})$")
+
+# PostgreSQL 全文检索配置：日志中中英文混杂，不做词干化
+SEARCH_CONFIG = "simple"
+SEARCH_INDEX = "idx_message_fts"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def partition_bounds(moment: datetime, interval: str) -> tuple[datetime, datetime]:
+    """返回 moment 所在分区的 [起, 止) 时间范围(不带时区的 UTC)."""
+    if interval == "day":
+        start = datetime(moment.year, moment.month, moment.day)
+        return start, start + timedelta(days=1)
+    start = datetime(moment.year, moment.month, 1)
+    if moment.month == 12:
+        return start, datetime(moment.year + 1, 1, 1)
+    return start, datetime(moment.year, moment.month + 1, 1)
+
+
+def partition_name(start: datetime, interval: str) -> str:
+    """分区(分片)表名，如 client_logs_p202610 / client_logs_p20261019."""
+    return PARTITION_PREFIX + start.strftime("%Y%m%d" if interval == "day" else "%Y%m")
+
+
+def parse_partition_name(name: str) -> tuple[datetime, datetime] | None:
+    """从分区表名解析 [起, 止) 时间范围，不是分区表返回 None."""
+    match = _PARTITION_RE.match(name)
+    if match is None:
+        return None
+    stamp = match.group(1)
+    if len(stamp) == 8:
+        return partition_bounds(datetime.strptime(stamp, "%Y%m%d"), "day")
+    return partition_bounds(datetime.strptime(stamp, "%Y%m"), "month")
+
+
+def fts_table_name(shard: str) -> str:
+    """SQLite 分片对应的 FTS5 全文索引表名."""
+    return f"{shard}_fts"
+
+
+def message_tsvector(message: Any) -> Any:
+    """PostgreSQL 消息全文检索向量，表达式须与 GIN 索引一致才能走索引."""
+    return func.to_tsvector(literal_column(f"'{SEARCH_CONFIG}'"), message)
+
+
+def _copy_table(name: str, metadata: MetaData, **kwargs: Any) -> Table:
+    """按 ClientLog 的列与索引定义复制一张表，索引名加上表名前缀避免冲突."""
+    columns = [column._copy() for column in ClientLog.__table__.columns]
+    indexes = [
+        Index(
+            f"idx_{name}_{index.name.removeprefix('idx_')}",
+            *[column.name for column in index.columns],
+        )
+        for index in ClientLog.__table__.indexes
+        if index.name.startswith("idx_")
+    ]
+    return Table(name, metadata, *columns, *indexes, **kwargs)
+
+
+def _postgres_parent(metadata: MetaData) -> Table:
+    """PostgreSQL 分区父表：分区键必须包含在主键中."""
+    columns = []
+    for column in ClientLog.__table__.columns:
+        column = column._copy()
+        if column.name == "id":
+            column.autoincrement = True
+        elif column.name == "received_at":
+            column.primary_key = True
+            column.nullable = False
+        columns.append(column)
+    indexes = [
+        Index(index.name, *[column.name for column in index.columns])
+        for index in ClientLog.__table__.indexes
+        if index.name.startswith("idx_")
+    ]
+    indexes.append(
+        Index(
+            SEARCH_INDEX,
+            text(f"to_tsvector('{SEARCH_CONFIG}', message)"),
+            postgresql_using="gin",
+        )
+    )
+    return Table(
+        PARENT_TABLE,
+        metadata,
+        *columns,
+        *indexes,
+        postgresql_partition_by="RANGE (received_at)",
+    )
+
+
+class LogPartitionManager:
+    """client_logs 分区管理."""
+
+    def __init__(
+        self,
+        interval: str | None = None,
+        retention_days: int | None = None,
+        premake: int | None = None,
+    ):
+        """初始化分区管理器.
+
+        Args:
+            interval: 分区粒度 month / day
+            retention_days: 日志保留天数，<=0 表示不清理
+            premake: PostgreSQL 提前创建的未来分区数
+        """
+        self.interval = interval or settings.log_partition_interval
+        if self.interval not in ("month", "day"):
+            raise ValueError(f"不支持的分区粒度: {self.interval}")
+        self.retention_days = (
+            settings.log_retention_days if retention_days is None else retention_days
+        )
+        self.premake = settings.log_partition_premake if premake is None else premake
+        self._metadata = MetaData()
+        self._ensured: set[str] = set()
+        self._partitioned: bool | None = None
+
+    # ------------------------------------------------------------------
+    # 启动准备(同步，init_db 中 create_all 之前调用)
+    # ------------------------------------------------------------------
+
+    def prepare(self, conn: Connection) -> None:
+        """确保分区表结构就绪，并创建当前时间所在分区.
+
+        Args:
+            conn: 同步数据库连接(调用方负责提交)
+        """
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            self._prepare_postgres(conn)
+        elif dialect == "sqlite":
+            self._prepare_sqlite(conn)
+        else:
+            self._partitioned = False
+
+    def _prepare_postgres(self, conn: Connection) -> None:
+        if not conn.dialect.has_table(conn, PARENT_TABLE):
+            _postgres_parent(MetaData()).create(conn)
+        self._partitioned = self._is_postgres_partitioned(conn)
+        if not self._partitioned:
+            logger.warning(
+                "client_logs 尚未转换为分区表，请执行 alembic upgrade head；"
+                "在此之前不会按分区清理日志"
+            )
+            return
+        self._ensure_ahead(conn)
+
+    def _prepare_sqlite(self, conn: Connection) -> None:
+        kind = conn.execute(
+            text("SELECT type FROM sqlite_master WHERE name = :name"),
+            {"name": PARENT_TABLE},
+        ).scalar()
+        if kind == "table":
+            # 旧的未分片表：重命名后作为一个分片纳入视图(重命名为 O(1))
+            conn.execute(
+                text(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO "{LEGACY_TABLE}"')
+            )
+            logger.info(f"已将 {PARENT_TABLE} 重命名为 {LEGACY_TABLE} 并纳入分片视图")
+        self._partitioned = True
+        self._ensure_sync(conn, _utcnow())
+        # 每次启动重建视图(开销很小)，修正早先版本按缺失列名建出的视图
+        self._rebuild_sqlite_view(conn)
+        # 补齐早先创建的分片缺少的索引与全文索引(均幂等)
+        for shard in self._sqlite_shards(conn):
+            if shard != LEGACY_TABLE:
+                for index in self.table(shard).indexes:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            self._ensure_sqlite_fts(conn, shard)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def partition_start(self, moment: datetime) -> datetime:
+        """moment 所在分区的起始时间."""
+        return partition_bounds(moment, self.interval)[0]
+
+    def insert_target(self, conn: Connection, received_at: datetime) -> Table:
+        """返回 received_at 对应的写入目标表，所在分区不存在时自动创建.
+
+        PostgreSQL 写入父表，由数据库路由到分区；SQLite 写入对应的分片表。
+
+        Args:
+            conn: 同步数据库连接(异步连接通过 run_sync 调用)，处于写事务中
+            received_at: 服务端接收时间(不带时区的 UTC)
+        """
+        if self._partitioned is None:
+            self.prepare(conn)
+        if not self._partitioned:
+            return ClientLog.__table__
+        table = self._ensure_sync(conn, received_at)
+        if conn.dialect.name == "postgresql":
+            return ClientLog.__table__
+        return table
+
+    def _ensure_sync(self, conn: Connection, moment: datetime) -> Table:
+        start, end = partition_bounds(moment, self.interval)
+        name = partition_name(start, self.interval)
+        table = self.table(name)
+        if name in self._ensured:
+            return table
+        if conn.dialect.name == "postgresql":
+            conn.execute(
+                text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{PARENT_TABLE}" '
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                )
+            )
+        elif not conn.dialect.has_table(conn, name):
+            self._create_sqlite_shard(conn, table)
+        self._ensured.add(name)
+        return table
+
+    def _ensure_ahead(self, conn: Connection) -> None:
+        moment = _utcnow()
+        for _ in range(self.premake + 1):
+            self._ensure_sync(conn, moment)
+            moment = partition_bounds(moment, self.interval)[1]
+
+    def table(self, name: str) -> Table:
+        """分区(分片)表对象，列与 ClientLog 相同."""
+        table = self._metadata.tables.get(name)
+        if table is None:
+            table = _copy_table(name, self._metadata, sqlite_autoincrement=True)
+        return table
+
+    def _create_sqlite_shard(self, conn: Connection, table: Table) -> None:
+        """创建分片表，自增 id 从所有分片的最大 id 之后继续，并重建视图."""
+        shards = self._sqlite_shards(conn)
+        max_id = 0
+        for shard in shards:
+            max_id = max(
+                max_id,
+                conn.execute(text(f'SELECT max(id) FROM "{shard}"')).scalar() or 0,
+            )
+        # 多个进程可能同时跨过分区边界，建表幂等
+        conn.execute(CreateTable(table, if_not_exists=True))
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+        self._ensure_sqlite_fts(conn, table.name)
+        if max_id:
+            conn.execute(
+                text(
+                    "INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq "
+                    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+                ),
+                {"name": table.name, "seq": max_id},
+            )
+        self._rebuild_sqlite_view(conn)
+        logger.info(f"已创建客户端日志分片 {table.name}")
+
+    @staticmethod
+    def _ensure_sqlite_fts(conn: Connection, shard: str) -> None:
+        """为分片创建 FTS5 外部内容表与插入触发器.
+
+        trigram 分词支持任意子串(含中文)检索；日志只插入不更新，
+        分片整体删除，因此只需要插入触发器。已有数据的分片首次建索引时重建。
+        """
+        fts = fts_table_name(shard)
+        if conn.dialect.has_table(conn, fts):
+            return
+        conn.execute(
+            text(
+                f'CREATE VIRTUAL TABLE "{fts}" USING fts5(message, '
+                f"content='{shard}', content_rowid='id', tokenize='trigram')"
+            )
+        )
+        conn.execute(
+            text(
+                f'CREATE TRIGGER IF NOT EXISTS "{fts}_insert" AFTER INSERT ON "{shard}" '
+                f'BEGIN INSERT INTO "{fts}" (rowid, message) '
+                f"VALUES (new.id, new.message); END"
+            )
+        )
+        conn.execute(text(f'INSERT INTO "{fts}" ("{fts}") VALUES (\'rebuild\')'))
+
+    def _sqlite_shards(self, conn: Connection) -> list[str]:
+        names = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table'")
+        ).scalars()
+        return sorted(
+            name
+            for name in names
+            if name == LEGACY_TABLE or parse_partition_name(name) is not None
+        )
+
+    def _rebuild_sqlite_view(self, conn: Connection) -> None:
+        selects = [
+            f'SELECT {self._sqlite_shard_columns(conn, shard)} FROM "{shard}"'
+            for shard in self._sqlite_shards(conn)
+        ]
+        conn.execute(text(f'DROP VIEW IF EXISTS "{PARENT_TABLE}"'))
+        conn.execute(
+            text(
+                f'CREATE VIEW IF NOT EXISTS "{PARENT_TABLE}" AS '
+                + " UNION ALL ".join(selects)
+            )
+        )
+
+    @staticmethod
+    def _sqlite_shard_columns(conn: Connection, shard: str) -> str:
+        """分片在视图中的选择列表，分片缺少的列(如旧表没有 fingerprint)选 NULL.
+
+        SQLite 把无法解析的双引号标识符当作字符串字面量，直接选缺失的列
+        会让每一行都返回列名本身。
+        """
+        existing = {
+            row[1] for row in conn.execute(text(f'PRAGMA table_info("{shard}")'))
+        }
+        return ", ".join(
+            f'"{column.name}"'
+            if column.name in existing
+            else f'NULL AS "{column.name}"'
+            for column in ClientLog.__table__.columns
+        )
+
+    @staticmethod
+    def _is_postgres_partitioned(conn: Connection) -> bool:
+        return bool(
+            conn.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table pt "
+                    "JOIN pg_class c ON c.oid = pt.partrelid "
+                    "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+                ),
+                {"name": PARENT_TABLE},
+            ).scalar()
+        )
+
+    # ------------------------------------------------------------------
+    # 维护：创建未来分区、删除过期分区
+    # ------------------------------------------------------------------
+
+    def list_partitions(self, conn: Connection) -> list[str]:
+        """列出现有分区(分片)表名."""
+        if conn.dialect.name == "sqlite":
+            return self._sqlite_shards(conn)
+        names = conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :name"
+            ),
+            {"name": PARENT_TABLE},
+        ).scalars()
+        return sorted(names)
+
+    def drop_expired(self, conn: Connection, cutoff: datetime) -> list[str]:
+        """删除结束时间不晚于 cutoff 的分区.
+
+        Args:
+            conn: 同步数据库连接
+            cutoff: 截止时间(不带时区的 UTC)
+
+        Returns:
+            已删除的分区名
+        """
+        if not self._partitioned:
+            return []
+        dropped = []
+        for name in self.list_partitions(conn):
+            if name == LEGACY_TABLE:
+                latest = conn.execute(
+                    text(f'SELECT max(received_at) FROM "{LEGACY_TABLE}"')
+                ).scalar()
+                if latest is not None and latest >= cutoff.isoformat(sep=" "):
+                    continue
+            else:
+                bounds = parse_partition_name(name)
+                if bounds is None or bounds[1] > cutoff:
+                    continue
+            if conn.dialect.name == "postgresql":
+                conn.execute(
+                    text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"')
+                )
+            else:
+                conn.execute(text(f'DROP TABLE IF EXISTS "{fts_table_name(name)}"'))
+            conn.execute(text(f'DROP TABLE "{name}"'))
+            self._ensured.discard(name)
+            self._metadata.remove(self.table(name))
+            dropped.append(name)
+        if dropped and conn.dialect.name == "sqlite":
+            # 视图中至少保留当前分片
+            self._ensure_sync(conn, _utcnow())
+            self._rebuild_sqlite_view(conn)
+        return dropped
+
+    def _maintain(self, conn: Connection) -> dict[str, Any]:
+        if self._partitioned is None:
+            self.prepare(conn)
+        if conn.dialect.name == "postgresql" and self._partitioned:
+            self._ensure_ahead(conn)
+        report: dict[str, Any] = {
+            "dropped_partitions": [],
+            "deleted_groups": 0,
+            "deleted_rollups": 0,
+        }
+        now = _utcnow()
+        if settings.log_rollup_minute_days > 0:
+            # 分钟级汇总只用于近期的细粒度图表，保留期短于原始日志
+            result = conn.execute(
+                delete(ClientLogRollup).where(
+                    ClientLogRollup.granularity == "minute",
+                    ClientLogRollup.bucket
+                    < now - timedelta(days=settings.log_rollup_minute_days),
+                )
+            )
+            report["deleted_rollups"] += result.rowcount
+        if self.retention_days <= 0:
+            return report
+        cutoff = now - timedelta(days=self.retention_days)
+        report["dropped_partitions"] = self.drop_expired(conn, cutoff)
+        # 聚合表很小，直接按最近出现时间删除过期的错误分组与小时汇总
+        result = conn.execute(
+            delete(ClientLogGroup).where(ClientLogGroup.last_seen < cutoff)
+        )
+        report["deleted_groups"] = result.rowcount
+        result = conn.execute(
+            delete(ClientLogRollup).where(
+                ClientLogRollup.granularity == "hour", ClientLogRollup.bucket < cutoff
+            )
+        )
+        report["deleted_rollups"] += result.rowcount
+        return report
+
+    async def run_once(self) -> dict[str, Any]:
+        """执行一次分区维护.
+
+        Returns:
+            删除的分区名、过期错误分组数与过期汇总行数
+        """
+        async with async_engine.begin() as conn:
+            report = await conn.run_sync(self._maintain)
+        if report["dropped_partitions"]:
+            logger.info(f"已删除过期客户端日志分区: {report['dropped_partitions']}")
+        return report
+
+    def _row_counts(self, conn: Connection) -> dict[str, int]:
+        if conn.dialect.name == "postgresql":
+            # 大分区 count(*) 代价高，使用统计信息中的估算行数
+            rows = conn.execute(
+                text(
+                    "SELECT c.relname, GREATEST(c.reltuples, 0)::bigint FROM pg_inherits i "
+                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                    "JOIN pg_class p ON p.oid = i.inhparent "
+                    "WHERE p.relname = :name ORDER BY c.relname"
+                ),
+                {"name": PARENT_TABLE},
+            )
+            return dict(rows.all())
+        names = self.list_partitions(conn)
+        if not names:
+            return {}
+        # 合并为一条语句，各分片在同一快照中计数
+        counts = union_all(
+            *(
+                select(literal(name), func.count()).select_from(self.table(name))
+                for name in names
+            )
+        )
+        return dict(conn.execute(counts).all())
+
+    async def stats(self) -> dict[str, Any]:
+        """返回分区列表与各分区行数(PostgreSQL 为估算值)."""
+        for attempt in range(3):
+            try:
+                async with async_engine.connect() as conn:
+                    counts = await conn.run_sync(self._row_counts)
+                break
+            except DBAPIError:
+                # 列出分区后分区被并发删除(维护任务)，重新列出
+                if attempt == 2:
+                    raise
+        return {"interval": self.interval, "partitions": counts}
+
+
+class LogPartitionScheduler:
+    """按 settings.log_maintenance_interval 周期执行分区维护的后台任务."""
+
+    def __init__(self, manager: LogPartitionManager):
+        """初始化调度器.
+
+        Args:
+            manager: 分区管理器
+        """
+        self.manager = manager
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """在当前事件循环中启动."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台维护."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.manager.run_once()
+            except Exception as e:  # 后台循环不能因单次异常退出
+                logger.error(f"客户端日志分区维护异常: {e}")
+            await asyncio.sleep(settings.log_maintenance_interval)
+
+
+# 全局实例
+log_partition_manager = LogPartitionManager()
+log_partition_scheduler = LogPartitionScheduler(log_partition_manager)
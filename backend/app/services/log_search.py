@@ -0,0 +1,233 @@
+"""
+客户端日志检索.
+
+按级别/分类/标签/客户端时间过滤并全文检索消息，按 (timestamp, id) 倒序键集分页，
+翻页开销与页码无关：
+- PostgreSQL: 在分区父表上查询，各分区按 timestamp 索引有序扫描后归并(Merge Append)；
+  消息检索使用 to_tsvector GIN 索引，q 按 websearch_to_tsquery 语法解析(按词匹配)
+- SQLite: 在每个分片上各取一页再归并，不经过 UNION ALL 视图整体排序；
+  消息检索使用分片的 FTS5 trigram 索引(子串匹配)，不足 3 个字符时退化为 LIKE
+
+标签存储为 JSON 数组字符串，标签过滤只在上述条件筛出的行上逐行匹配。
+
+导出(stream_logs)使用相同的过滤条件，通过服务端游标按批读取，内存占用与导出范围无关。
+"""
+
+import base64
+import json
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import (
+    Table,
+    and_,
+    bindparam,
+    func,
+    literal_column,
+    or_,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.client_log import ClientLog
+from .log_partitions import (
+    SEARCH_CONFIG,
+    fts_table_name,
+    log_partition_manager,
+    message_tsvector,
+)
+
+# trigram 分词的最短可索引查询长度
+FTS_MIN_QUERY_CHARS = 3
+
+
+@dataclass(frozen=True)
+class LogCursor:
+    """键集分页游标: 上一页最后一条日志的 (timestamp, id)."""
+
+    timestamp: datetime
+    id: int
+
+    def encode(self) -> str:
+        """编码为 URL 安全的不透明字符串."""
+        raw = f"{self.timestamp.isoformat()}|{self.id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "LogCursor":
+        """解析游标字符串.
+
+        Raises:
+            ValueError: 游标格式不正确
+        """
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            timestamp, log_id = base64.urlsafe_b64decode(padded).decode().split("|")
+            return cls(datetime.fromisoformat(timestamp), int(log_id))
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"无效的分页游标: {token}") from e
+
+
+@dataclass(frozen=True)
+class LogQuery:
+    """日志检索条件."""
+
+    level: str | None = None
+    category: str | None = None
+    tag: str | None = None
+    since: datetime | None = None  # 客户端时间下界(含)
+    until: datetime | None = None  # 客户端时间上界(不含)
+    q: str | None = None  # 消息全文检索
+
+
+@dataclass
+class LogPage:
+    """一页检索结果."""
+
+    items: list[Any] = field(default_factory=list)
+    next_cursor: LogCursor | None = None
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _conditions(
+    table: Table, query: LogQuery, after: LogCursor | None, dialect: str
+) -> list[Any]:
+    """构造单张表(分区父表或 SQLite 分片)上的过滤条件."""
+    conditions = []
+    if query.level is not None:
+        conditions.append(table.c.level == query.level)
+    if query.category is not None:
+        conditions.append(table.c.category == query.category)
+    if query.since is not None:
+        conditions.append(table.c.timestamp >= query.since)
+    if query.until is not None:
+        conditions.append(table.c.timestamp < query.until)
+    if after is not None:
+        conditions.append(
+            or_(
+                table.c.timestamp < after.timestamp,
+                and_(table.c.timestamp == after.timestamp, table.c.id < after.id),
+            )
+        )
+    if query.tag:
+        # tags 为 json.dumps 的字符串数组，按带引号的元素匹配
+        pattern = f"%{_escape_like(json.dumps(query.tag))}%"
+        conditions.append(table.c.tags.like(pattern, escape="\\"))
+    if query.q:
+        conditions.append(_match_message(table, query.q, dialect))
+    return conditions
+
+
+def _match_message(table: Table, q: str, dialect: str) -> Any:
+    if dialect == "postgresql":
+        return message_tsvector(table.c.message).bool_op("@@")(
+            func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), q)
+        )
+    if dialect == "sqlite" and len(q) >= FTS_MIN_QUERY_CHARS:
+        fts = fts_table_name(table.name)
+        # 整个查询作为一个短语：trigram 下即子串匹配
+        phrase = '"' + q.replace('"', '""') + '"'
+        match = text(f'"{fts}" MATCH :phrase').bindparams(
+            bindparam("phrase", phrase, unique=True)
+        )
+        return table.c.id.in_(
+            select(literal_column("rowid")).select_from(text(f'"{fts}"')).where(match)
+        )
+    return table.c.message.like(f"%{_escape_like(q)}%", escape="\\")
+
+
+def _ordered(table: Table) -> list[Any]:
+    return [table.c.timestamp.desc(), table.c.id.desc()]
+
+
+async def search_logs(
+    db: AsyncSession,
+    query: LogQuery,
+    after: LogCursor | None = None,
+    limit: int = 50,
+) -> LogPage:
+    """按条件检索客户端日志，按 (timestamp, id) 倒序键集分页.
+
+    Args:
+        db: 数据库会话
+        query: 检索条件(时间为不带时区的 UTC)
+        after: 上一页返回的游标
+        limit: 单页条数
+
+    Returns:
+        一页日志行(列同 ClientLog)与下一页游标
+    """
+    conn = await db.connection()
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        # 每个分片按索引各取 limit + 1 条，外层归并后再截取
+        shards = await conn.run_sync(log_partition_manager.list_partitions)
+        pages = []
+        for shard in shards:
+            table = log_partition_manager.table(shard)
+            pages.append(
+                select(table)
+                .where(*_conditions(table, query, after, dialect))
+                .order_by(*_ordered(table))
+                .limit(limit + 1)
+                .subquery()
+            )
+        merged = union_all(*(select(page) for page in pages)).subquery()
+        statement = select(merged).order_by(*_ordered(merged)).limit(limit + 1)
+    else:
+        table = ClientLog.__table__
+        statement = (
+            select(table)
+            .where(*_conditions(table, query, after, dialect))
+            .order_by(*_ordered(table))
+            .limit(limit + 1)
+        )
+
+    rows = (await db.execute(statement)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = LogCursor(rows[-1].timestamp, rows[-1].id)
+    return LogPage(items=rows, next_cursor=next_cursor)
+
+
+async def stream_logs(
+    db: AsyncSession, query: LogQuery, batch_size: int = 1000
+) -> AsyncIterator[Any]:
+    """按条件流式读取客户端日志(服务端游标，每批 batch_size 行).
+
+    PostgreSQL 整体按 (timestamp, id) 升序；SQLite 按分片(接收时间)先后依次读取，
+    分片内按 (timestamp, id) 升序，避免对 UNION ALL 视图整体排序。
+
+    Args:
+        db: 数据库会话
+        query: 检索条件(时间为不带时区的 UTC)
+        batch_size: 每次从游标读取的行数
+
+    Yields:
+        日志行(列同 ClientLog)
+    """
+    conn = await db.connection()
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        shards = await conn.run_sync(log_partition_manager.list_partitions)
+        tables = [log_partition_manager.table(shard) for shard in shards]
+    else:
+        tables = [ClientLog.__table__]
+    for table in tables:
+        statement = (
+            select(table)
+            .where(*_conditions(table, query, None, dialect))
+            .order_by(table.c.timestamp, table.c.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream(statement)
+        async for row in result:
+            yield row
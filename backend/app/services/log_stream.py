@@ -0,0 +1,168 @@
+"""
+NDJSON 日志流解析.
+
+客户端可以把大量日志以 NDJSON(每行一条 LogEntrySchema JSON)形式放在请求体中
+流式上传，并可用 gzip / zstd 压缩(Content-Encoding)。这里边接收边解压、
+按行切分，不把整个请求体读入内存：
+- 解压输出按固定大小分段产生，压缩比极高的输入也不会一次性展开
+- 单行超过 max_line_bytes 时丢弃该行(计为无效行)，内存占用有上界
+"""
+
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Iterator
+
+import zstandard
+
+# 单次解压输出的最大字节数
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+# zstd 解压对象没有输出上限参数，按小段输入限制单次展开的大小：
+# zstd 最大压缩比约 32000:1，256 字节输入单次最多展开约 8MB
+ZSTD_INPUT_STEP = 256
+
+
+class UnsupportedEncodingError(ValueError):
+    """不支持的 Content-Encoding."""
+
+
+class CorruptStreamError(ValueError):
+    """压缩数据损坏或不完整."""
+
+
+class _IdentityDecoder:
+    """未压缩的请求体."""
+
+    def decode(self, data: bytes) -> Iterator[bytes]:
+        yield data
+
+    def finish(self) -> None:
+        pass
+
+
+class _GzipDecoder:
+    """gzip 增量解压，单次输出不超过 DECOMPRESS_CHUNK_SIZE."""
+
+    def __init__(self):
+        # wbits=47 (32 + 15): 自动识别 gzip / zlib 头
+        self._obj = zlib.decompressobj(wbits=47)
+        self._fed = False
+
+    def decode(self, data: bytes) -> Iterator[bytes]:
+        while data or (self._fed and not self._obj.eof):
+            if self._obj.eof:
+                # 多个 gzip 成员首尾相接(如客户端分段追加压缩)
+                self._obj = zlib.decompressobj(wbits=47)
+            self._fed = True
+            try:
+                chunk = self._obj.decompress(data, DECOMPRESS_CHUNK_SIZE)
+            except zlib.error as e:
+                raise CorruptStreamError(str(e)) from e
+            yield chunk
+            data = self._obj.unused_data if self._obj.eof else self._obj.unconsumed_tail
+            # 输出达到上限时 zlib 内部可能仍有待输出的数据，继续取出
+            if not data and len(chunk) < DECOMPRESS_CHUNK_SIZE:
+                break
+
+    def finish(self) -> None:
+        if self._fed and not self._obj.eof:
+            raise CorruptStreamError("gzip 数据不完整")
+
+
+class _ZstdDecoder:
+    """zstd 增量解压，支持多个 frame 首尾相接."""
+
+    def __init__(self):
+        self._dctx = zstandard.ZstdDecompressor()
+        self._obj = self._new_obj()
+        self._fed = False
+
+    def _new_obj(self):
+        return self._dctx.decompressobj(write_size=DECOMPRESS_CHUNK_SIZE)
+
+    def decode(self, data: bytes) -> Iterator[bytes]:
+        for start in range(0, len(data), ZSTD_INPUT_STEP):
+            piece = data[start : start + ZSTD_INPUT_STEP]
+            while piece:
+                if self._obj.eof:
+                    self._obj = self._new_obj()
+                self._fed = True
+                try:
+                    yield self._obj.decompress(piece)
+                except zstandard.ZstdError as e:
+                    raise CorruptStreamError(str(e)) from e
+                piece = self._obj.unused_data if self._obj.eof else b""
+
+    def finish(self) -> None:
+        if self._fed and not self._obj.eof:
+            raise CorruptStreamError("zstd 数据不完整")
+
+
+def make_decoder(content_encoding: str | None):
+    """按 Content-Encoding 创建增量解压器(decode 逐段产出解压数据，finish 校验完整性).
+
+    Raises:
+        UnsupportedEncodingError: 不支持的编码
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return _IdentityDecoder()
+    if encoding in ("gzip", "x-gzip"):
+        return _GzipDecoder()
+    if encoding == "zstd":
+        return _ZstdDecoder()
+    raise UnsupportedEncodingError(f"不支持的 Content-Encoding: {content_encoding}")
+
+
+async def iter_lines(
+    chunks: AsyncIterable[bytes],
+    content_encoding: str | None,
+    max_line_bytes: int,
+) -> AsyncIterator[bytes | None]:
+    """把(压缩的)字节流解压并切分为行.
+
+    Args:
+        chunks: 请求体字节流
+        content_encoding: 请求头 Content-Encoding
+        max_line_bytes: 单行最大字节数
+
+    Yields:
+        去掉换行符的非空行；超长的行以 None 代替
+
+    Raises:
+        UnsupportedEncodingError: 不支持的编码
+        CorruptStreamError: 压缩数据损坏或不完整
+    """
+    decoder = make_decoder(content_encoding)
+    pending = bytearray()
+    skipping = False  # 当前行已超长，丢弃到下一个换行符
+
+    async for chunk in chunks:
+        for data in decoder.decode(chunk):
+            start = 0
+            while True:
+                end = data.find(b"\n", start)
+                if end < 0:
+                    if not skipping:
+                        pending += data[start:]
+                        if len(pending) > max_line_bytes:
+                            pending.clear()
+                            skipping = True
+                            yield None
+                    break
+                if skipping:
+                    skipping = False
+                else:
+                    pending += data[start:end]
+                    if len(pending) > max_line_bytes:
+                        yield None
+                    elif pending.strip():
+                        yield bytes(pending)
+                    pending.clear()
+                start = end + 1
+
+    decoder.finish()
+    if not skipping and pending.strip():
+        if len(pending) > max_line_bytes:
+            yield None
+        else:
+            yield bytes(pending)
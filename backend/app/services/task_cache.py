@@ -0,0 +1,225 @@
+"""
+任务终态缓存.
+
+任务一旦进入终态(completed 且已有输出文件名 / failed)就不会再变化，
+客户端对已完成任务的重复轮询无需再查数据库。这里按 (任务类型, prompt_id)
+缓存终态的不可变快照，进程内 LRU 淘汰。
+
+写入方式为 write-through：服务在状态迁移到终态时写入缓存。
+终态记录被删除或改写(如清理任务)时调用 publish_invalidation：
+本进程立即失效；配置 task_cache_invalidation 且使用 PostgreSQL 时，
+同时在同一事务内发出 NOTIFY，其他 worker 进程通过 LISTEN 收到后失效。
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import to_async_url
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL NOTIFY 频道名
+INVALIDATION_CHANNEL = "task_cache_invalidate"
+
+
+@dataclass(frozen=True)
+class TerminalTaskState:
+    """任务终态快照."""
+
+    kind: str  # t2i / i2v
+    prompt_id: str
+    status: str  # completed / failed
+    filename: str | None = None
+    error_message: str | None = None
+
+
+class TaskStateCache:
+    """线程安全的任务终态 LRU 缓存."""
+
+    def __init__(self, max_size: int):
+        """初始化缓存.
+
+        Args:
+            max_size: 最多缓存的任务数，<=0 表示禁用缓存
+        """
+        self.max_size = max_size
+        self._items: OrderedDict[tuple[str, str], TerminalTaskState] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, prompt_id: str) -> TerminalTaskState | None:
+        """读取终态，未命中返回 None."""
+        key = (kind, prompt_id)
+        with self._lock:
+            state = self._items.get(key)
+            if state is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return state
+
+    def put_task(self, kind: str, task) -> None:
+        """任务处于终态时写入缓存，非终态忽略.
+
+        Args:
+            kind: 任务类型 t2i / i2v
+            task: Text2ImgTask 或 ImageToVideoTask
+        """
+        filename = task.filename if kind == "t2i" else task.video_filename
+        if task.status == "completed" and filename:
+            self.put(TerminalTaskState(kind, task.prompt_id, "completed", filename))
+        elif task.status == "failed":
+            self.put(
+                TerminalTaskState(
+                    kind, task.prompt_id, "failed", error_message=task.error_message
+                )
+            )
+
+    def put(self, state: TerminalTaskState) -> None:
+        """写入终态快照."""
+        if self.max_size <= 0:
+            return
+        key = (state.kind, state.prompt_id)
+        with self._lock:
+            self._items[key] = state
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, kind: str, prompt_ids: Iterable[str]) -> None:
+        """使指定任务的缓存失效."""
+        with self._lock:
+            for prompt_id in prompt_ids:
+                self._items.pop((kind, prompt_id), None)
+
+    def clear(self) -> None:
+        """清空缓存."""
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict[str, int]:
+        """返回缓存统计."""
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# 全局缓存实例
+task_cache = TaskStateCache(settings.task_cache_size)
+
+
+def _notify_enabled(db: AsyncSession) -> bool:
+    return (
+        settings.task_cache_invalidation and db.get_bind().dialect.name == "postgresql"
+    )
+
+
+async def publish_invalidation(
+    db: AsyncSession, kind: str, prompt_ids: list[str]
+) -> None:
+    """失效指定任务的缓存，并通知其他 worker 进程.
+
+    NOTIFY 随调用方事务提交后才会投递；调用方需要自行 commit。
+
+    Args:
+        db: 数据库会话
+        kind: 任务类型 t2i / i2v
+        prompt_ids: 任务ID列表
+    """
+    if not prompt_ids:
+        return
+    task_cache.invalidate(kind, prompt_ids)
+    if not _notify_enabled(db):
+        return
+    # NOTIFY 负载上限约 8000 字节，分批发送
+    for start in range(0, len(prompt_ids), 100):
+        payload = json.dumps({"kind": kind, "ids": prompt_ids[start : start + 100]})
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": INVALIDATION_CHANNEL, "payload": payload},
+        )
+
+
+class TaskCacheInvalidationListener:
+    """监听 PostgreSQL NOTIFY，收到其他进程的失效通知后清理本地缓存."""
+
+    def __init__(self, reconnect_interval: float = 5.0):
+        """初始化监听器.
+
+        Args:
+            reconnect_interval: 连接断开后的重连间隔(秒)
+        """
+        self.reconnect_interval = reconnect_interval
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """在当前事件循环中启动监听(未开启或非 PostgreSQL 时不启动)."""
+        if not settings.task_cache_invalidation:
+            return
+        if make_url(settings.database_url).get_backend_name() != "postgresql":
+            logger.warning("task_cache_invalidation 仅支持 PostgreSQL，已忽略")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止监听."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        import asyncpg
+
+        dsn = (
+            make_url(to_async_url(settings.database_url))
+            .set(drivername="postgresql")
+            .render_as_string(hide_password=False)
+        )
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(INVALIDATION_CHANNEL, self._on_notify)
+                # 断线期间可能漏掉通知，(重)连接成功后先清空本地缓存
+                task_cache.clear()
+                logger.info("任务缓存失效监听已启动")
+                while not connection.is_closed():
+                    await asyncio.sleep(self.reconnect_interval)
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning(f"任务缓存失效监听连接失败: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            task_cache.clear()
+            await asyncio.sleep(self.reconnect_interval)
+
+    @staticmethod
+    def _on_notify(_connection, _pid: int, _channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            task_cache.invalidate(message["kind"], message["ids"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"无法解析任务缓存失效通知: {e}")
+
+
+invalidation_listener = TaskCacheInvalidationListener()
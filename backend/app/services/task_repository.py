@@ -0,0 +1,285 @@
+"""
+任务表扫描仓库.
+
+为对账、清理、管理列表等批量场景提供按 (created_at, id) 键集分页的任务扫描，
+每页查询都落在任务表的复合索引上，不随表增长退化为全表扫描：
+- 按状态/时间范围: idx_<table>_status_created
+- 按模型:         idx_<table>_model_status
+- pending/超时:   idx_<table>_pending_created(部分索引)
+- 历史列表:       idx_<table>_listing(覆盖索引，只读索引不回表)
+
+游标编码为不透明字符串，可直接返回给客户端用于翻页。
+"""
+
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import and_, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.text2img import ImageToVideoTask, Text2ImgTask
+
+# 任务类型 -> 模型
+TASK_MODELS: dict[str, Any] = {"t2i": Text2ImgTask, "i2v": ImageToVideoTask}
+
+# 单页最大条数
+MAX_PAGE_SIZE = 500
+
+
+@dataclass(frozen=True)
+class TaskCursor:
+    """键集分页游标: 上一页最后一条记录的 (created_at, id).
+
+    跨任务类型的历史列表中 id 可能重复，额外带上任务类型作为排序键。
+    """
+
+    created_at: datetime
+    id: int
+    kind: str | None = None
+
+    def encode(self) -> str:
+        """编码为 URL 安全的不透明字符串."""
+        parts = [self.created_at.isoformat(), str(self.id)]
+        if self.kind is not None:
+            parts.append(self.kind)
+        raw = "|".join(parts).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "TaskCursor":
+        """解析游标字符串.
+
+        Raises:
+            ValueError: 游标格式不正确
+        """
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            created_at, task_id, *rest = (
+                base64.urlsafe_b64decode(padded).decode().split("|")
+            )
+            kind = rest[0] if rest else None
+            if kind is not None and kind not in TASK_MODELS:
+                raise ValueError(kind)
+            return cls(datetime.fromisoformat(created_at), int(task_id), kind)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"无效的分页游标: {token}") from e
+
+
+@dataclass(frozen=True)
+class TaskHistoryRow:
+    """历史列表中的一条任务(只含覆盖索引中的列)."""
+
+    kind: str
+    id: int
+    prompt_id: str
+    status: str
+    model_name: str
+    created_at: datetime
+
+
+@dataclass
+class TaskPage:
+    """一页扫描结果."""
+
+    items: list[Any] = field(default_factory=list)
+    next_cursor: TaskCursor | None = None
+
+
+class TaskRepository:
+    """任务表扫描仓库."""
+
+    def __init__(self, db: AsyncSession):
+        """初始化仓库.
+
+        Args:
+            db: 数据库会话
+        """
+        self.db = db
+
+    async def scan(
+        self,
+        kind: str,
+        status: str | None = None,
+        model_name: str | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        after: TaskCursor | None = None,
+        limit: int = 100,
+    ) -> TaskPage:
+        """按条件键集分页扫描任务，按 (created_at, id) 升序.
+
+        Args:
+            kind: 任务类型 t2i / i2v
+            status: 任务状态过滤
+            model_name: 模型名称过滤
+            created_after: 创建时间下界(含)
+            created_before: 创建时间上界(不含)
+            after: 上一页返回的游标
+            limit: 单页条数(最大 MAX_PAGE_SIZE)
+
+        Returns:
+            当前页任务与下一页游标(没有更多数据时为 None)
+        """
+        model = TASK_MODELS[kind]
+        conditions = []
+        if status == "pending":
+            conditions.append(self._pending_condition(model))
+        elif status is not None:
+            conditions.append(model.status == status)
+        if model_name is not None:
+            conditions.append(model.model_name == model_name)
+        if created_after is not None:
+            conditions.append(model.created_at >= created_after)
+        if created_before is not None:
+            conditions.append(model.created_at < created_before)
+        return await self._page(model, conditions, after, limit)
+
+    async def scan_pending(
+        self, kind: str, after: TaskCursor | None = None, limit: int = 100
+    ) -> TaskPage:
+        """扫描 pending 任务(走 pending 部分索引)."""
+        return await self.scan(kind, status="pending", after=after, limit=limit)
+
+    async def scan_stale(
+        self,
+        kind: str,
+        older_than: timedelta,
+        after: TaskCursor | None = None,
+        limit: int = 100,
+    ) -> TaskPage:
+        """扫描创建超过 older_than 仍未结束的任务(用于对账/超时处理)."""
+        return await self.scan(
+            kind,
+            status="pending",
+            created_before=datetime.now(timezone.utc) - older_than,
+            after=after,
+            limit=limit,
+        )
+
+    async def list_history(
+        self,
+        kinds: list[str],
+        status: str | None = None,
+        model_name: str | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        after: TaskCursor | None = None,
+        limit: int = 50,
+    ) -> TaskPage:
+        """任务历史列表，按 (created_at, kind, id) 倒序键集分页.
+
+        只查询列表覆盖索引中的列，数据库只读索引即可返回；多个任务类型
+        各取 limit+1 条后在内存中归并。
+
+        Args:
+            kinds: 任务类型列表(t2i / i2v)
+            status: 任务状态过滤
+            model_name: 模型名称过滤
+            created_after: 创建时间下界(含)
+            created_before: 创建时间上界(不含)
+            after: 上一页返回的游标
+            limit: 单页条数(最大 MAX_PAGE_SIZE)
+
+        Returns:
+            当前页(TaskHistoryRow 列表)与下一页游标
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        rows: list[TaskHistoryRow] = []
+        for kind in kinds:
+            model = TASK_MODELS[kind]
+            conditions = []
+            if status is not None:
+                conditions.append(model.status == status)
+            if model_name is not None:
+                conditions.append(model.model_name == model_name)
+            if created_after is not None:
+                conditions.append(model.created_at >= created_after)
+            if created_before is not None:
+                conditions.append(model.created_at < created_before)
+            if after is not None:
+                conditions.append(self._before_cursor(model, kind, after))
+
+            result = await self.db.execute(
+                select(
+                    model.id,
+                    model.prompt_id,
+                    model.status,
+                    model.model_name,
+                    model.created_at,
+                )
+                .where(*conditions)
+                .order_by(model.created_at.desc(), model.id.desc())
+                .limit(limit + 1)
+            )
+            rows.extend(
+                TaskHistoryRow(
+                    kind=kind,
+                    id=row.id,
+                    prompt_id=row.prompt_id,
+                    status=row.status,
+                    model_name=row.model_name,
+                    created_at=row.created_at,
+                )
+                for row in result
+            )
+
+        rows.sort(key=lambda row: (row.created_at, row.kind, row.id), reverse=True)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = TaskCursor(last.created_at, last.id, last.kind)
+        return TaskPage(items=rows, next_cursor=next_cursor)
+
+    @staticmethod
+    def _before_cursor(model: Any, kind: str, cursor: TaskCursor) -> Any:
+        """倒序翻页条件: (created_at, kind, id) < 游标.
+
+        同一张表内 kind 为常量，按与游标 kind 的大小关系化简为索引可用的条件。
+        """
+        cursor_kind = cursor.kind or kind
+        if kind < cursor_kind:
+            return model.created_at <= cursor.created_at
+        if kind > cursor_kind:
+            return model.created_at < cursor.created_at
+        return or_(
+            model.created_at < cursor.created_at,
+            and_(model.created_at == cursor.created_at, model.id < cursor.id),
+        )
+
+    @staticmethod
+    def _pending_condition(model: Any) -> Any:
+        # 以字面量而非绑定参数比较：SQLite 只有在查询条件与部分索引条件一致时
+        # 才会使用部分索引；PostgreSQL 的通用执行计划同理
+        return model.status == literal_column("'pending'")
+
+    async def _page(
+        self,
+        model: Any,
+        conditions: list[Any],
+        after: TaskCursor | None,
+        limit: int,
+    ) -> TaskPage:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        if after is not None:
+            conditions.append(
+                or_(
+                    model.created_at > after.created_at,
+                    and_(model.created_at == after.created_at, model.id > after.id),
+                )
+            )
+        query = (
+            select(model)
+            .where(*conditions)
+            .order_by(model.created_at, model.id)
+            .limit(limit + 1)
+        )
+        rows = list(await self.db.scalars(query))
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = TaskCursor(rows[-1].created_at, rows[-1].id)
+        return TaskPage(items=rows, next_cursor=next_cursor)
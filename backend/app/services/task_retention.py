@@ -0,0 +1,368 @@
+"""
+任务保留策略.
+
+text2img_task / image_to_video_task 及其生成结果会无限增长。这里按状态配置
+保留天数，定期清理过期任务：
+
+1. 按 (status, created_at) 索引分批取出过期任务，每批一个独立的短事务，
+   不会长时间持有锁，也不会一次性膨胀 WAL/undo
+2. 可选：删除前把整行归档为 NDJSON(gzip)，便于事后追溯
+3. 同一事务内删除对应的生成队列记录，并失效任务终态缓存
+4. 删除本地缓存的缩略图、过期联系表，以及 ComfyUI 上的 history 记录
+5. 汇总回收的行数与磁盘空间
+
+dry_run 只按相同条件扫描并统计将要删除的任务与缓存，不归档也不删除。
+
+删除释放的空间由数据库复用(PostgreSQL autovacuum / SQLite 空闲页)，
+持续写入下表与索引大小保持稳定。
+"""
+
+import asyncio
+import contextlib
+import gzip
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import requests
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import ASYNC_SESSION_LOCAL
+from ..exceptions import ComfyUIUnavailableError
+from ..models.generation_job import GenerationJob
+from ..models.text2img import Text2ImgBatch
+from .comfyui_transport import get_comfyui_transport
+from .contact_sheet_service import contact_sheet_service
+from .task_cache import publish_invalidation
+from .task_repository import TASK_MODELS, TaskRepository
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionReport:
+    """一次清理的统计结果."""
+
+    started_at: str
+    dry_run: bool = False
+    duration_ms: float = 0.0
+    deleted: dict[str, dict[str, int]] = field(default_factory=dict)
+    deleted_batches: int = 0
+    archived: int = 0
+    media_files: int = 0
+    media_bytes: int = 0
+    comfyui_history_deleted: int = 0
+
+    def add_deleted(self, kind: str, status: str, count: int) -> None:
+        """累加删除的任务行数."""
+        by_status = self.deleted.setdefault(kind, {})
+        by_status[status] = by_status.get(status, 0) + count
+
+    def to_dict(self) -> dict[str, Any]:
+        """转换为可序列化的字典."""
+        return asdict(self)
+
+
+class TaskRetentionService:
+    """任务保留策略服务类."""
+
+    def __init__(self, archive_dir: str | Path | None = None):
+        """初始化保留策略服务.
+
+        Args:
+            archive_dir: 归档目录，默认 settings.task_retention_archive_dir，
+                为空表示不归档直接删除
+        """
+        archive_dir = archive_dir or settings.task_retention_archive_dir
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.batch_size = max(1, settings.task_retention_batch_size)
+        self._lock = asyncio.Lock()
+
+    def ttl_by_status(self) -> dict[str, int]:
+        """各状态的保留天数(<=0 表示该状态不清理)."""
+        return {
+            "completed": settings.task_retention_completed_days,
+            "failed": settings.task_retention_failed_days,
+            "pending": settings.task_retention_pending_days,
+        }
+
+    async def run_once(self, dry_run: bool = False) -> RetentionReport:
+        """执行一次清理(同一进程内不会并发执行).
+
+        Args:
+            dry_run: 只统计将要删除的任务与缓存，不归档也不删除
+
+        Returns:
+            清理统计(dry_run 时为将要删除的数量)
+        """
+        async with self._lock:
+            started = time.perf_counter()
+            now = datetime.now(timezone.utc)
+            report = RetentionReport(started_at=now.isoformat(), dry_run=dry_run)
+            archive_stamp = now.strftime("%Y%m%dT%H%M%S")
+
+            for kind in TASK_MODELS:
+                for status, days in self.ttl_by_status().items():
+                    if days <= 0:
+                        continue
+                    cutoff = now - timedelta(days=days)
+                    await self._purge_tasks(
+                        kind, status, cutoff, archive_stamp, report, dry_run
+                    )
+
+            completed_days = settings.task_retention_completed_days
+            if completed_days > 0:
+                cutoff = now - timedelta(days=completed_days)
+                await self._purge_batches(cutoff, report, dry_run)
+                files, size = await asyncio.to_thread(
+                    self._prune_sheets, cutoff, dry_run
+                )
+                report.media_files += files
+                report.media_bytes += size
+
+            report.duration_ms = (time.perf_counter() - started) * 1000
+            logger.info(
+                f"任务清理{'计划(dry_run)' if dry_run else '完成'}: 删除 {report.deleted}, 批次 {report.deleted_batches}, "
+                f"归档 {report.archived}, 回收缓存 {report.media_files} 个文件 / "
+                f"{report.media_bytes} 字节"
+            )
+            return report
+
+    async def _purge_tasks(
+        self,
+        kind: str,
+        status: str,
+        cutoff: datetime,
+        archive_stamp: str,
+        report: RetentionReport,
+        dry_run: bool = False,
+    ) -> None:
+        """分批删除某类型某状态下创建早于 cutoff 的任务.
+
+        删除后下一批仍从头扫描；dry_run 不删除，按游标继续向后扫描。
+        """
+        after = None
+        while True:
+            async with ASYNC_SESSION_LOCAL() as db:
+                page = await TaskRepository(db).scan(
+                    kind,
+                    status=status,
+                    created_before=cutoff,
+                    after=after,
+                    limit=self.batch_size,
+                )
+                tasks = page.items
+                if not tasks:
+                    return
+
+                prompt_ids = [task.prompt_id for task in tasks]
+                filenames = [
+                    task.filename if kind == "t2i" else task.video_filename
+                    for task in tasks
+                ]
+                if not dry_run:
+                    await self._delete_tasks(kind, tasks, archive_stamp, report, db)
+
+            report.add_deleted(kind, status, len(tasks))
+            if kind == "t2i":
+                files, size = await asyncio.to_thread(
+                    self._remove_thumbnails,
+                    [name for name in filenames if name],
+                    dry_run,
+                )
+                report.media_files += files
+                report.media_bytes += size
+            if dry_run:
+                after = page.next_cursor
+                if after is None:
+                    return
+                continue
+            if settings.task_retention_purge_comfyui_history:
+                report.comfyui_history_deleted += await self._purge_comfyui_history(
+                    prompt_ids
+                )
+
+            if len(tasks) < self.batch_size:
+                return
+
+    async def _delete_tasks(
+        self,
+        kind: str,
+        tasks: list[Any],
+        archive_stamp: str,
+        report: RetentionReport,
+        db: AsyncSession,
+    ) -> None:
+        """在一个事务内归档并删除一批任务及其队列记录，失效终态缓存."""
+        model = TASK_MODELS[kind]
+        prompt_ids = [task.prompt_id for task in tasks]
+        if self.archive_dir is not None:
+            rows = [self._row_to_dict(task) for task in tasks]
+            path = self.archive_dir / f"{kind}-{archive_stamp}.ndjson.gz"
+            await asyncio.to_thread(self._append_archive, path, rows)
+            report.archived += len(rows)
+
+        await db.execute(
+            delete(model)
+            .where(model.id.in_([task.id for task in tasks]))
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(GenerationJob)
+            .where(GenerationJob.prompt_id.in_(prompt_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await publish_invalidation(db, kind, prompt_ids)
+        await db.commit()
+
+    async def _purge_batches(
+        self, cutoff: datetime, report: RetentionReport, dry_run: bool = False
+    ) -> None:
+        """分批删除过期的文生图批次清单(dry_run 只计数)."""
+        if dry_run:
+            async with ASYNC_SESSION_LOCAL() as db:
+                count = await db.scalar(
+                    select(func.count())
+                    .select_from(Text2ImgBatch)
+                    .where(Text2ImgBatch.created_at < cutoff)
+                )
+            report.deleted_batches += count or 0
+            return
+        while True:
+            async with ASYNC_SESSION_LOCAL() as db:
+                ids = list(
+                    await db.scalars(
+                        select(Text2ImgBatch.id)
+                        .where(Text2ImgBatch.created_at < cutoff)
+                        .limit(self.batch_size)
+                    )
+                )
+                if not ids:
+                    return
+                await db.execute(
+                    delete(Text2ImgBatch)
+                    .where(Text2ImgBatch.id.in_(ids))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            report.deleted_batches += len(ids)
+            if len(ids) < self.batch_size:
+                return
+
+    async def _purge_comfyui_history(self, prompt_ids: list[str]) -> int:
+        """删除 ComfyUI history 记录；失败只记日志，不影响清理."""
+        try:
+            response = await get_comfyui_transport().arequest(
+                "POST", "/history", "history", json={"delete": prompt_ids}
+            )
+        except (requests.RequestException, ComfyUIUnavailableError) as e:
+            logger.warning(f"删除 ComfyUI history 失败: {e}")
+            return 0
+        if response.status_code != 200:
+            logger.warning(f"删除 ComfyUI history 失败: {response.status_code}")
+            return 0
+        return len(prompt_ids)
+
+    @staticmethod
+    def _row_to_dict(task: Any) -> dict[str, Any]:
+        row = {}
+        for column in task.__table__.columns:
+            value = getattr(task, column.key)
+            row[column.key] = (
+                value.isoformat() if isinstance(value, datetime) else value
+            )
+        return row
+
+    @staticmethod
+    def _append_archive(path: Path, rows: list[dict[str, Any]]) -> None:
+        """追加写入 NDJSON(gzip 多成员，可直接 zcat 读取)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _remove_file(path: Path, dry_run: bool = False) -> int:
+        """删除文件并返回其大小，不存在返回 0(dry_run 只返回大小)."""
+        try:
+            size = path.stat().st_size
+            if not dry_run:
+                path.unlink()
+        except FileNotFoundError:
+            return 0
+        return size
+
+    def _remove_thumbnails(
+        self, filenames: list[str], dry_run: bool = False
+    ) -> tuple[int, int]:
+        files = size = 0
+        for filename in filenames:
+            removed = self._remove_file(
+                contact_sheet_service.thumbnail_path(filename), dry_run
+            )
+            if removed:
+                files += 1
+                size += removed
+        return files, size
+
+    def _prune_sheets(self, cutoff: datetime, dry_run: bool = False) -> tuple[int, int]:
+        """删除最后修改时间早于 cutoff 的联系表缓存."""
+        sheet_dir = contact_sheet_service.sheet_dir
+        if not sheet_dir.is_dir():
+            return 0, 0
+        threshold = cutoff.timestamp()
+        files = size = 0
+        for path in sheet_dir.iterdir():
+            if path.is_file() and path.stat().st_mtime < threshold:
+                removed = self._remove_file(path, dry_run)
+                if removed:
+                    files += 1
+                    size += removed
+        return files, size
+
+
+class TaskRetentionScheduler:
+    """按 settings.task_retention_interval 周期执行清理的后台任务."""
+
+    def __init__(self, service: TaskRetentionService):
+        """初始化调度器.
+
+        Args:
+            service: 保留策略服务
+        """
+        self.service = service
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """在当前事件循环中启动(未开启 task_retention_enabled 时不启动)."""
+        if not settings.task_retention_enabled:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台清理."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.service.run_once()
+            except Exception as e:  # 后台循环不能因单次异常退出
+                logger.error(f"任务清理异常: {e}")
+            await asyncio.sleep(settings.task_retention_interval)
+
+
+# 全局服务实例
+task_retention_service = TaskRetentionService()
+retention_scheduler = TaskRetentionScheduler(task_retention_service)
@@ -5,17 +5,31 @@
 设计为「提交即返回 task_id + 单接口取图」两步模式,不依赖 Dify。
 """
 
+import asyncio
+import json
 import logging
-from datetime import datetime
+import time
+import uuid
+from typing import Any
 
 import requests
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
-from ..constants import CACHE_ONE_DAY
-from ..models.text2img import Text2ImgTask
+from ..exceptions import ComfyUIUnavailableError
+from ..models.text2img import Text2ImgBatch, Text2ImgTask
+from ..schemas import (
+    Text2ImgBatchItem,
+    Text2ImgBatchItemStatus,
+    Text2ImgBatchStatusResponse,
+)
+from ..utils.datetime_utils import utcnow
 from ..utils.model_validation import validate_and_get_model
-from .comfyui_client import create_comfyui_client
+from .comfyui_client import ComfyUIClient, create_comfyui_client
+from .comfyui_transport import get_comfyui_transport
+from .generation_queue import enqueue_t2i, new_prompt_id
+from .task_cache import task_cache
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +41,7 @@ async def generate(
         self,
         prompt: str,
         model_name: str | None,
-        db: Session,
+        db: AsyncSession,
         negative_prompt: str | None = None,
     ) -> str:
         """提交文生图任务,立即返回 task_id(即 ComfyUI prompt_id).
@@ -46,6 +60,24 @@ async def generate(
             RuntimeError: ComfyUI 提交失败
         """
         model = validate_and_get_model(model_name, "T2I")
+
+        if settings.generation_queue_enabled:
+            # 队列模式:预生成 prompt_id,任务行与队列任务同一事务写入,由 worker 提交
+            prompt_id = new_prompt_id()
+            db.add(
+                Text2ImgTask(
+                    prompt_id=prompt_id,
+                    prompt=prompt,
+                    negative_prompt=negative_prompt,
+                    model_name=model,
+                    status="pending",
+                )
+            )
+            enqueue_t2i(db, prompt_id, prompt, model, negative_prompt)
+            await db.commit()
+            logger.info(f"文生图任务已入队: task_id={prompt_id}, model={model}")
+            return prompt_id
+
         client = create_comfyui_client(model_title=model, workflow_type="t2i")
         prompt_id = await client.generate_image(prompt, negative_prompt)
 
@@ -60,12 +92,12 @@ async def generate(
             status="pending",
         )
         db.add(task)
-        db.commit()
+        await db.commit()
 
         logger.info(f"文生图任务已提交: task_id={prompt_id}, model={model}")
         return prompt_id
 
-    async def get_image(self, task_id: str, db: Session) -> tuple[bytes | None, int]:
+    async def get_image(self, task_id: str, db: AsyncSession) -> tuple[bytes | None, int]:
         """根据 task_id 获取图片.
 
         Args:
@@ -78,31 +110,297 @@ async def get_image(self, task_id: str, db: Session) -> tuple[bytes | None, int]
               - (None, 202): 仍在生成中
               - (None, 404): 任务不存在或生成失败
         """
-        task = db.query(Text2ImgTask).filter(Text2ImgTask.prompt_id == task_id).first()
-
-        if not task:
-            return None, 404
-
-        if task.status == "failed":
-            return None, 404
+        # 已结束的任务直接命中终态缓存，不查数据库
+        cached = task_cache.get("t2i", task_id)
+        if cached is not None:
+            status, filename = cached.status, cached.filename
+        else:
+            task = await db.scalar(
+                select(Text2ImgTask).where(Text2ImgTask.prompt_id == task_id)
+            )
+            if not task:
+                return None, 404
 
-        if task.status == "completed" and task.filename:
-            data = self._fetch_media(task.filename)
+            if task.status != "pending":
+                task_cache.put_task("t2i", task)
+            elif not settings.generation_queue_enabled:
+                # 队列模式下由 worker 跟踪结果，API 进程只读数据库
+                client = create_comfyui_client(
+                    model_title=task.model_name, workflow_type="t2i"
+                )
+                await self._refresh_status(task, client, db)
+            status, filename = task.status, task.filename
+
+        if status == "completed" and filename:
+            data = await asyncio.to_thread(self.fetch_media, filename)
             if data:
                 return data, 200
             # ComfyUI 上的文件可能已被清理
-            logger.warning(f"图片文件在 ComfyUI 上不存在: {task.filename}")
+            logger.warning(f"图片文件在 ComfyUI 上不存在: {filename}")
             return None, 404
 
-        # pending: 查询 ComfyUI history
-        client = create_comfyui_client(
-            model_title=task.model_name, workflow_type="t2i"
+        if status == "failed":
+            return None, 404
+
+        # 仍在排队/运行中
+        return None, 202
+
+    async def generate_batch(
+        self, items: list[Text2ImgBatchItem], db: AsyncSession
+    ) -> tuple[str, list[str | None]]:
+        """批量提交文生图任务(章节插图一次性提交).
+
+        以 settings.text2img_batch_concurrency 为上限并发提交到 ComfyUI,
+        全部提交结束后在同一事务内写入批次清单和所有任务行。
+
+        Args:
+            items: 提示词列表(每条可单独指定模型和负向提示词)
+            db: 数据库会话
+
+        Returns:
+            (batch_id, task_ids) 元组; task_ids 与 items 顺序一致,
+            提交失败的条目为 None
+
+        Raises:
+            RuntimeError: 所有条目均提交失败
+        """
+        models = [validate_and_get_model(item.model_name, "T2I") for item in items]
+
+        if settings.generation_queue_enabled:
+            return await self._enqueue_batch(items, models, db)
+
+        # 同一模型的工作流只加载一次
+        clients: dict[str, ComfyUIClient] = {}
+        for model in models:
+            if model not in clients:
+                clients[model] = create_comfyui_client(
+                    model_title=model, workflow_type="t2i"
+                )
+
+        semaphore = asyncio.Semaphore(max(1, settings.text2img_batch_concurrency))
+
+        async def submit(index: int) -> str | None:
+            async with semaphore:
+                item = items[index]
+                return await clients[models[index]].generate_image(
+                    item.prompt, item.negative_prompt
+                )
+
+        results = await asyncio.gather(
+            *(submit(i) for i in range(len(items))), return_exceptions=True
+        )
+
+        batch_id = uuid.uuid4().hex
+        task_ids: list[str | None] = []
+        submit_errors: dict[int, str] = {}
+        tasks: list[Text2ImgTask] = []
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException) or not result:
+                reason = str(result) if isinstance(result, BaseException) else ""
+                submit_errors[index] = f"ComfyUI 提交失败{f': {reason}' if reason else ''}"
+                task_ids.append(None)
+                continue
+            task_ids.append(result)
+            tasks.append(
+                Text2ImgTask(
+                    prompt_id=result,
+                    prompt=items[index].prompt,
+                    negative_prompt=items[index].negative_prompt,
+                    model_name=models[index],
+                    status="pending",
+                    batch_id=batch_id,
+                    batch_index=index,
+                )
+            )
+
+        if not tasks:
+            # 熔断导致的整体失败保留原异常，由 API 层返回 503
+            for result in results:
+                if isinstance(result, ComfyUIUnavailableError):
+                    raise result
+            raise RuntimeError("ComfyUI 提交失败")
+
+        db.add(
+            Text2ImgBatch(
+                batch_id=batch_id,
+                total=len(items),
+                submit_errors=(
+                    json.dumps(submit_errors, ensure_ascii=False)
+                    if submit_errors
+                    else None
+                ),
+            )
+        )
+        db.add_all(tasks)
+        await db.commit()
+
+        logger.info(
+            f"文生图批次已提交: batch_id={batch_id}, "
+            f"成功 {len(tasks)}/{len(items)}"
+        )
+        return batch_id, task_ids
+
+    async def _enqueue_batch(
+        self, items: list[Text2ImgBatchItem], models: list[str], db: AsyncSession
+    ) -> tuple[str, list[str | None]]:
+        """队列模式下的批量提交:批次、任务行与队列任务在同一事务内写入."""
+        batch_id = uuid.uuid4().hex
+        task_ids: list[str | None] = []
+        db.add(Text2ImgBatch(batch_id=batch_id, total=len(items)))
+        for index, item in enumerate(items):
+            prompt_id = new_prompt_id()
+            task_ids.append(prompt_id)
+            db.add(
+                Text2ImgTask(
+                    prompt_id=prompt_id,
+                    prompt=item.prompt,
+                    negative_prompt=item.negative_prompt,
+                    model_name=models[index],
+                    status="pending",
+                    batch_id=batch_id,
+                    batch_index=index,
+                )
+            )
+            enqueue_t2i(db, prompt_id, item.prompt, models[index], item.negative_prompt)
+        await db.commit()
+
+        logger.info(f"文生图批次已入队: batch_id={batch_id}, 共 {len(items)} 条")
+        return batch_id, task_ids
+
+    async def get_batch(
+        self, batch_id: str, db: AsyncSession, wait: float = 0
+    ) -> Text2ImgBatchStatusResponse | None:
+        """查询批次状态,可选长轮询.
+
+        Args:
+            batch_id: 批次ID
+            db: 数据库会话
+            wait: 长轮询等待秒数; >0 时在批次内仍有 pending 任务的情况下
+                按 settings.text2img_batch_poll_interval 周期刷新,
+                直到全部结束或超时(队列模式下只重新读取数据库,不查询 ComfyUI)
+
+        ComfyUI 熔断时不整体失败:跳过刷新的任务保留数据库中的状态,
+        响应中附带熔断器状态。
+
+        Returns:
+            批次状态,批次不存在返回 None
+        """
+        batch = await db.scalar(
+            select(Text2ImgBatch).where(Text2ImgBatch.batch_id == batch_id)
+        )
+        if not batch:
+            return None
+
+        tasks = list(
+            await db.scalars(
+                select(Text2ImgTask)
+                .where(Text2ImgTask.batch_id == batch_id)
+                .order_by(Text2ImgTask.batch_index)
+            )
+        )
+        deadline = time.monotonic() + max(0.0, wait)
+        # /history 查询与工作流无关,整个批次共用一个客户端
+        client: ComfyUIClient | None = None
+        unavailable = False
+
+        while True:
+            pending = [task for task in tasks if task.status == "pending"]
+            if pending and not settings.generation_queue_enabled:
+                if client is None:
+                    client = create_comfyui_client(
+                        model_title=pending[0].model_name, workflow_type="t2i"
+                    )
+                unavailable = False
+                for task in pending:
+                    try:
+                        await self._refresh_status(task, client, db)
+                    except ComfyUIUnavailableError as e:
+                        logger.warning(f"刷新任务状态跳过: {task.prompt_id}, {e}")
+                        unavailable = True
+
+            if all(task.status != "pending" for task in tasks):
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(settings.text2img_batch_poll_interval, remaining))
+            if settings.generation_queue_enabled:
+                await self._reload_pending(tasks, db)
+
+        breaker = get_comfyui_transport().breaker.snapshot() if unavailable else None
+        return self._build_batch_status(batch, tasks, breaker)
+
+    @staticmethod
+    async def _reload_pending(tasks: list[Text2ImgTask], db: AsyncSession) -> None:
+        """队列模式下重新读取 pending 任务行(状态由 worker 更新).
+
+        先结束当前读事务，SQLite WAL 下才能看到 worker 之后提交的结果。
+        """
+        pending_ids = [task.prompt_id for task in tasks if task.status == "pending"]
+        await db.commit()
+        await db.scalars(
+            select(Text2ImgTask)
+            .where(Text2ImgTask.prompt_id.in_(pending_ids))
+            .execution_options(populate_existing=True)
+        )
+
+    def _build_batch_status(
+        self,
+        batch: Text2ImgBatch,
+        tasks: list[Text2ImgTask],
+        circuit_breaker: dict[str, Any] | None = None,
+    ) -> Text2ImgBatchStatusResponse:
+        """组装批次状态响应(含提交失败的条目，ComfyUI 熔断时附带熔断器状态)."""
+        items = [
+            Text2ImgBatchItemStatus(
+                index=task.batch_index,
+                task_id=task.prompt_id,
+                status=task.status,
+                error_message=task.error_message,
+            )
+            for task in tasks
+        ]
+        submit_errors = json.loads(batch.submit_errors) if batch.submit_errors else {}
+        items.extend(
+            Text2ImgBatchItemStatus(
+                index=int(index), task_id=None, status="failed", error_message=message
+            )
+            for index, message in submit_errors.items()
         )
-        info = await client.check_task_status(task_id)
+        items.sort(key=lambda item: item.index)
+
+        counts = {"pending": 0, "completed": 0, "failed": 0}
+        for item in items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+
+        return Text2ImgBatchStatusResponse(
+            batch_id=batch.batch_id,
+            total=batch.total,
+            pending=counts["pending"],
+            completed=counts["completed"],
+            failed=counts["failed"],
+            done=counts["pending"] == 0,
+            items=items,
+            circuit_breaker=circuit_breaker,
+        )
+
+    async def _refresh_status(
+        self, task: Text2ImgTask, client: ComfyUIClient, db: AsyncSession
+    ) -> None:
+        """查询 ComfyUI history 并更新 pending 任务的状态,进入终态时写入终态缓存.
 
+        Args:
+            task: 待刷新的任务(仅处理 pending 状态)
+            client: ComfyUI 客户端
+            db: 数据库会话
+        """
+        if task.status != "pending":
+            return
+
+        info = await client.check_task_status(task.prompt_id)
         if not info:
             # 还在排队/执行中,history 中暂无记录
-            return None, 202
+            return
 
         status_str = info.get("status", {}).get("status_str", "")
 
@@ -111,28 +409,23 @@ async def get_image(self, task_id: str, db: Session) -> tuple[bytes | None, int]
             if not filename:
                 task.status = "failed"
                 task.error_message = "任务完成但未找到图片输出"
-                db.commit()
-                return None, 404
+                await db.commit()
+                task_cache.put_task("t2i", task)
+                return
 
             task.status = "completed"
             task.filename = filename
-            task.completed_at = datetime.now()
-            db.commit()
-
-            data = self._fetch_media(filename)
-            if data:
-                return data, 200
-            return None, 404
+            task.completed_at = utcnow()
+            await db.commit()
+            task_cache.put_task("t2i", task)
+            return
 
         if status_str in ("error", "failed"):
             messages = info.get("status", {}).get("messages", [])
             task.status = "failed"
             task.error_message = f"ComfyUI 任务失败: {messages}"
-            db.commit()
-            return None, 404
-
-        # 仍在运行中
-        return None, 202
+            await db.commit()
+            task_cache.put_task("t2i", task)
 
     def _extract_image_filename(self, outputs: dict) -> str | None:
         """从 ComfyUI outputs 中提取图片文件名.
@@ -156,7 +449,7 @@ def _extract_image_filename(self, outputs: dict) -> str | None:
                         return filename
         return None
 
-    def _fetch_media(self, filename: str) -> bytes | None:
+    def fetch_media(self, filename: str) -> bytes | None:
         """从 ComfyUI 获取媒体文件二进制数据.
 
         Args:
@@ -166,9 +459,9 @@ def _fetch_media(self, filename: str) -> bytes | None:
             二进制数据,失败返回 None
         """
         try:
-            comfyui_url = settings.comfyui_api_url
-            url = f"{comfyui_url}/view?filename={filename}"
-            response = requests.get(url, timeout=60)
+            response = get_comfyui_transport().request(
+                "GET", "/view", "view", params={"filename": filename}
+            )
             if response.status_code == 200:
                 return response.content
             logger.error(f"从 ComfyUI 获取文件失败: {response.status_code}")
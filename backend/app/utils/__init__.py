@@ -1,5 +1,6 @@
 """工具模块."""
 
+from .datetime_utils import utcnow
 from .model_validation import validate_and_get_model
 
-__all__ = ["validate_and_get_model"]
+__all__ = ["utcnow", "validate_and_get_model"]
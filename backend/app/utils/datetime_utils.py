@@ -0,0 +1,12 @@
+"""时间工具."""
+
+from datetime import UTC, datetime
+
+
+def utcnow() -> datetime:
+    """当前 UTC 时间(带时区).
+
+    任务与队列的时间字段统一用它写入，不使用不带时区的本地时间，
+    便于排序以及与保留期限比较。
+    """
+    return datetime.now(UTC)
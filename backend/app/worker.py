@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+生成任务 worker.
+
+开启 settings.generation_queue_enabled 后，API 进程只负责入队，
+本进程从 generation_job 表认领任务、提交到 ComfyUI 并跟踪结果：
+
+1. 回收租约过期的 submitting 任务(认领它的 worker 可能已崩溃)
+2. 认领 queued 任务并发提交；提交时使用入队时预生成的 prompt_id，
+   重试前先查 history，已提交过的任务不会重复提交
+3. 认领 submitted 任务，查询 ComfyUI 结果并写回任务行
+
+可以同时运行多个 worker(PostgreSQL 下通过 SKIP LOCKED 互不阻塞)。
+
+运行: python -m app.worker  或  novel-worker
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import socket
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .database import ASYNC_SESSION_LOCAL, dispose_async_engine, init_db
+from .exceptions import ComfyUIUnavailableError
+from .logging_config import setup_logging
+from .models.generation_job import GenerationJob
+from .models.text2img import ImageToVideoTask, Text2ImgTask
+from .services.comfyui_client import create_comfyui_client
+from .services.generation_queue import (
+    claim_for_tracking,
+    claim_jobs,
+    job_payload,
+    mark_done,
+    mark_failed,
+    mark_retry,
+    mark_submitted,
+    requeue_stale,
+)
+from .services.image_to_video_service import image_to_video_service
+from .services.text2img_service import text2img_service
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationWorker:
+    """生成任务 worker."""
+
+    def __init__(self, worker_id: str | None = None):
+        """初始化 worker.
+
+        Args:
+            worker_id: worker 标识，默认 <主机名>-<pid>-<随机串>
+        """
+        self.worker_id = worker_id or (
+            f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        )
+        self.batch_size = settings.generation_worker_batch_size
+        self.poll_interval = settings.generation_worker_poll_interval
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """请求停止：处理完当前一轮后退出."""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """主循环，直到 stop() 被调用."""
+        logger.info(f"生成任务 worker 已启动: {self.worker_id}")
+        while not self._stopping.is_set():
+            try:
+                handled = await self.run_once()
+            except Exception as e:  # 主循环不能因单轮异常退出
+                logger.error(f"worker 本轮处理异常: {e}")
+                handled = 0
+            if not handled:
+                # 空闲时等待一个轮询间隔，stop() 可立即唤醒
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(
+                        self._stopping.wait(), timeout=self.poll_interval
+                    )
+        logger.info(f"生成任务 worker 已停止: {self.worker_id}")
+
+    async def run_once(self) -> int:
+        """执行一轮：回收过期租约、提交新任务、跟踪已提交任务.
+
+        Returns:
+            本轮处理的任务数
+        """
+        async with ASYNC_SESSION_LOCAL() as db:
+            await requeue_stale(db)
+
+            jobs = await claim_jobs(db, self.worker_id, self.batch_size)
+            # 每个任务使用独立会话，互不影响各自的提交结果
+            await asyncio.gather(*(self._submit_job(job.id) for job in jobs))
+
+            tracked = await claim_for_tracking(db, self.worker_id, self.batch_size)
+            for job in tracked:
+                await self._track(db, job)
+
+            return len(jobs) + len(tracked)
+
+    async def _submit_job(self, job_id: int) -> None:
+        """提交单个任务到 ComfyUI."""
+        async with ASYNC_SESSION_LOCAL() as db:
+            try:
+                await self._submit(db, job_id)
+            except Exception as e:  # 单个任务异常不影响同批其他任务
+                logger.error(f"提交队列任务异常: job_id={job_id}, {e}")
+                await db.rollback()
+
+    async def _submit(self, db: AsyncSession, job_id: int) -> None:
+        """提交逻辑本体，异常由 _submit_job 兜底."""
+        job = await db.get(GenerationJob, job_id)
+        if job is None or job.status != "submitting":
+            return
+
+        client = create_comfyui_client(
+            model_title=job.model_name, workflow_type=job.kind
+        )
+        try:
+            # 重试时先确认上一次是否已提交成功，避免重复生成
+            if job.attempts > 1 and await client.check_task_status(job.prompt_id):
+                await mark_submitted(db, job)
+                return
+
+            payload = job_payload(job)
+            if job.kind == "t2i":
+                prompt_id = await client.generate_image(
+                    payload["prompt"],
+                    payload.get("negative_prompt"),
+                    prompt_id=job.prompt_id,
+                )
+            else:
+                prompt_id = await client.generate_video(
+                    payload["prompt"],
+                    job.input_data,
+                    payload.get("image_filename") or "input_image.png",
+                    prompt_id=job.prompt_id,
+                )
+        except ComfyUIUnavailableError as e:
+            # 熔断中：不计入尝试次数，等熔断冷却后再试
+            await mark_retry(
+                db, job, e.message, delay=e.retry_after, count_attempt=False
+            )
+            return
+
+        if prompt_id == job.prompt_id:
+            await mark_submitted(db, job)
+            logger.info(f"队列任务已提交: task_id={job.prompt_id}, kind={job.kind}")
+            return
+
+        error = (
+            "ComfyUI 提交失败"
+            if not prompt_id
+            else f"ComfyUI 返回的 prompt_id 不一致: {prompt_id}"
+        )
+        if not await mark_retry(db, job, error):
+            await self._fail_task(db, job, error)
+            logger.error(f"队列任务多次提交失败: task_id={job.prompt_id}")
+
+    async def _track(self, db: AsyncSession, job: GenerationJob) -> None:
+        """查询已提交任务的结果，任务结束后标记 done."""
+        task_model = Text2ImgTask if job.kind == "t2i" else ImageToVideoTask
+        service = text2img_service if job.kind == "t2i" else image_to_video_service
+
+        task = await db.scalar(
+            select(task_model).where(task_model.prompt_id == job.prompt_id)
+        )
+        if task is None:
+            await mark_failed(db, job, "任务行不存在")
+            return
+
+        try:
+            client = create_comfyui_client(
+                model_title=task.model_name, workflow_type=job.kind
+            )
+            await service._refresh_status(task, client, db)
+        except ComfyUIUnavailableError:
+            # 熔断中，下个跟踪间隔再查
+            return
+
+        if task.status != "pending":
+            await mark_done(db, job)
+
+    @staticmethod
+    async def _fail_task(db: AsyncSession, job: GenerationJob, error: str) -> None:
+        """队列任务最终失败时同步更新任务行."""
+        task_model = Text2ImgTask if job.kind == "t2i" else ImageToVideoTask
+        task = await db.scalar(
+            select(task_model).where(task_model.prompt_id == job.prompt_id)
+        )
+        if task is not None and task.status == "pending":
+            task.status = "failed"
+            task.error_message = error
+            await db.commit()
+
+
+async def _serve() -> None:
+    worker = GenerationWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Windows 不支持 add_signal_handler，依赖 KeyboardInterrupt 退出
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await dispose_async_engine()
+
+
+def main() -> None:
+    """worker 进程入口."""
+    setup_logging()
+    init_db()
+    if not settings.generation_queue_enabled:
+        logger.warning(
+            "generation_queue_enabled 未开启，API 不会入队，worker 仅处理已有任务"
+        )
+    asyncio.run(_serve())
+
+
+if __name__ == "__main__":
+    main()
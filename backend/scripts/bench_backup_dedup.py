@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+"""
+备份去重存储压测脚本
+
+模拟客户端每天上传一次 novel_app_backup.db：先生成一个包含小说、章节正文、
+阅读进度的 SQLite 数据库，之后每天追加新章节、更新阅读进度、删除部分缓存章节，
+每隔若干天 VACUUM 一次(整库重排)。每天的快照依次写入块存储(与服务端上传使用
+同一套切块与存储代码)，对比：
+- full: 每次保存完整文件(改造前)
+- cdc: 内容定义分块去重(服务端当前方案)
+- fixed: 同样平均块长的定长分块去重(仅计算，不落盘)
+- zstd: cdc 的新块再经后台压缩(与服务端压缩任务使用同一套代码)后的占用
+
+用法:
+    python scripts/bench_backup_dedup.py --chapters 3000 --days 14
+"""
+
+import argparse
+import hashlib
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 常用汉字范围内随机取字，近似小说正文的字节分布(UTF-8 每字 3 字节)
+CJK_START = 0x4E00
+CJK_RANGE = 3500
+
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="备份去重存储压测")
+    parser.add_argument("--novels", type=int, default=30, help="初始小说数")
+    parser.add_argument("--chapters", type=int, default=3000, help="初始章节数")
+    parser.add_argument("--chapter-chars", type=int, default=3000, help="每章字数")
+    parser.add_argument("--days", type=int, default=14, help="模拟上传天数")
+    parser.add_argument("--daily-chapters", type=int, default=40, help="每天新增章节")
+    parser.add_argument(
+        "--daily-updates", type=int, default=30, help="每天更新阅读进度次数"
+    )
+    parser.add_argument(
+        "--daily-deletes", type=int, default=10, help="每天删除缓存章节数"
+    )
+    parser.add_argument(
+        "--vacuum-every", type=int, default=7, help="每隔多少天 VACUUM，0 表示不执行"
+    )
+    parser.add_argument(
+        "--compress-level", type=int, default=3, help="块压缩级别，0 表示不压缩"
+    )
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    return parser.parse_args()
+
+
+def chapter_text(rng: random.Random, chars: int) -> str:
+    """生成一章正文：由常用词组成，带段落换行"""
+    words = []
+    total = 0
+    while total < chars:
+        word = "".join(
+            chr(CJK_START + rng.randrange(CJK_RANGE)) for _ in range(rng.randint(1, 4))
+        )
+        words.append(word)
+        total += len(word)
+        if rng.random() < 0.02:
+            words.append("\n\n")
+    return "".join(words)
+
+
+def create_database(
+    path: Path, args: argparse.Namespace, rng: random.Random
+) -> sqlite3.Connection:
+    """创建与客户端结构相近的备份数据库"""
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE novels (
+            id INTEGER PRIMARY KEY, title TEXT, author TEXT, url TEXT UNIQUE,
+            last_read_chapter INTEGER DEFAULT 0, updated_at INTEGER
+        );
+        CREATE TABLE chapter_cache (
+            id INTEGER PRIMARY KEY, novel_id INTEGER, chapter_index INTEGER,
+            title TEXT, content TEXT, cached_at INTEGER
+        );
+        CREATE INDEX idx_chapter_novel ON chapter_cache (novel_id, chapter_index);
+        """
+    )
+    conn.executemany(
+        "INSERT INTO novels (title, author, url, updated_at) VALUES (?, ?, ?, ?)",
+        [
+            (f"小说{i}", f"作者{i}", f"https://example.com/novel/{i}", 0)
+            for i in range(args.novels)
+        ],
+    )
+    for index in range(args.chapters):
+        add_chapter(conn, args, rng, index)
+    conn.commit()
+    return conn
+
+
+def add_chapter(
+    conn: sqlite3.Connection, args: argparse.Namespace, rng: random.Random, index: int
+) -> None:
+    """缓存一章"""
+    conn.execute(
+        "INSERT INTO chapter_cache (novel_id, chapter_index, title, content, cached_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            rng.randrange(args.novels) + 1,
+            index,
+            f"第{index}章",
+            chapter_text(rng, args.chapter_chars),
+            index,
+        ),
+    )
+
+
+def simulate_day(
+    conn: sqlite3.Connection, args: argparse.Namespace, rng: random.Random, day: int
+) -> None:
+    """模拟一天的使用：追加章节、更新阅读进度、删除部分缓存"""
+    base = args.chapters + day * args.daily_chapters
+    for offset in range(args.daily_chapters):
+        add_chapter(conn, args, rng, base + offset)
+    for _ in range(args.daily_updates):
+        conn.execute(
+            "UPDATE novels SET last_read_chapter = ?, updated_at = ? WHERE id = ?",
+            (rng.randrange(base), day, rng.randrange(args.novels) + 1),
+        )
+    conn.execute(
+        "DELETE FROM chapter_cache WHERE id IN (SELECT id FROM chapter_cache ORDER BY random() LIMIT ?)",
+        (args.daily_deletes,),
+    )
+    conn.commit()
+    if args.vacuum_every and day % args.vacuum_every == 0:
+        conn.execute("VACUUM")
+
+
+def fixed_chunks(data: bytes, size: int) -> list[tuple[str, int]]:
+    """定长分块(对照组)"""
+    return [
+        (
+            hashlib.sha256(data[offset : offset + size]).hexdigest(),
+            len(data[offset : offset + size]),
+        )
+        for offset in range(0, len(data), size)
+    ]
+
+
+def main() -> None:
+    """运行压测"""
+    args = parse_args()
+    from app.constants import BACKUP_CHUNK_AVG_SIZE, BACKUP_UPLOAD_CHUNK_BYTES
+    from app.services.backup_chunks import ChunkStore, read_blocks
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix="bench_backup_") as tmp:
+        db_path = Path(tmp) / "novel_app_backup.db"
+        store = ChunkStore(Path(tmp) / "chunks")
+        conn = create_database(db_path, args, rng)
+
+        full_bytes = 0
+        cdc_bytes = 0
+        fixed_seen: set[str] = set()
+        fixed_bytes = 0
+        chunk_count = 0
+        zstd_bytes = 0
+        compressed_seen: set[str] = set()
+        ingest_seconds = 0.0
+        compress_seconds = 0.0
+
+        print(
+            f"{'day':>4} {'size(MB)':>9} {'cdc new(KB)':>12} {'zstd(KB)':>9} "
+            f"{'fixed new(KB)':>14} {'MB/s':>7}"
+        )
+        for day in range(args.days):
+            if day:
+                simulate_day(conn, args, rng, day)
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            data = db_path.read_bytes()
+
+            started = time.perf_counter()
+            with db_path.open("rb") as source:
+                result = store.ingest(read_blocks(source, BACKUP_UPLOAD_CHUNK_BYTES))
+            elapsed = time.perf_counter() - started
+            ingest_seconds += elapsed
+
+            compressed = 0
+            if args.compress_level:
+                sizes = dict(result.chunks)
+                new = [digest for digest in sizes if digest not in compressed_seen]
+                compressed_seen.update(new)
+                started = time.perf_counter()
+                stored = store.compress(new, args.compress_level)
+                compress_seconds += time.perf_counter() - started
+                compressed = sum(
+                    sizes[digest] if size is None else size
+                    for digest, size in stored.items()
+                )
+                store.discard_raw(d for d, size in stored.items() if size is not None)
+            zstd_bytes += compressed
+
+            fixed_new = 0
+            for digest, size in fixed_chunks(data, BACKUP_CHUNK_AVG_SIZE):
+                if digest not in fixed_seen:
+                    fixed_seen.add(digest)
+                    fixed_new += size
+
+            full_bytes += result.size
+            cdc_bytes += result.new_bytes
+            fixed_bytes += fixed_new
+            chunk_count += result.new_chunks
+            print(
+                f"{day:>4} {result.size / 1e6:>9.2f} {result.new_bytes / 1024:>12.1f} "
+                f"{compressed / 1024:>9.1f} {fixed_new / 1024:>14.1f} "
+                f"{result.size / 1e6 / elapsed:>7.1f}"
+            )
+        conn.close()
+
+    print()
+    print(f"full  : {full_bytes / 1e6:8.2f} MB")
+    print(
+        f"cdc   : {cdc_bytes / 1e6:8.2f} MB  dedup ratio {full_bytes / cdc_bytes:5.2f}  chunks {chunk_count}"
+    )
+    if zstd_bytes:
+        print(
+            f"zstd  : {zstd_bytes / 1e6:8.2f} MB  total ratio {full_bytes / zstd_bytes:5.2f}  "
+            f"compress {cdc_bytes / 1e6 / compress_seconds:.1f} MB/s (level {args.compress_level})"
+        )
+    print(
+        f"fixed : {fixed_bytes / 1e6:8.2f} MB  dedup ratio {full_bytes / fixed_bytes:5.2f}"
+    )
+    print(
+        f"ingest throughput: {full_bytes / 1e6 / ingest_seconds:.1f} MB/s (切块 + SHA-256 + 写入新块)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+"""
+SQLite 引擎配置对比压测脚本
+
+在同一进程内并发执行写事务(日志上报)与读查询(任务状态)，对比：
+- legacy: 改造前的配置，pool_size=20 / max_overflow=30，默认 DELETE 日志模式，
+          写事务同时争抢数据库锁，失败时报 "database is locked"
+- sqlite: 嵌入式配置，WAL + synchronous=NORMAL + mmap + busy timeout，
+          写事务经进程内写锁排队，读查询与写并发
+
+用法:
+    python scripts/bench_sqlite.py --writers 16 --readers 16 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BENCH_TIMESTAMP = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="SQLite 引擎配置对比压测")
+    parser.add_argument("--writers", type=int, default=16, help="并发写协程数")
+    parser.add_argument("--readers", type=int, default=16, help="并发读协程数")
+    parser.add_argument("--seconds", type=float, default=10.0, help="每组压测时长(秒)")
+    parser.add_argument(
+        "--batch", type=int, default=20, help="每个写事务插入的日志条数"
+    )
+    parser.add_argument(
+        "--legacy-timeout",
+        type=float,
+        default=0.5,
+        help="legacy 组 sqlite3 连接的锁等待时间(秒)",
+    )
+    return parser.parse_args()
+
+
+def prepare_database(url: str) -> None:
+    """建表并写入读查询使用的任务"""
+    from sqlalchemy import create_engine
+
+    from app.database import Base
+    from app.models.text2img import Text2ImgTask
+
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(
+            Text2ImgTask.__table__.insert(),
+            [
+                {
+                    "prompt_id": f"bench-{i}",
+                    "prompt": "bench",
+                    "model_name": "bench",
+                    "status": "failed",
+                }
+                for i in range(1000)
+            ],
+        )
+    sync_engine.dispose()
+
+
+def build_engine(profile: str, url: str, legacy_timeout: float):
+    """按配置名创建异步引擎"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.database import create_async_db_engine, to_async_url
+
+    if profile == "sqlite":
+        return create_async_db_engine(url)
+    return create_async_engine(
+        to_async_url(url),
+        pool_pre_ping=True,
+        pool_size=20,
+        max_overflow=30,
+        pool_recycle=3600,
+        pool_timeout=60,
+        connect_args={"timeout": legacy_timeout},
+    )
+
+
+async def run_profile(profile: str, args: argparse.Namespace) -> dict:
+    """执行一组压测，返回统计"""
+    from sqlalchemy import select
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app.models.client_log import ClientLog
+    from app.models.text2img import Text2ImgTask
+
+    url = f"sqlite:///{Path(tempfile.mkdtemp()) / f'{profile}.db'}"
+    prepare_database(url)
+    engine = build_engine(profile, url, args.legacy_timeout)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    stats = {"writes": 0, "reads": 0, "locked": 0, "write_latency": []}
+    deadline = time.perf_counter() + args.seconds
+
+    async def writer() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session_factory() as db:
+                    db.add_all(
+                        ClientLog(
+                            level="info",
+                            message="bench",
+                            category="bench",
+                            timestamp=BENCH_TIMESTAMP,
+                        )
+                        for _ in range(args.batch)
+                    )
+                    await db.commit()
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                stats["locked"] += 1
+                continue
+            stats["writes"] += 1
+            stats["write_latency"].append(time.perf_counter() - started)
+
+    async def reader(index: int) -> None:
+        i = index
+        while time.perf_counter() < deadline:
+            try:
+                async with session_factory() as db:
+                    await db.scalar(
+                        select(Text2ImgTask).where(
+                            Text2ImgTask.prompt_id == f"bench-{i % 1000}"
+                        )
+                    )
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                stats["locked"] += 1
+                continue
+            stats["reads"] += 1
+            i += args.readers
+
+    await asyncio.gather(
+        *(writer() for _ in range(args.writers)),
+        *(reader(i) for i in range(args.readers)),
+    )
+    await engine.dispose()
+
+    latencies = sorted(stats.pop("write_latency")) or [0.0]
+    stats["p99_write_ms"] = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    return stats
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    os.environ.setdefault("NOVEL_API_TOKEN", "bench-token")
+
+    print(
+        f"写协程={args.writers} 读协程={args.readers} 时长={args.seconds}s "
+        f"每事务 {args.batch} 条"
+    )
+    print("-" * 78)
+    for profile in ("legacy", "sqlite"):
+        stats = asyncio.run(run_profile(profile, args))
+        print(
+            f"{profile:<8} 写事务 {stats['writes'] / args.seconds:8.1f}/s  "
+            f"读 {stats['reads'] / args.seconds:8.1f}/s  "
+            f"p99 写 {stats['p99_write_ms']:7.1f}ms  locked 错误 {stats['locked']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+"""
+数据库延迟下的接口吞吐压测脚本
+
+在每条 SQL 执行前注入固定延迟(模拟远端数据库的网络往返)，并发压测：
+- POST /api/logs/upload            缓冲写入(后台批量写库，不在请求内等待数据库)
+- GET  /api/text2img/image/{id}    异步会话读取(任务已失败，只走数据库)
+- POST /_legacy/logs/upload        对照组：async 路由里直接使用同步会话
+
+同步会话在事件循环线程上阻塞，延迟会串行累加；异步会话在等待数据库时
+让出事件循环，吞吐随并发数提升。
+
+用法:
+    python scripts/loadtest_db.py --requests 400 --concurrency 32 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="数据库延迟下的接口吞吐压测")
+    parser.add_argument("--requests", type=int, default=400, help="每组请求总数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发请求数")
+    parser.add_argument(
+        "--latency-ms", type=float, default=20.0, help="每条 SQL 注入的延迟(毫秒)"
+    )
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="数据库连接串(默认使用临时 SQLite 文件)",
+    )
+    return parser.parse_args()
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """在导入应用前设置环境变量"""
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        db_path = Path(tempfile.mkdtemp()) / "loadtest.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("NOVEL_API_TOKEN", "loadtest-token")
+
+
+def install_latency(latency: float) -> None:
+    """为同步/异步引擎注入 SQL 延迟"""
+    from sqlalchemy import event
+    from sqlalchemy.util import await_only
+
+    from app.database import async_engine, engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _sync_delay(*_args) -> None:
+        time.sleep(latency)
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def _async_delay(*_args) -> None:
+        # 异步引擎的游标执行运行在 greenlet 中，可以在这里 await
+        await_only(asyncio.sleep(latency))
+
+
+def install_legacy_route() -> None:
+    """挂载对照组路由：与改造前的日志上报实现一致，使用同步会话"""
+    import json
+    from datetime import datetime, timezone
+
+    from fastapi import Depends
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+
+    from app.database import get_db
+    from app.main import app
+    from app.schemas import LogUploadRequest
+    from app.services.log_partitions import log_partition_manager
+
+    async def legacy_upload_logs(
+        request: LogUploadRequest, db: Session = Depends(get_db)
+    ) -> dict:
+        # client_logs 已分区(SQLite 下为视图)，逐行写入当前分区
+        received_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        table = log_partition_manager.insert_target(db.connection(), received_at)
+        for entry in request.logs:
+            db.execute(
+                insert(table).values(
+                    level=entry.level,
+                    message=entry.message,
+                    category=entry.category,
+                    tags=json.dumps(entry.tags) if entry.tags else None,
+                    timestamp=entry.timestamp,
+                    received_at=received_at,
+                )
+            )
+        db.commit()
+        return {"received": len(request.logs)}
+
+    app.add_api_route("/_legacy/logs/upload", legacy_upload_logs, methods=["POST"])
+
+
+def seed_failed_tasks(count: int) -> list[str]:
+    """写入已失败的文生图任务，读取接口只查数据库不访问 ComfyUI"""
+    from app.database import DatabaseSession
+    from app.models.text2img import Text2ImgTask
+
+    task_ids = [f"loadtest-{i}" for i in range(count)]
+    with DatabaseSession() as db:
+        db.add_all(
+            Text2ImgTask(
+                prompt_id=task_id,
+                prompt="loadtest",
+                model_name="loadtest",
+                status="failed",
+            )
+            for task_id in task_ids
+        )
+    return task_ids
+
+
+async def run_case(
+    name: str, total: int, concurrency: int, send
+) -> tuple[str, float, float, int]:
+    """并发执行 total 次请求，返回(名称, 耗时, 吞吐, 失败数)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one(index: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            response = await send(index)
+            if response.status_code >= 500:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    return name, elapsed, total / elapsed, failures
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    """执行各组压测并打印结果"""
+    import httpx
+
+    from app.config import settings
+    from app.database import dispose_async_engine, init_db
+    from app.main import app
+
+    init_db()
+    task_ids = seed_failed_tasks(args.requests)
+    install_latency(args.latency_ms / 1000)
+
+    headers = {settings.token_header: settings.api_token}
+    payload = {
+        "logs": [
+            {
+                "timestamp": "2026-01-01T00:00:00Z",
+                "level": "info",
+                "message": "loadtest",
+                "category": "loadtest",
+                "tags": ["loadtest"],
+            }
+        ]
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://loadtest", headers=headers
+    ) as client:
+        cases = [
+            (
+                "async  POST /api/logs/upload",
+                lambda i: client.post("/api/logs/upload", json=payload),
+            ),
+            (
+                "async  GET  /api/text2img/image/{id}",
+                lambda i: client.get(f"/api/text2img/image/{task_ids[i]}"),
+            ),
+            (
+                "legacy POST /_legacy/logs/upload",
+                lambda i: client.post("/_legacy/logs/upload", json=payload),
+            ),
+        ]
+
+        print(
+            f"请求数={args.requests} 并发={args.concurrency} "
+            f"SQL 延迟={args.latency_ms}ms"
+        )
+        print("-" * 72)
+        for name, send in cases:
+            case_name, elapsed, rps, failures = await run_case(
+                name, args.requests, args.concurrency, send
+            )
+            print(f"{case_name:<40} {elapsed:8.2f}s {rps:9.1f} req/s  失败 {failures}")
+
+    await dispose_async_engine()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    configure_environment(args)
+    install_legacy_route()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for content-defined chunking of backups.
+"""
+
+import hashlib
+
+import pytest
+
+from app.constants import (
+    BACKUP_CHUNK_AVG_SIZE,
+    BACKUP_CHUNK_MAX_SIZE,
+    BACKUP_CHUNK_MIN_SIZE,
+)
+from app.services import backup_chunks
+from app.services.backup_chunks import iter_chunks
+
+
+def _data(size: int, seed: bytes = b"novel-builder") -> bytes:
+    """Deterministic pseudo-random bytes (SHA-256 in counter mode)."""
+    out = bytearray()
+    counter = 0
+    while len(out) < size:
+        out += hashlib.sha256(seed + counter.to_bytes(8, "big")).digest()
+        counter += 1
+    return bytes(out[:size])
+
+
+def _split(data: bytes, block_size: int) -> list[bytes]:
+    return [data[i : i + block_size] for i in range(0, len(data), block_size)]
+
+
+DATA = _data(300_000)
+
+
+@pytest.mark.unit
+class TestIterChunks:
+    """Test invariants of iter_chunks."""
+
+    @pytest.mark.parametrize("block_size", [997, 4096, 65537, len(DATA)])
+    def test_concatenation_equals_input(self, block_size: int) -> None:
+        """Test that the chunks concatenate back to the input."""
+        chunks = list(iter_chunks(_split(DATA, block_size)))
+        assert b"".join(chunks) == DATA
+
+    @pytest.mark.parametrize("block_size", [997, 4096, 65537])
+    def test_boundaries_independent_of_read_size(self, block_size: int) -> None:
+        """Test that boundaries depend on content only, not on how it was read."""
+        expected = list(iter_chunks([DATA]))
+        assert list(iter_chunks(_split(DATA, block_size))) == expected
+
+    def test_chunk_sizes_within_limits(self) -> None:
+        """Test that every chunk but the last respects the min/max size."""
+        chunks = list(iter_chunks([DATA]))
+        assert all(
+            BACKUP_CHUNK_MIN_SIZE <= len(chunk) <= BACKUP_CHUNK_MAX_SIZE
+            for chunk in chunks[:-1]
+        )
+        assert 0 < len(chunks[-1]) <= BACKUP_CHUNK_MAX_SIZE
+
+    def test_empty_input(self) -> None:
+        """Test that empty input yields no chunks."""
+        assert list(iter_chunks([])) == []
+        assert list(iter_chunks([b"", b""])) == []
+
+    def test_boundaries_stable_under_insertion(self) -> None:
+        """Test that an insertion only changes the chunks around it."""
+        position = 150_000
+        edited = DATA[:position] + b"inserted chapter" * 8 + DATA[position:]
+        before = list(iter_chunks([DATA]))
+        after = list(iter_chunks([edited]))
+
+        # 插入点之前的块完全相同
+        prefix, offset = 0, 0
+        while offset + len(before[prefix]) <= position:
+            offset += len(before[prefix])
+            prefix += 1
+        assert prefix > 0
+        assert after[:prefix] == before[:prefix]
+        unchanged = [chunk for chunk in before if chunk in after]
+        # 插入点之后重新对齐，只有附近的少数块变化
+        assert len(after) - len(unchanged) <= 2
+        assert len(before) - len(unchanged) <= 2
+
+
+@pytest.mark.unit
+class TestChunkingParameters:
+    """Guard the fixed chunking parameters.
+
+    Changing any of them moves every boundary, so new uploads stop sharing
+    chunks with existing backups and deduplication silently stops working.
+    """
+
+    def test_size_constants(self) -> None:
+        """Test that the min/avg/max chunk sizes are unchanged."""
+        assert (
+            BACKUP_CHUNK_MIN_SIZE,
+            BACKUP_CHUNK_AVG_SIZE,
+            BACKUP_CHUNK_MAX_SIZE,
+        ) == (
+            4 * 1024,
+            16 * 1024,
+            64 * 1024,
+        )
+
+    def test_table_and_patterns(self) -> None:
+        """Test that the byte->bit table and window patterns are unchanged."""
+        digest = hashlib.sha256(
+            backup_chunks._BIT_TABLE
+            + backup_chunks._PATTERN_STRICT
+            + backup_chunks._PATTERN_LOOSE
+        ).hexdigest()
+        assert digest == (
+            "f72d93b2124b08b9c056a4d0da34400724a92e4d0e2464b6d45171bd775b39d4"
+        )
+
+    def test_find_cut_golden_boundaries(self) -> None:
+        """Test that _find_cut produces the recorded boundaries."""
+        assert [len(chunk) for chunk in iter_chunks([DATA])] == [
+            16688, 17657, 11748, 19575, 31628, 22249, 22680, 17481,
+            16553, 24879, 22012, 23081, 19986, 19298, 8197, 6288,
+        ]  # fmt: skip
+
+    def test_find_cut_short_remainder(self) -> None:
+        """Test that a range no longer than the minimum size is one chunk."""
+        mapped = DATA.translate(backup_chunks._BIT_TABLE)
+        assert backup_chunks._find_cut(mapped, 0, BACKUP_CHUNK_MIN_SIZE) == (
+            BACKUP_CHUNK_MIN_SIZE
+        )
+        assert backup_chunks._find_cut(mapped, 100, 150) == 150
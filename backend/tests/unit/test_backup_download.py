@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for Range / If-Range handling of backup downloads.
+"""
+
+from email.utils import formatdate
+
+import pytest
+
+from app.api.routes.backup import _if_range_matches, _parse_range, _zstd_etag
+
+SIZE = 1000
+ETAG = '"9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"'
+MTIME_NS = 1_760_000_000_123_456_789
+
+
+@pytest.mark.unit
+class TestParseRange:
+    """Test _parse_range."""
+
+    @pytest.mark.parametrize(
+        ("header", "expected"),
+        [
+            ("bytes=0-0", (0, 1)),
+            ("bytes=100-199", (100, 200)),
+            ("bytes=100-", (100, SIZE)),
+            ("bytes=900-5000", (900, SIZE)),
+            ("bytes=-100", (900, SIZE)),
+            ("bytes=-5000", (0, SIZE)),
+            (" BYTES = 5 - 9 ", (5, 10)),
+        ],
+    )
+    def test_satisfiable(self, header: str, expected: tuple[int, int]) -> None:
+        """Test that single ranges resolve to [start, end)."""
+        assert _parse_range(header, SIZE) == expected
+
+    @pytest.mark.parametrize(
+        "header",
+        [
+            "items=0-1",
+            "bytes=0-1,5-6",
+            "bytes=5-2",
+            "bytes=-",
+            "bytes=abc-",
+            "bytes=1-x",
+            "bytes=+1-2",
+            "bytes",
+        ],
+    )
+    def test_ignored(self, header: str) -> None:
+        """Test that unsupported or malformed ranges are ignored."""
+        assert _parse_range(header, SIZE) is None
+
+    @pytest.mark.parametrize(
+        ("header", "size"),
+        [("bytes=1000-", SIZE), ("bytes=-0", SIZE), ("bytes=0-", 0), ("bytes=-1", 0)],
+    )
+    def test_unsatisfiable(self, header: str, size: int) -> None:
+        """Test that unsatisfiable ranges raise ValueError (416)."""
+        with pytest.raises(ValueError):
+            _parse_range(header, size)
+
+
+@pytest.mark.unit
+class TestIfRange:
+    """Test _if_range_matches."""
+
+    def test_absent(self) -> None:
+        """Test that a missing If-Range always matches."""
+        assert _if_range_matches(None, ETAG, MTIME_NS)
+
+    def test_etag(self) -> None:
+        """Test strong comparison against the identity and zstd ETags."""
+        assert _if_range_matches(ETAG, ETAG, MTIME_NS)
+        assert _if_range_matches(_zstd_etag(ETAG), ETAG, MTIME_NS)
+        assert not _if_range_matches('"stale"', ETAG, MTIME_NS)
+        assert not _if_range_matches("W/" + ETAG, ETAG, MTIME_NS)
+
+    def test_date(self) -> None:
+        """Test comparison against Last-Modified at one-second resolution."""
+        last_modified = formatdate(MTIME_NS / 1e9, usegmt=True)
+        assert _if_range_matches(last_modified, ETAG, MTIME_NS)
+        assert not _if_range_matches("Mon, 01 Jan 2001 00:00:00 GMT", ETAG, MTIME_NS)
+        assert not _if_range_matches("not a date", ETAG, MTIME_NS)
+
+    def test_zstd_etag(self) -> None:
+        """Test that the zstd variant stays a quoted strong ETag."""
+        assert _zstd_etag('"abc"') == '"abc-zstd"'
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for the grandfather-father-son backup retention plan.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from app.services.backup_manifest import BackupRecord
+from app.services.backup_retention import RetentionPolicy, plan_group
+from app.services.backup_store import original_filename
+
+
+def _record(uploaded_at: datetime, name: str = "novel_app_backup.db") -> BackupRecord:
+    ns = int(uploaded_at.timestamp() * 1e9)
+    return BackupRecord(
+        backup_id=f"{uploaded_at:%Y-%m-%d}/{name}@{uploaded_at:%H%M%S}",
+        filename=name,
+        stored_name=name,
+        file_size=1,
+        uploaded_ns=ns,
+        mtime_ns=ns,
+    )
+
+
+def _plan(times: list[datetime], policy: RetentionPolicy) -> dict[datetime, list[str]]:
+    records = sorted(
+        (_record(at) for at in times), key=lambda r: r.uploaded_ns, reverse=True
+    )
+    reasons = plan_group(records, policy)
+    return {r.uploaded_at: reasons[r.backup_id] for r in records}
+
+
+@pytest.mark.unit
+class TestPlanGroup:
+    """Test plan_group."""
+
+    def test_daily_keeps_newest_per_day(self) -> None:
+        """Test that only the newest backup of each of the last N days is kept."""
+        times = [
+            datetime(2026, 10, 19, 20),
+            datetime(2026, 10, 19, 8),
+            datetime(2026, 10, 18, 12),
+            datetime(2026, 10, 15, 12),
+        ]
+        plan = _plan(times, RetentionPolicy(daily=2, weekly=0, monthly=0))
+        assert plan == {
+            times[0]: ["daily"],
+            times[1]: [],
+            times[2]: ["daily"],
+            times[3]: [],
+        }
+
+    def test_periods_count_only_days_with_backups(self) -> None:
+        """Test that gaps without backups do not use up the daily quota."""
+        times = [datetime(2026, 10, 19), datetime(2026, 9, 1), datetime(2026, 1, 1)]
+        plan = _plan(times, RetentionPolicy(daily=2, weekly=0, monthly=0))
+        assert [bool(reasons) for reasons in plan.values()] == [True, True, False]
+
+    def test_weekly_uses_iso_weeks(self) -> None:
+        """Test that Sunday and the following Monday are different weeks."""
+        monday = datetime(2026, 10, 19, 12)  # ISO 周一
+        sunday = datetime(2026, 10, 18, 12)
+        saturday = datetime(2026, 10, 17, 12)
+        plan = _plan([monday, sunday, saturday], RetentionPolicy(0, 2, 0))
+        assert plan == {monday: ["weekly"], sunday: ["weekly"], saturday: []}
+
+    def test_rules_combine(self) -> None:
+        """Test that a backup can satisfy several rules and the rest are deleted."""
+        times = [
+            datetime(2026, 10, 19),
+            datetime(2026, 10, 10),
+            datetime(2026, 9, 30),
+            datetime(2026, 9, 2),
+            datetime(2026, 8, 15),
+            datetime(2026, 7, 1),
+        ]
+        plan = _plan(times, RetentionPolicy(daily=1, weekly=2, monthly=3))
+        assert plan[times[0]] == ["daily", "weekly", "monthly"]
+        assert plan[times[1]] == ["weekly"]
+        assert plan[times[2]] == ["monthly"]
+        assert plan[times[3]] == []
+        assert plan[times[4]] == ["monthly"]
+        assert plan[times[5]] == []
+
+    def test_zero_policy_keeps_nothing(self) -> None:
+        """Test that plan_group itself keeps nothing for an all-zero policy."""
+        policy = RetentionPolicy(0, 0, 0)
+        assert not policy.enabled
+        plan = _plan([datetime(2026, 10, 19)], policy)
+        assert plan == {datetime(2026, 10, 19): []}
+
+    def test_empty_group(self) -> None:
+        """Test that an empty group yields an empty plan."""
+        assert plan_group([], RetentionPolicy(7, 4, 12)) == {}
+
+
+@pytest.mark.unit
+class TestOriginalFilename:
+    """Test recovery of the upload name from a stored backup name."""
+
+    @pytest.mark.parametrize(
+        ("stored", "original"),
+        [
+            ("novel_app_backup.db", "novel_app_backup.db"),
+            ("novel_app_backup_091852.db", "novel_app_backup.db"),
+            ("novel_app_backup_091852_3.db", "novel_app_backup.db"),
+            ("backup_12345.zip", "backup_12345.zip"),
+            ("_091852.db", "_091852.db"),
+        ],
+    )
+    def test_strip_timestamp_suffix(self, stored: str, original: str) -> None:
+        """Test that only the suffix added by candidate_names is stripped."""
+        assert original_filename(stored) == original
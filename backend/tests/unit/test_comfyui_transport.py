@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for the ComfyUI transport circuit breaker.
+"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.comfyui_transport import (
+    CircuitBreaker,
+    CircuitState,
+    ComfyUITransport,
+)
+
+
+@pytest.mark.unit
+class TestHalfOpenTrial:
+    """Test that the half-open trial always ends."""
+
+    def test_unexpected_exception_releases_trial(self) -> None:
+        """Test that a non-requests exception does not wedge the breaker."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        transport = ComfyUITransport("http://comfyui", breaker=breaker, max_retries=0)
+        breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.state == CircuitState.HALF_OPEN
+
+        with (
+            patch.object(transport._session, "request", side_effect=ValueError),
+            pytest.raises(ValueError),
+        ):
+            transport.request("GET", "/view", "view")
+        assert breaker.state == CircuitState.OPEN
+
+        time.sleep(0.02)
+        response = MagicMock(status_code=200)
+        with patch.object(transport._session, "request", return_value=response):
+            assert transport.request("GET", "/view", "view") is response
+        assert breaker.state == CircuitState.CLOSED
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for claiming generation jobs on SQLite.
+"""
+
+import asyncio
+from collections.abc import AsyncGenerator
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app.config import settings
+from app.models.generation_job import GenerationJob
+from app.services.generation_queue import claim_jobs, enqueue_t2i, requeue_stale
+from app.utils.datetime_utils import utcnow
+
+
+@pytest.fixture
+async def engine(tmp_path: Path) -> AsyncGenerator[AsyncEngine, None]:
+    """File-backed SQLite engine with the generation_job table."""
+    db_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'queue.db'}")
+    async with db_engine.begin() as conn:
+        await conn.run_sync(
+            GenerationJob.metadata.create_all, tables=[GenerationJob.__table__]
+        )
+    yield db_engine
+    await db_engine.dispose()
+
+
+@pytest.fixture
+def sessions(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    """Session factory; each session stands in for one worker."""
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def _enqueue(sessions: async_sessionmaker[AsyncSession], count: int) -> None:
+    async with sessions() as db:
+        for index in range(count):
+            enqueue_t2i(db, f"p{index}", "prompt", "model")
+        await db.commit()
+
+
+@pytest.mark.unit
+class TestClaimJobs:
+    """Test the compare-and-swap claim used on SQLite."""
+
+    async def test_lost_race_skips_claimed_jobs(
+        self,
+        sessions: async_sessionmaker[AsyncSession],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test that a claimer whose candidates were taken meanwhile skips them."""
+        await _enqueue(sessions, 3)
+        async with sessions() as first, sessions() as second:
+            scalars = first.scalars
+            raced: list[list[int]] = []
+
+            async def scalars_then_race(*args, **kwargs):
+                result = await scalars(*args, **kwargs)
+                if not raced:
+                    # 第一个 worker 选出候选任务后、UPDATE 之前，另一个 worker 先认领
+                    jobs = await claim_jobs(second, "second", limit=2)
+                    raced.append([job.id for job in jobs])
+                return result
+
+            monkeypatch.setattr(first, "scalars", scalars_then_race)
+            claimed = [job.id for job in await claim_jobs(first, "first", limit=3)]
+
+        assert raced == [[1, 2]]
+        assert claimed == [3]
+
+    async def test_concurrent_claimers_never_share_a_job(
+        self, sessions: async_sessionmaker[AsyncSession]
+    ) -> None:
+        """Test that concurrent workers claim every job exactly once."""
+        await _enqueue(sessions, 20)
+
+        async def worker(name: str) -> list[int]:
+            claimed: list[int] = []
+            async with sessions() as db:
+                while jobs := await claim_jobs(db, name, limit=3):
+                    claimed.extend(job.id for job in jobs)
+                    await asyncio.sleep(0)
+            return claimed
+
+        results = await asyncio.gather(*(worker(f"w{i}") for i in range(4)))
+        claimed = [job_id for result in results for job_id in result]
+        assert sorted(claimed) == list(range(1, 21))
+
+        async with sessions() as db:
+            jobs = (await db.scalars(select(GenerationJob))).all()
+        assert all(job.status == "submitting" and job.attempts == 1 for job in jobs)
+
+
+@pytest.mark.unit
+class TestRequeueStale:
+    """Test requeue_stale."""
+
+    async def test_stale_lease_requeued_once(
+        self, sessions: async_sessionmaker[AsyncSession]
+    ) -> None:
+        """Test that an expired lease is requeued exactly once, a live one is kept."""
+        await _enqueue(sessions, 2)
+        async with sessions() as db:
+            stale, live = await claim_jobs(db, "crashed", limit=2)
+            lease = timedelta(seconds=settings.generation_job_lease_seconds)
+            stale.locked_at = utcnow() - lease - timedelta(seconds=1)
+            await db.commit()
+
+        async def requeue() -> int:
+            async with sessions() as db:
+                return await requeue_stale(db)
+
+        counts = await asyncio.gather(requeue(), requeue())
+        assert sorted(counts) == [0, 1]
+
+        async with sessions() as db:
+            jobs = {
+                job.id: job for job in (await db.scalars(select(GenerationJob))).all()
+            }
+            assert jobs[stale.id].status == "queued"
+            assert jobs[stale.id].locked_by is None
+            assert jobs[live.id].status == "submitting"
+            assert jobs[live.id].locked_by == "crashed"
+
+            reclaimed = await claim_jobs(db, "next", limit=10)
+        assert [(job.id, job.attempts) for job in reclaimed] == [(stale.id, 2)]
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for the SQLite client_logs shard view.
+"""
+
+import importlib.util
+from collections.abc import Generator
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from app.services.log_partitions import LEGACY_TABLE, LogPartitionManager
+
+MIGRATION = (
+    Path(__file__).parents[2]
+    / "alembic"
+    / "versions"
+    / "20261024_partition_client_logs.py"
+)
+
+# 加 fingerprint 列之前由 create_all 建出的 client_logs
+LEGACY_DDL = (
+    "CREATE TABLE client_logs ("
+    " id INTEGER NOT NULL PRIMARY KEY,"
+    " level VARCHAR(10) NOT NULL,"
+    " message TEXT NOT NULL,"
+    " stack_trace TEXT,"
+    " category VARCHAR(20) NOT NULL,"
+    " tags TEXT,"
+    " timestamp DATETIME NOT NULL,"
+    " received_at DATETIME)"
+)
+
+
+@pytest.fixture
+def engine(tmp_path: Path) -> Generator[Engine, None, None]:
+    """SQLite database holding one legacy log row without a fingerprint column."""
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    with db_engine.begin() as conn:
+        conn.execute(text(LEGACY_DDL))
+        conn.execute(
+            text(
+                "INSERT INTO client_logs (id, level, message, category, timestamp, "
+                "received_at) VALUES (1, 'error', 'boom', 'general', "
+                "'2026-01-01 00:00:00', '2026-01-01 00:00:00')"
+            )
+        )
+    yield db_engine
+    db_engine.dispose()
+
+
+def _downgrade(conn) -> None:
+    spec = importlib.util.spec_from_file_location("partition_migration", MIGRATION)
+    assert spec is not None and spec.loader is not None
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with Operations.context(MigrationContext.configure(conn)):
+        migration.downgrade()
+
+
+@pytest.mark.unit
+class TestSqliteShardView:
+    """Test the UNION ALL view over the legacy table and the shards."""
+
+    def test_missing_column_is_null(self, engine: Engine) -> None:
+        """Test that a legacy shard without fingerprint yields NULL, not its name."""
+        manager = LogPartitionManager(interval="month", retention_days=0)
+        with engine.begin() as conn:
+            manager.prepare(conn)
+            manager._ensure_sync(conn, datetime(2099, 1, 15))
+            conn.execute(
+                text(
+                    "INSERT INTO client_logs_p209901 (level, message, category, "
+                    "timestamp, received_at, fingerprint) VALUES ('error', 'new', "
+                    "'general', '2099-01-01 00:00:00', '2099-01-01 00:00:00', 'abc')"
+                )
+            )
+            rows = conn.execute(
+                text("SELECT message, fingerprint FROM client_logs ORDER BY id")
+            ).all()
+        assert [tuple(row) for row in rows] == [("boom", None), ("new", "abc")]
+
+    def test_downgrade_restores_plain_table(self, engine: Engine) -> None:
+        """Test that the 20261024 downgrade merges the shards back into one table."""
+        manager = LogPartitionManager(interval="month", retention_days=0)
+        with engine.begin() as conn:
+            manager.prepare(conn)
+            manager._ensure_sync(conn, datetime(2099, 1, 15))
+            conn.execute(
+                text(
+                    "INSERT INTO client_logs_p209901 (level, message, category, "
+                    "timestamp, received_at) VALUES ('info', 'new', 'general', "
+                    "'2099-01-01 00:00:00', '2099-01-01 00:00:00')"
+                )
+            )
+        with engine.begin() as conn:
+            _downgrade(conn)
+        with engine.connect() as conn:
+            names = set(conn.execute(text("SELECT name FROM sqlite_master")).scalars())
+            kind = conn.execute(
+                text("SELECT type FROM sqlite_master WHERE name = 'client_logs'")
+            ).scalar()
+            messages = conn.execute(
+                text("SELECT message FROM client_logs ORDER BY id")
+            ).scalars()
+            assert list(messages) == ["boom", "new"]
+        assert kind == "table"
+        assert LEGACY_TABLE not in names
+        assert not any(name.startswith("client_logs_p") for name in names)
+        assert "idx_fingerprint_timestamp" in names
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for the SQLite single-writer gate.
+"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import await_only
+
+from app.database import install_sqlite_writer_gate
+
+
+@pytest.mark.unit
+class TestWriterGate:
+    """Test that queued writers start only after the previous commit."""
+
+    async def test_lock_released_after_dbapi_commit(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that the next writer waits for the DBAPI COMMIT to finish."""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'gate.db'}")
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE t (writer INTEGER)"))
+
+        events: list[str] = []
+        dialect_class = type(engine.sync_engine.dialect)
+        do_commit = dialect_class.do_commit
+
+        def slow_commit(self, dbapi_connection) -> None:
+            events.append("commit-start")
+            # 提交期间让出事件循环，写锁提前释放时另一个写者会在这里插入
+            await_only(asyncio.sleep(0.05))
+            do_commit(self, dbapi_connection)
+            events.append("commit-end")
+
+        monkeypatch.setattr(dialect_class, "do_commit", slow_commit)
+        install_sqlite_writer_gate(engine)
+
+        # 在写锁监听器之后注册：记录写者取得写锁、开始执行写语句的时刻
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def _record(_conn, _cursor, _statement, parameters, *_args):
+            events.append(f"write-{parameters[0]}")
+
+        async def writer(index: int) -> None:
+            async with engine.connect() as conn:
+                await conn.execute(text("INSERT INTO t VALUES (:i)"), {"i": index})
+                await conn.commit()
+
+        try:
+            await asyncio.gather(writer(1), writer(2))
+        finally:
+            await engine.dispose()
+
+        assert events == [
+            "write-1",
+            "commit-start",
+            "commit-end",
+            "write-2",
+            "commit-start",
+            "commit-end",
+        ]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for keyset pagination in the task repository.
+"""
+
+import base64
+from collections.abc import AsyncGenerator
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models.text2img import ImageToVideoTask, Text2ImgTask
+from app.services.task_repository import TaskCursor, TaskRepository
+
+BASE = datetime(2026, 10, 1, tzinfo=UTC)
+
+
+@pytest.mark.unit
+class TestTaskCursor:
+    """Test TaskCursor encoding."""
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            TaskCursor(BASE, 42),
+            TaskCursor(BASE + timedelta(microseconds=123), 7, "t2i"),
+            TaskCursor(datetime(2026, 10, 1, 8, 30), 1, "i2v"),
+        ],
+    )
+    def test_round_trip(self, cursor: TaskCursor) -> None:
+        """Test that decode(encode(cursor)) returns the same cursor."""
+        token = cursor.encode()
+        assert "=" not in token
+        assert TaskCursor.decode(token) == cursor
+
+    @pytest.mark.parametrize(
+        "token",
+        [
+            "",
+            "not base64!",
+            TaskCursor(BASE, 1).encode()[:-3],
+        ],
+    )
+    def test_invalid(self, token: str) -> None:
+        """Test that malformed tokens raise ValueError."""
+        with pytest.raises(ValueError):
+            TaskCursor.decode(token)
+
+    def test_unknown_kind(self) -> None:
+        """Test that a cursor naming an unknown task type is rejected."""
+        raw = f"{BASE.isoformat()}|1|video".encode()
+        token = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+        with pytest.raises(ValueError):
+            TaskCursor.decode(token)
+
+
+@pytest.fixture
+async def session() -> AsyncGenerator[AsyncSession, None]:
+    """In-memory SQLite session with the task tables."""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Text2ImgTask.metadata.create_all,
+            tables=[Text2ImgTask.__table__, ImageToVideoTask.__table__],
+        )
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        yield db
+    await engine.dispose()
+
+
+@pytest.mark.unit
+class TestListHistoryPaging:
+    """Test that walking list_history pages visits every row exactly once."""
+
+    async def test_walk_pages(self, session: AsyncSession) -> None:
+        """Test paging across task types with created_at ties."""
+        for index in range(9):
+            # 每三条共用一个创建时间，两种任务类型交错，覆盖 (created_at, kind, id) 并列
+            created_at = BASE + timedelta(seconds=index // 3)
+            session.add(
+                Text2ImgTask(
+                    prompt_id=f"t{index}",
+                    prompt="p",
+                    model_name="m",
+                    created_at=created_at,
+                )
+            )
+            session.add(
+                ImageToVideoTask(
+                    prompt_id=f"v{index}",
+                    prompt="p",
+                    model_name="m",
+                    image_filename="x.png",
+                    created_at=created_at,
+                )
+            )
+        await session.commit()
+
+        repository = TaskRepository(session)
+        expected = await repository.list_history(["t2i", "i2v"], limit=100)
+        assert len(expected.items) == 18
+        assert expected.next_cursor is None
+        keys = [(r.created_at, r.kind, r.id) for r in expected.items]
+        assert keys == sorted(set(keys), reverse=True)
+
+        seen = []
+        cursor = None
+        while True:
+            page = await repository.list_history(["t2i", "i2v"], after=cursor, limit=4)
+            seen.extend(page.items)
+            if page.next_cursor is None:
+                break
+            # 游标经过编码/解码后仍能继续翻页
+            cursor = TaskCursor.decode(page.next_cursor.encode())
+
+        assert [(r.kind, r.id) for r in seen] == [
+            (r.kind, r.id) for r in expected.items
+        ]